@@ -1,15 +1,14 @@
 import base64
+import tenants
+import cassete
 
 # Função para obter credenciais de autenticação
+# As credenciais vêm do registro de tenants (tenants.json ou variáveis de ambiente, ver tenants.py)
+# Reproduzindo um cassete, a API não é acessada e as credenciais não são necessárias
 def obter_credenciais(subdominio):
-    credenciais = {
-        "preencha_seu_subdominio": ("preencher_o_usuário", "preencha_senha"),
-        "preencha_seu_subdominio": ("preencher_o_usuário", "preencha_senha")
-    }
-    if subdominio not in credenciais:
-        raise ValueError(f"Subdomínio não reconhecido: {subdominio}")
-
-    usuario_api, senha_api = credenciais[subdominio]
+    if cassete.reproduzindo():
+        return 'Basic cassete'
+    usuario_api, senha_api = tenants.credenciais(subdominio)
     usuario_senha = f'{usuario_api}:{senha_api}'
     token_base64 = base64.b64encode(usuario_senha.encode('utf-8')).decode('utf-8')
     return f'Basic {token_base64}'
@@ -1,29 +1,28 @@
+import sys
 import asyncio
+import contextlib
 import aiohttp
-import base64
 import pandas as pd
 from datetime import datetime
 import nest_asyncio
+from Credenciais import obter_credenciais
+import tenants
+import perfil
+import esquemas
+import cassete
+import limites_tempo
+import cache_arrow
 
 # Permitir loops aninhados no Jupyter
 nest_asyncio.apply()
 
-# Função para obter as credenciais de autenticação para o subdomínio
-def obter_credenciais(subdominio):
-    credenciais = {
-        "sej": ("sej-gvapi", "yfuHc8SwmjFzaErWwSDYaRyMPo2ZJkdm"),
-        "macapainvest": ("macapainvest-igorsantos", "QKQjlS3D3FFalzKNrOopOtJKTMbjiuYZ")
-    }
-    if subdominio not in credenciais:
-        raise ValueError(f"Subdomínio não reconhecido: {subdominio}")
-
-    usuario_api, senha_api = credenciais[subdominio]
-    usuario_senha = f'{usuario_api}:{senha_api}'
-    token_base64 = base64.b64encode(usuario_senha.encode('utf-8')).decode('utf-8')
-    return f'Basic {token_base64}'
+# Cassete de gravação/reprodução da API (variável SIENGE_CASSETE; sem ela, não faz nada)
+cassete.ativar_por_ambiente()
 
 # Função para obter os dados do extrato do cliente via API
-async def obter_dados_do_extrato(subdominio, start_due_date, end_due_date, semaphore, bill_receivable_id=None):
+# (com 'session', reaproveita as conexões abertas; sem ela, abre uma sessão para a requisição)
+# (cada requisição ocupa um lugar no orçamento do tenant, compartilhado com os demais extratores)
+async def obter_dados_do_extrato(subdominio, start_due_date, end_due_date, bill_receivable_id=None, session=None):
     url = f"https://api.sienge.com.br/{subdominio}/public/api/bulk-data/v1/customer-extract-history"
     
     params = {
@@ -38,56 +37,96 @@ async def obter_dados_do_extrato(subdominio, start_due_date, end_due_date, semap
         "Authorization": obter_credenciais(subdominio)
     }
 
+    janela = f"{start_due_date}..{end_due_date}"
     max_retries = 3
     attempt = 0
 
     while attempt < max_retries:
         attempt += 1
         try:
-            async with semaphore:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=headers, params=params) as response:
-                        if response.status == 200:
-                            print(f"✅ Dados extraídos com sucesso de {subdominio} {start_due_date} a {end_due_date}.")
-                            return await response.json()
-                        else:
-                            raise Exception(f"Erro: {response.status}, {await response.text()}")
+            async with contextlib.AsyncExitStack() as pilha:
+                sessao = session or await pilha.enter_async_context(aiohttp.ClientSession())
+                with perfil.estagio('fetch', subdominio, janela):  # Orçamento do tenant em limites_tempo.obter_async
+                    response = await limites_tempo.obter_async(sessao, 'extratos', url, subdominio=subdominio,
+                                                               headers=headers, params=params)
+                    if response.status != 200:
+                        raise Exception(f"Erro: {response.status}, {await response.text()}")
+                    corpo = await response.read()
+            with perfil.estagio('decode', subdominio, janela):
+                registros, _ = esquemas.decodificar('customer-extract-history', corpo)
+            print(f"✅ Dados extraídos com sucesso de {subdominio} {start_due_date} a {end_due_date}.")
+            return {'data': registros}
+        except esquemas.EsquemaIncompativel:
+            raise  # Mudança no formato da API: repetir a requisição não resolve
         except Exception as e:
             print(f"⚠️ Tentativa {attempt} falhou para {subdominio} {start_due_date} a {end_due_date}: {e}")
             if attempt == max_retries:
                 print(f"❌ Falha após {max_retries} tentativas para {subdominio} {start_due_date} a {end_due_date}.")
                 raise
 
-# Função para converter os dados extraídos para um DataFrame
+# Funções para os campos de cada nível do extrato (conta, parcela e recibo)
+def campos_conta(item):
+    company = item.get('company', {})
+    cost_center = item.get('costCenter', {})
+    customer = item.get('customer', {})
+    return {
+        'billReceivableId': item.get('billReceivableId'),
+        'company_id': company.get('id'),
+        'company_name': company.get('name'),
+        'costCenter_id': cost_center.get('id'),
+        'costCenter_name': cost_center.get('name'),
+        'customer_id': customer.get('id'),
+        'customer_name': customer.get('name'),
+        'customer_document': customer.get('document'),
+        'emissionDate': item.get('emissionDate'),
+        'lastRenegotiationDate': item.get('lastRenegotiationDate'),
+        'correctionDate': item.get('correctionDate'),
+        'document': item.get('document'),
+        'privateArea': item.get('privateArea'),
+        'oldestInstallmentDate': item.get('oldestInstallmentDate'),
+        'revokedBillReceivableDate': item.get('revokedBillReceivableDate')
+    }
+
+def campos_parcela(installment):
+    return {
+        'installment_id': installment.get('id'),
+        'annualCorrection': installment.get('annualCorrection'),
+        'sentToScripturalCharge': installment.get('sentToScripturalCharge'),
+        'paymentTerms_id': installment.get('paymentTerms', {}).get('id'),
+        'paymentTerms_description': installment.get('paymentTerms', {}).get('description'),
+        'baseDate': installment.get('baseDate'),
+        'originalValue': installment.get('originalValue'),
+        'dueDate': installment.get('dueDate'),
+        'indexerId': installment.get('indexerId'),
+        'calculationDate': installment.get('calculationDate'),
+        'currentBalance': installment.get('currentBalance'),
+        'currentBalanceWithAddition': installment.get('currentBalanceWithAddition'),
+        'generatedBillet': installment.get('generatedBillet'),
+        'installmentSituation': installment.get('installmentSituation'),
+        'installmentNumber': installment.get('installmentNumber')
+    }
+
+def campos_recebimento(receipt):
+    return {
+        'receipt_days': receipt.get('days'),
+        'receipt_date': receipt.get('date'),
+        'receipt_value': receipt.get('value'),
+        'receipt_extra': receipt.get('extra'),
+        'receipt_discount': receipt.get('discount'),
+        'receipt_netReceipt': receipt.get('netReceipt'),
+        'receipt_type': receipt.get('type')
+    }
+
+# Função para converter os dados extraídos para um DataFrame (uma linha larga por recibo)
 def converter_para_dataframe(dados):
     extrato_cliente = []
     
     for item in dados.get('data', []):
-        # Desestruturando os campos do JSON
-        company = item.get('company', {})
-        cost_center = item.get('costCenter', {})
-        customer = item.get('customer', {})
         units = item.get('units', [])
         installments = item.get('installments', [])
         
         # Extraindo dados principais
-        row = {
-            'billReceivableId': item.get('billReceivableId'),
-            'company_id': company.get('id'),
-            'company_name': company.get('name'),
-            'costCenter_id': cost_center.get('id'),
-            'costCenter_name': cost_center.get('name'),
-            'customer_id': customer.get('id'),
-            'customer_name': customer.get('name'),
-            'customer_document': customer.get('document'),
-            'emissionDate': item.get('emissionDate'),
-            'lastRenegotiationDate': item.get('lastRenegotiationDate'),
-            'correctionDate': item.get('correctionDate'),
-            'document': item.get('document'),
-            'privateArea': item.get('privateArea'),
-            'oldestInstallmentDate': item.get('oldestInstallmentDate'),
-            'revokedBillReceivableDate': item.get('revokedBillReceivableDate')
-        }
+        row = campos_conta(item)
         
         # Extraindo informações de unidades (usando a primeira unidade, caso existam múltiplas)
         if units:
@@ -100,37 +139,13 @@ def converter_para_dataframe(dados):
         # Processando os dados das parcelas (installments)
         for installment in installments:
             installment_row = row.copy()
-            installment_row.update({
-                'installment_id': installment.get('id'),
-                'annualCorrection': installment.get('annualCorrection'),
-                'sentToScripturalCharge': installment.get('sentToScripturalCharge'),
-                'paymentTerms_id': installment.get('paymentTerms', {}).get('id'),
-                'paymentTerms_description': installment.get('paymentTerms', {}).get('description'),
-                'baseDate': installment.get('baseDate'),
-                'originalValue': installment.get('originalValue'),
-                'dueDate': installment.get('dueDate'),
-                'indexerId': installment.get('indexerId'),
-                'calculationDate': installment.get('calculationDate'),
-                'currentBalance': installment.get('currentBalance'),
-                'currentBalanceWithAddition': installment.get('currentBalanceWithAddition'),
-                'generatedBillet': installment.get('generatedBillet'),
-                'installmentSituation': installment.get('installmentSituation'),
-                'installmentNumber': installment.get('installmentNumber')
-            })
+            installment_row.update(campos_parcela(installment))
             
             # Processando os recibos dentro das parcelas (receipts)
             receipts = installment.get('receipts', [])
             for receipt in receipts:
                 receipt_row = installment_row.copy()
-                receipt_row.update({
-                    'receipt_days': receipt.get('days'),
-                    'receipt_date': receipt.get('date'),
-                    'receipt_value': receipt.get('value'),
-                    'receipt_extra': receipt.get('extra'),
-                    'receipt_discount': receipt.get('discount'),
-                    'receipt_netReceipt': receipt.get('netReceipt'),
-                    'receipt_type': receipt.get('type')
-                })
+                receipt_row.update(campos_recebimento(receipt))
                 extrato_cliente.append(receipt_row)
         # Se não houver parcelas ou recibos, adiciona a linha principal
         if not installments or not receipts:
@@ -138,51 +153,141 @@ def converter_para_dataframe(dados):
     
     return pd.DataFrame(extrato_cliente)
 
+# Função para converter os dados extraídos em tabelas normalizadas, sem repetir os campos:
+#   contas        uma linha por conta (billReceivableId)
+#   unidades      todas as unidades de cada conta ('unit_order' 0 é a principal)
+#   parcelas      uma linha por parcela (billReceivableId, installment_id)
+#   recebimentos  uma linha por recibo, ligada à parcela
+def converter_para_tabelas(dados, subdominio=None):
+    contas, unidades, parcelas, recebimentos = [], [], [], []
+    chave_subdominio = {'subdominio': subdominio} if subdominio else {}
+
+    for item in dados.get('data', []):
+        conta = {**chave_subdominio, **campos_conta(item)}
+        chave_conta = {**chave_subdominio, 'billReceivableId': conta['billReceivableId']}
+        contas.append(conta)
+
+        for ordem, unit in enumerate(item.get('units', [])):
+            unidades.append({**chave_conta, 'unit_order': ordem, 'unit_id': unit.get('id'), 'unit_name': unit.get('name')})
+
+        for installment in item.get('installments', []):
+            parcela = {**chave_conta, **campos_parcela(installment)}
+            parcelas.append(parcela)
+            chave_parcela = {**chave_conta, 'installment_id': parcela['installment_id']}
+            for receipt in installment.get('receipts', []):
+                recebimentos.append({**chave_parcela, **campos_recebimento(receipt)})
+
+    # Colunas fixas, para tabelas vazias também terem cabeçalho
+    colunas_conta = list(chave_subdominio) + list(campos_conta({}))
+    colunas_chave = list(chave_subdominio) + ['billReceivableId']
+    return {
+        'contas': pd.DataFrame(contas, columns=colunas_conta),
+        'unidades': pd.DataFrame(unidades, columns=colunas_chave + ['unit_order', 'unit_id', 'unit_name']),
+        'parcelas': pd.DataFrame(parcelas, columns=colunas_chave + list(campos_parcela({}))),
+        'recebimentos': pd.DataFrame(recebimentos, columns=colunas_chave + ['installment_id'] + list(campos_recebimento({}))),
+    }
+
+# Função para montar a visão larga (uma linha por recibo) a partir das tabelas normalizadas.
+# As linhas com recibo são iguais às de converter_para_dataframe. As linhas sem recibo diferem:
+# aqui cada parcela sem recibo aparece com os campos de recibo vazios, e cada conta sem parcelas
+# aparece uma vez; o CSV largo omite as parcelas sem recibo e só acrescenta uma linha com os
+# campos da conta quando ela não tem parcelas ou quando a última parcela não tem recibo.
+def desnormalizar(tabelas):
+    contas = tabelas['contas']
+    chave_conta = [coluna for coluna in ('subdominio', 'billReceivableId') if coluna in contas.columns]
+    unidade_principal = tabelas['unidades']
+    unidade_principal = unidade_principal[unidade_principal['unit_order'] == 0].drop(columns=['unit_order'])
+    largo = contas.merge(unidade_principal, on=chave_conta, how='left')
+    largo = largo.merge(tabelas['parcelas'], on=chave_conta, how='left')
+    return largo.merge(tabelas['recebimentos'], on=chave_conta + ['installment_id'], how='left')
+
+# Função para gravar as tabelas normalizadas (<prefixo>_contas.csv, <prefixo>_parcelas.csv, ...)
+def gravar_tabelas(tabelas, prefixo='Extratos'):
+    caminhos = []
+    for nome, tabela in tabelas.items():
+        caminho = f"{prefixo}_{nome}.csv"
+        tabela.to_csv(caminho, index=False)
+        caminhos.append(caminho)
+    return caminhos
+
+# Função para ler as tabelas normalizadas gravadas
+def ler_tabelas(prefixo='Extratos'):
+    return {nome: pd.read_csv(f"{prefixo}_{nome}.csv") for nome in ['contas', 'unidades', 'parcelas', 'recebimentos']}
+
 # Função assíncrona para obter dados de forma eficiente
-async def obter_dados_assincronos(subdominio, start_date, end_date, bill_receivable_id=None, max_concurrent_requests=5):
+# (com 'normalizado', retorna as tabelas de converter_para_tabelas em vez do DataFrame largo)
+async def obter_dados_assincronos(subdominio, start_date, end_date, bill_receivable_id=None, normalizado=False):
     start_year = datetime.strptime(start_date, "%Y-%m-%d").year
     end_year = datetime.strptime(end_date, "%Y-%m-%d").year
     tasks = []
-    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    # Uma sessão por subdomínio: as janelas reaproveitam as mesmas conexões
+    async with aiohttp.ClientSession() as session:
+        # Criação de intervalos de 5 anos
+        for year in range(start_year, end_year + 1, 5):
+            start_due_date = f"{year}-01-01"
+            end_due_date = f"{min(year + 4, end_year)}-12-31"  # Garante que não ultrapasse o end_year
+            tasks.append(obter_dados_do_extrato(subdominio, start_due_date, end_due_date, bill_receivable_id, session))
 
-    # Criação de intervalos de 5 anos
-    for year in range(start_year, end_year + 1, 5):
-        start_due_date = f"{year}-01-01"
-        end_due_date = f"{min(year + 4, end_year)}-12-31"  # Garante que não ultrapasse o end_year
-        tasks.append(obter_dados_do_extrato(subdominio, start_due_date, end_due_date, semaphore, bill_receivable_id))
-
-    # Executa as tarefas de forma assíncrona
-    results = await asyncio.gather(*tasks)
+        # Executa as tarefas de forma assíncrona
+        results = await asyncio.gather(*tasks)
 
     combined_data = []
     for result in results:
         if result:
             combined_data.extend(result.get('data', []))
     
-    return converter_para_dataframe({'data': combined_data})
+    with perfil.estagio('normalize', subdominio):
+        if normalizado:
+            return converter_para_tabelas({'data': combined_data}, subdominio)
+        df = converter_para_dataframe({'data': combined_data})
+        df['subdominio'] = subdominio  # Os ids de conta só são únicos dentro do subdomínio
+        return df
 
 # Função principal para orquestrar o processo
-async def main(subdominios, bill_receivable_id=None):
+# (com 'normalizado', grava as tabelas contas/unidades/parcelas/recebimentos em vez do CSV largo)
+async def main(subdominios, bill_receivable_id=None, caminho='Extratos_combined.csv', normalizado=False,
+               prefixo='Extratos'):
     start_date = '1990-01-01'
     end_date = '2100-12-31'
 
     print(f"⏳ Iniciando extração de dados para os subdomínios: {', '.join(subdominios)}")
     
     # Executar as extrações de ambos os subdomínios de forma assíncrona
-    tasks = [obter_dados_assincronos(subdominio, start_date, end_date, bill_receivable_id) for subdominio in subdominios]
+    tasks = [obter_dados_assincronos(subdominio, start_date, end_date, bill_receivable_id, normalizado=normalizado)
+             for subdominio in subdominios]
     results = await asyncio.gather(*tasks)
 
+    if normalizado:
+        with perfil.estagio('merge'):
+            tabelas = {nome: pd.concat([result[nome] for result in results], ignore_index=True) for nome in results[0]}
+        with perfil.estagio('write'):
+            caminhos = gravar_tabelas(tabelas, prefixo)
+            for nome, tabela in tabelas.items():
+                cache_arrow.atualizar(tabela, f'extratos_{nome}')
+        print(f"✅ Dados salvos nos arquivos: {', '.join(caminhos)}.")
+        print(f"📊 Total de registros salvos: " + ', '.join(f"{nome} {len(tabela)}" for nome, tabela in tabelas.items()))
+        return
+
     # Combinar os dados dos subdomínios em um único DataFrame
-    combined_df = pd.concat(results, ignore_index=True)
+    with perfil.estagio('merge'):
+        combined_df = pd.concat(results, ignore_index=True)
 
     # Salvando os dados extraídos em um arquivo CSV
-    combined_df.to_csv('Extratos_combined.csv', index=False)
-    print(f"✅ Dados salvos no arquivo 'Extratos_combined.csv'.")
+    with perfil.estagio('write'):
+        combined_df.to_csv(caminho, index=False)
+        cache_arrow.atualizar(combined_df, 'extratos')
+    print(f"✅ Dados salvos no arquivo '{caminho}'.")
     print(f"📊 Total de registros salvos: {len(combined_df)}")
 
+# Função para executar o script pela linha de comando (também usada por Extratos/Extratos.py)
+def executar():
+    perfil.configurar_por_argv()  # Use --profile para medir tempo e memória por estágio
+    subdominios = tenants.subdominios('extratos')  # Registro de tenants (tenants.json)
+
+    # Executando o processo para ambos os subdomínios (use --normalizado para as tabelas separadas)
+    asyncio.run(main(subdominios, normalizado='--normalizado' in sys.argv))
+    perfil.finalizar('extratos')
+
 # Execução do script para ambos os subdomínios
 if __name__ == "__main__":
-    subdominios = ["sej"]  # Lista de subdomínios
-
-    # Executando o processo para ambos os subdomínios
-    asyncio.run(main(subdominios))
+    executar()
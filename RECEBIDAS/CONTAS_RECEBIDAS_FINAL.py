@@ -4,6 +4,24 @@ from datetime import datetime
 import os
 import time
 from Credenciais import obter_credenciais
+import perfil
+import esquemas
+import tenants
+import agregados
+import exportar_excel
+import particoes
+import formatacao
+import cassete
+import cache_arrow
+import limites_tempo
+import sys
+
+# Sessão HTTP do módulo: conexões reaproveitadas entre as requisições (e entre os ciclos do
+# servico_atualizacao.py)
+sessao = requests.Session()
+
+# Cassete de gravação/reprodução da API (variável SIENGE_CASSETE; sem ela, não faz nada)
+cassete.ativar_por_ambiente()
 
 
 def rename_columns(col_name):
@@ -13,28 +31,33 @@ def rename_columns(col_name):
         return col_name.replace('_y', '')
     return col_name
 
-def fetch_data(url, token_autorizacao, start_date, end_date, subdominio):
+# Com 'falhar', esgotadas as tentativas gera exceção em vez de retornar uma lista vazia (fila de trabalho)
+def fetch_data(url, token_autorizacao, start_date, end_date, subdominio, falhar=False):
     params = {
         'startDate': start_date,
         'endDate': end_date,
         'selectionType': 'P'
     }
     headers = {'Authorization': token_autorizacao}
+    janela = f"{start_date}..{end_date}"
     
     print(f"Fazendo requisição para o período: {start_date} a {end_date} para o subdomínio: {subdominio}")
 
     for attempt in range(2):  # Tentativas: 0 e 1
         start_time = datetime.now()
         try:
-            response = requests.get(url, params=params, headers=headers)
+            with perfil.estagio('fetch', subdominio, janela):  # Orçamento do tenant em limites_tempo.get
+                response = limites_tempo.get(sessao, 'recebidas', url, subdominio=subdominio,
+                                             params=params, headers=headers)
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
             print(f"Hora atual: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"Tempo da requisição: {duration:.2f} segundos")
             print(f"Status da requisição: {response.status_code} - {response.reason}")
             if response.status_code == 200:
-                data = response.json()
-                return data.get('data', [])
+                with perfil.estagio('decode', subdominio, janela):
+                    registros, _ = esquemas.decodificar('income', response.content)
+                return registros
             else:
                 print(f"Erro na requisição: {response.status_code} - {response.reason}")
         except requests.RequestException as e:
@@ -45,20 +68,25 @@ def fetch_data(url, token_autorizacao, start_date, end_date, subdominio):
             print(f"Erro durante a requisição: {e}. Tentativa {attempt + 1}")
             time.sleep(2)  # Aguarda 2 segundos antes de tentar novamente
     
+    if falhar:  # Fila de trabalho: a tarefa volta para a fila
+        raise RuntimeError(f"Falha ao obter dados para o período: {start_date} a {end_date} no subdomínio: {subdominio}")
     print(f"Falha ao obter dados para o período: {start_date} a {end_date} no subdomínio: {subdominio}. Pulando para o próximo ano.")
     return []
 
-def process_data(subdominio, start_date, end_date):
+def process_data(subdominio, start_date, end_date, falhar=False):
     url = f'https://api.sienge.com.br/{subdominio}/public/api/bulk-data/v1/income'
     token_autorizacao = obter_credenciais(subdominio)
 
-    data = fetch_data(url, token_autorizacao, start_date, end_date, subdominio)
+    janela = f"{start_date}..{end_date}"
+
+    data = fetch_data(url, token_autorizacao, start_date, end_date, subdominio, falhar)
 
     if not data:
         print(f"Nenhum dado encontrado para o período: {start_date} a {end_date} no subdomínio: {subdominio}")
         return pd.DataFrame()  # Retorna um DataFrame vazio
 
-    df = pd.json_normalize(data)
+    with perfil.estagio('normalize', subdominio, janela):
+        df = esquemas.normalizar(data)
 
     if df.empty:
         print(f"Nenhum dado encontrado para o período: {start_date} a {end_date} no subdomínio: {subdominio}")
@@ -79,33 +107,32 @@ def process_data(subdominio, start_date, end_date):
     # Adicionar a coluna 'subdominio'
     df['subdominio'] = subdominio
 
-    # Filtrar e normalizar dados
-    df = df[df['receipts'].apply(lambda x: isinstance(x, list) and len(x) > 0)]
-    for index, row in df.iterrows():
-        for d in row['receipts']:
-            if isinstance(d, dict):
-                d['ChaveEspecifica'] = row['ChaveEspecifica']
+    with perfil.estagio('merge', subdominio, janela):
+        # Filtrar e normalizar dados
+        df = df[df['receipts'].apply(lambda x: isinstance(x, list) and len(x) > 0)]
 
-    receipts_df = pd.json_normalize(df['receipts'].explode())
-    receiptsCategories_df = pd.json_normalize(df['receiptsCategories'].explode())
+        receipts_df = esquemas.normalizar(df['receipts'].explode())
+        # Chave da conta em cada recibo (na ordem do explode)
+        receipts_df['ChaveEspecifica'] = df['ChaveEspecifica'].repeat(df['receipts'].apply(len)).to_numpy()
+        receiptsCategories_df = esquemas.normalizar(df['receiptsCategories'].explode())
     
-    df = df.reset_index(drop=True)
-    receiptsCategories_df = receiptsCategories_df.reset_index(drop=True)
+        df = df.reset_index(drop=True)
+        receiptsCategories_df = receiptsCategories_df.reset_index(drop=True)
     
-    # Adicionar 'uniqueIndex' no receipts_df
-    receipts_df['uniqueIndex'] = df['uniqueIndex'].repeat(df['receipts'].apply(len)).reset_index(drop=True)
+        # Adicionar 'uniqueIndex' no receipts_df
+        receipts_df['uniqueIndex'] = df['uniqueIndex'].repeat(df['receipts'].apply(len)).reset_index(drop=True)
     
-    # Adicionar 'uniqueIndex' no receiptsCategories_df
-    receiptsCategories_df['uniqueIndex'] = df['uniqueIndex'].repeat(df['receiptsCategories'].apply(len)).reset_index(drop=True)
+        # Adicionar 'uniqueIndex' no receiptsCategories_df
+        receiptsCategories_df['uniqueIndex'] = df['uniqueIndex'].repeat(df['receiptsCategories'].apply(len)).reset_index(drop=True)
     
-    # Fazer o merge usando 'uniqueIndex'
-    df_categories = pd.merge(df, receiptsCategories_df, on='uniqueIndex', how='left')
-    df_merged = pd.merge(receipts_df, df_categories, on='uniqueIndex', how='left')
+        # Fazer o merge usando 'uniqueIndex'
+        df_categories = pd.merge(df, receiptsCategories_df, on='uniqueIndex', how='left')
+        df_merged = pd.merge(receipts_df, df_categories, on='uniqueIndex', how='left')
 
-    df_merged.columns = [rename_columns(col) for col in df_merged.columns]
+        df_merged.columns = [rename_columns(col) for col in df_merged.columns]
 
-    # Remover a coluna 'uniqueIndex' após o merge
-    df_merged = df_merged.drop(columns=['uniqueIndex'])
+        # Remover a coluna 'uniqueIndex' após o merge
+        df_merged = df_merged.drop(columns=['uniqueIndex'])
 
     # Reordenar colunas
     column_order = [
@@ -129,18 +156,24 @@ def process_data(subdominio, start_date, end_date):
     ]
 
     df_merged = df_merged.reindex(columns=column_order)
-    
-    # Ajustar dados
-    df_merged = adjust_data(df_merged)
 
-    # Limpar espaços e caracteres não numéricos
-    df_merged['operationTypeId'] = df_merged['operationTypeId'].astype(str)
+    # Os valores seguem numéricos: a formatação (formatar_dados) é feita na gravação
+    return df_merged
 
-    # Remover caracteres não numéricos e converter vírgula para ponto
-    df_merged['operationTypeId'] = df_merged['operationTypeId'].str.replace(',', '.', regex=False)
-    
-    # Converter para float, depois para int (remover os centavos)
-    df_merged['operationTypeId'] = pd.to_numeric(df_merged['operationTypeId'], errors='coerce').astype(int)
+
+def formatar_dados(df_merged):
+    with perfil.estagio('format'):
+        # Ajustar dados
+        df_merged = adjust_data(df_merged)
+
+        # Limpar espaços e caracteres não numéricos
+        df_merged['operationTypeId'] = df_merged['operationTypeId'].astype(str)
+
+        # Remover caracteres não numéricos e converter vírgula para ponto
+        df_merged['operationTypeId'] = df_merged['operationTypeId'].str.replace(',', '.', regex=False)
+        
+        # Converter para float, depois para int (remover os centavos)
+        df_merged['operationTypeId'] = pd.to_numeric(df_merged['operationTypeId'], errors='coerce').astype(int)
 
     # Filtrar onde 'operationTypeId' é igual a 2
     #df_merged = df_merged[df_merged['operationTypeId'] == 2]
@@ -154,15 +187,8 @@ def adjust_data(df):
         if coluna in df.columns:
             df[coluna] = df[coluna].astype(str).str.strip()  # Manter como string e remover espaços extras
 
-    for coluna in df.select_dtypes(include=['float', 'int']).columns:
-        if coluna in ['originalAmount', 'correctedBalanceAmount', 'taxAmount']:
-            # Formatação para valores monetários com ponto decimal e vírgula como separador de milhar
-            df[coluna] = df[coluna].apply(lambda x: f'{x:,.2f}'.replace('.', 'X').replace(',', '.').replace('X', ','))
-        else:
-            # Formatação para valores monetários padrão
-            df[coluna] = df[coluna].apply(lambda x: f'{x:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.'))
-
-    return df
+    # Valores numéricos no padrão brasileiro (1.234,56), formatados por coluna
+    return formatacao.formatar_colunas(df)
 
 def criar_arquivo_tempo(diretorio, hora_inicio, hora_fim, nome_arquivo="tempo_info.txt"):
     caminho_arquivo = os.path.join(diretorio, nome_arquivo)
@@ -185,22 +211,59 @@ def criar_arquivo_tempo(diretorio, hora_inicio, hora_fim, nome_arquivo="tempo_in
     
     print(f"Arquivo de tempo criado em: {caminho_arquivo}")
 
-def save_historical_data(subdominios, start_year, end_year):
+# Sem start_year/end_year, usa o intervalo de anos de cada tenant no registro (tenants.json)
+def save_historical_data(subdominios, start_year=None, end_year=None, diretorio_agregados=None, caminho_excel=None,
+                         diretorio_colunar=None):
     df_total = pd.DataFrame()
+    falhas = []
     hora_inicio = datetime.now()
-    
+    anos = {}
     for subdominio in subdominios:
-        for year in range(start_year, end_year + 1):
-            start_date = f'{year}-01-01'
-            end_date = f'{year}-12-31'
-            df = process_data(subdominio, start_date, end_date)
-            df_total = pd.concat([df_total, df], ignore_index=True)
+        tenant_inicio, tenant_fim = tenants.intervalo_anos(subdominio)
+        anos[subdominio] = (start_year or tenant_inicio, end_year or tenant_fim)
+    
+    # Anos intercalados entre os subdomínios, para um tenant grande não atrasar os demais
+    tarefas_por_tenant = {subdominio: [(subdominio, year) for year in range(inicio, fim + 1)]
+                          for subdominio, (inicio, fim) in anos.items()}
+    for subdominio, year in tenants.intercalar(tarefas_por_tenant):
+        start_date = f'{year}-01-01'
+        end_date = f'{year}-12-31'
+        try:
+            df = process_data(subdominio, start_date, end_date, falhar=True)
+        except RuntimeError as e:
+            falhas.append(str(e))
+            print(f"{e}. Pulando para o próximo ano.")
+            continue
+        df_total = pd.concat([df_total, df], ignore_index=True)
     
     hora_fim = datetime.now()
     
     if not df_total.empty:
+        # Com algum ano sem dados, os recebimentos dele pareceriam removidos do escopo: os
+        # agregados e a base colunar só são atualizados quando todos os anos responderam
+        if falhas:
+            print(f"{len(falhas)} ano(s) falharam: agregados e base colunar não foram atualizados")
+        # Atualizar os recebimentos agregados por mês apenas com as parcelas alteradas
+        if diretorio_agregados and not falhas:
+            agregados.atualizar(df_total, 'recebidas', diretorio_agregados,
+                                escopo={subdominio: (f'{inicio}-01-01', f'{fim}-12-31')
+                                        for subdominio, (inicio, fim) in anos.items()})
+        # Gravar a base colunar (subdomínio/ano) usada pelo painel Streamlit
+        if diretorio_colunar and not falhas:
+            with perfil.estagio('write'):
+                particoes.gravar_particionado(df_total, diretorio_colunar, 'recebidas', 'paymentDate')
+        # Guardar o DataFrame (valores numéricos) no cache Arrow lido pelos notebooks
+        with perfil.estagio('write'):
+            cache_arrow.atualizar(df_total, 'recebidas_historico')
+        # Exportar para Excel com valores numéricos, uma planilha por subdomínio
+        if caminho_excel:
+            with perfil.estagio('write'):
+                exportar_excel.exportar(exportar_excel.por_subdominio(df_total), caminho_excel)
+        df_total = formatar_dados(df_total)
+
         file_path = r'C:\Bloko Capital\Financeiro - Documentos\Financeiro - Bloko Investimentos\9. BI\BI\Bases_API\RECEBIDAS\dados_historicos.csv'
-        df_total.to_csv(file_path, index=False)
+        with perfil.estagio('write'):
+            df_total.to_csv(file_path, index=False)
         print(f"Dados históricos salvos em: {file_path}")
         
         # Criar arquivo .txt com informações de tempo
@@ -208,7 +271,8 @@ def save_historical_data(subdominios, start_year, end_year):
     else:
         print("Nenhum dado histórico disponível para salvar.")
 
-def save_current_data(subdominios):
+def save_current_data(subdominios, diretorio_agregados=None, caminho_excel=None, diretorio_colunar=None,
+                      file_path='dados_atualizaveis.csv'):
     df_total = pd.DataFrame()
     hora_inicio = datetime.now()
     
@@ -216,15 +280,41 @@ def save_current_data(subdominios):
     start_date = f'{today.year}-01-01'
     end_date = today.strftime('%Y-%m-%d')
     
+    falhas = []
     for subdominio in subdominios:
-        df = process_data(subdominio, start_date, end_date)
+        try:
+            df = process_data(subdominio, start_date, end_date, falhar=True)
+        except RuntimeError as e:
+            falhas.append(str(e))
+            print(f"{e}. Pulando para o próximo subdomínio.")
+            continue
         df_total = pd.concat([df_total, df], ignore_index=True)
     
     hora_fim = datetime.now()
     
     if not df_total.empty:
-        file_path = r'dados_atualizaveis.csv'
-        df_total.to_csv(file_path, index=False)
+        # Com algum subdomínio sem dados, os recebimentos dele pareceriam removidos do escopo: os
+        # agregados e a base colunar só são atualizados quando todos responderam
+        if falhas:
+            print(f"{len(falhas)} subdomínio(s) falharam: agregados e base colunar não foram atualizados")
+        # Atualizar os recebimentos agregados por mês apenas com as parcelas alteradas
+        if diretorio_agregados and not falhas:
+            agregados.atualizar(df_total, 'recebidas', diretorio_agregados, escopo=(start_date, end_date))
+        # Gravar a base colunar (subdomínio/ano) usada pelo painel Streamlit
+        if diretorio_colunar and not falhas:
+            with perfil.estagio('write'):
+                particoes.gravar_particionado(df_total, diretorio_colunar, 'recebidas', 'paymentDate')
+        # Guardar o DataFrame (valores numéricos) no cache Arrow lido pelos notebooks
+        with perfil.estagio('write'):
+            cache_arrow.atualizar(df_total, 'recebidas')
+        # Exportar para Excel com valores numéricos, uma planilha por subdomínio
+        if caminho_excel:
+            with perfil.estagio('write'):
+                exportar_excel.exportar(exportar_excel.por_subdominio(df_total), caminho_excel)
+        df_total = formatar_dados(df_total)
+
+        with perfil.estagio('write'):
+            df_total.to_csv(file_path, index=False)
         print(f"Dados atuais salvos em: {file_path}")
         
         # Criar arquivo .txt com informações de tempo
@@ -233,6 +323,12 @@ def save_current_data(subdominios):
         print("Nenhum dado atual disponível para salvar.")
 
 # Exemplos de chamada
-subdominios = ['sej', 'macapainvest']
-#save_historical_data(subdominios, 1994, 2023)
-save_current_data(subdominios)
+if __name__ == "__main__":
+    perfil.configurar_por_argv()  # Use --profile para medir tempo e memória por estágio
+    subdominios = tenants.subdominios('recebidas')  # Registro de tenants (tenants.json)
+    diretorio_agregados = os.path.join('agregados')
+    caminho_excel = 'dados_atualizaveis.xlsx' if '--excel' in sys.argv else None  # Use --excel para gerar a planilha
+    diretorio_colunar = os.path.join('colunar') if particoes.disponivel() else None  # Requer pyarrow
+    #save_historical_data(subdominios, None, None, diretorio_agregados, caminho_excel, diretorio_colunar)  # Anos de cada tenant
+    save_current_data(subdominios, diretorio_agregados, caminho_excel, diretorio_colunar)
+    perfil.finalizar('recebidas')
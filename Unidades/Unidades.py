@@ -3,19 +3,38 @@ import pandas as pd
 import time
 import os  # Importar o módulo os
 from Credenciais import obter_credenciais
+import perfil
+import esquemas
+import tenants
+import formatacao
+import cassete
+import limites_tempo
+import cache_arrow
 
+# Sessão HTTP do módulo: conexões reaproveitadas entre as requisições (e entre os ciclos do
+# servico_atualizacao.py)
+sessao = requests.Session()
+
+# Cassete de gravação/reprodução da API (variável SIENGE_CASSETE; sem ela, não faz nada)
+cassete.ativar_por_ambiente()
 
 # Função para fazer a requisição à API com tentativas e repetições
-def fazer_requisicao(url, subdominio, tentativas=3, intervalo=5):
+def fazer_requisicao(url, subdominio, tentativas=3, intervalo=5, janela=None):
     token = obter_credenciais(subdominio)
     headers = {
         'Authorization': token
     }
     for tentativa in range(tentativas):
         try:
-            response = requests.get(url, headers=headers)
+            with perfil.estagio('fetch', subdominio, janela):  # Orçamento do tenant em limites_tempo.get
+                response = limites_tempo.get(sessao, 'unidades', url, subdominio=subdominio, headers=headers)
             response.raise_for_status()  # Lança uma exceção para erros HTTP
-            return response.json()
+            with perfil.estagio('decode', subdominio, janela):
+                results, metadados = esquemas.decodificar('units', response.content)
+            data = {'results': results}
+            if metadados:
+                data['resultSetMetadata'] = metadados
+            return data
         except requests.HTTPError as http_err:
             print(f"Erro na requisição HTTP: {http_err}")
             print(f"URL: {url}")
@@ -30,6 +49,13 @@ def fazer_requisicao(url, subdominio, tentativas=3, intervalo=5):
                     raise
             else:
                 raise
+        except requests.Timeout as erro_tempo:
+            print(f"Tempo esgotado na requisição: {erro_tempo}")
+            if tentativa < tentativas - 1:
+                print(f"Tentando novamente em {intervalo} segundos...")
+                time.sleep(intervalo)
+            else:
+                raise
 
 # Função para processar os dados da API
 def processar_dados(subdominio):
@@ -42,7 +68,7 @@ def processar_dados(subdominio):
         url = f"{base_url}limit={limit}&offset={offset}"
         print(f"Fazendo requisição para URL: {url}")  # Adiciona logging da URL
         try:
-            data = fazer_requisicao(url, subdominio)
+            data = fazer_requisicao(url, subdominio, janela=f"offset={offset}")
         except requests.HTTPError as e:
             print(f"Erro ao processar dados para subdomínio {subdominio}: {e}")
             break
@@ -67,45 +93,54 @@ def processar_dados(subdominio):
         if offset >= qtd_result:
             break
 
-    return pd.DataFrame(all_data)
+    with perfil.estagio('normalize', subdominio):
+        return pd.DataFrame(all_data)
 
-if __name__ == '__main__':
-    subdominio_macapa = 'macapainvest'
-    subdominio_sej = 'sej'
+# Função para converter, formatar e limpar os dados combinados das unidades
+def tratar_dados(dados_combinados):
+    # Colunas a serem convertidas para int
+    colunas_para_int = ['privateArea', 'enterpriseId', 'indexerId']
 
-    # Medir o tempo de execução
-    tempo_inicio = time.time()
+    # Converter colunas para int
+    for col in colunas_para_int:
+        dados_combinados[col] = dados_combinados[col].astype(int)
 
-    try:
-        dados_macapa = processar_dados(subdominio_macapa)
-        print("Dados de 'Macapa' armazenados em DataFrame.")
+    # Formatar as colunas float com vírgula decimal (sem separador de milhar)
+    with perfil.estagio('format'):
+        colunas_float = dados_combinados.select_dtypes(include='float').columns
+        dados_combinados = formatacao.formatar_colunas(dados_combinados, colunas=colunas_float, milhar='')
 
-        dados_sej = processar_dados(subdominio_sej)
-        print("Dados de 'sej' armazenados em DataFrame.")
+    # Dropar colunas indesejadas
+    colunas_para_dropar = ['childUnits', 'groupings', 'specialValues', 'links', 'subdominio']
+    return dados_combinados.drop(columns=colunas_para_dropar)
 
-        # Concatenar os DataFrames
-        dados_combinados = pd.concat([dados_macapa, dados_sej], ignore_index=True)
-        print("Dados combinados de 'Macapa' e 'sej' armazenados em um único DataFrame.")
+# Função para extrair e tratar as unidades de vários subdomínios em um único DataFrame
+def extrair(subdominios):
+    dados_por_subdominio = []
+    for subdominio in subdominios:
+        dados_por_subdominio.append(processar_dados(subdominio))
+        print(f"Dados de '{subdominio}' armazenados em DataFrame.")
 
-        # Colunas a serem convertidas para int
-        colunas_para_int = ['privateArea', 'enterpriseId', 'indexerId']
+    # Concatenar os DataFrames
+    with perfil.estagio('merge'):
+        dados_combinados = pd.concat(dados_por_subdominio, ignore_index=True)
+    print(f"Dados combinados de {', '.join(subdominios)} armazenados em um único DataFrame.")
 
-        # Converter colunas para int
-        for col in colunas_para_int:
-            dados_combinados[col] = dados_combinados[col].astype(int)
+    # Guardar o DataFrame (valores numéricos) no cache Arrow lido pelos notebooks
+    with perfil.estagio('write'):
+        cache_arrow.atualizar(dados_combinados, 'unidades')
 
-        # Função para substituir ponto por vírgula em valores float
-        def format_float(value):
-            if isinstance(value, float):
-                return f"{value:.2f}".replace('.', ',')
-            return value
+    return tratar_dados(dados_combinados)
 
-        # Aplicar a função de formatação para cada valor no DataFrame
-        dados_combinados = dados_combinados.applymap(format_float)
+if __name__ == '__main__':
+    perfil.configurar_por_argv()  # Use --profile para medir tempo e memória por estágio
+    subdominios = tenants.subdominios('unidades')  # Registro de tenants (tenants.json)
+
+    # Medir o tempo de execução
+    tempo_inicio = time.time()
 
-        # Dropar colunas indesejadas
-        colunas_para_dropar = ['childUnits', 'groupings', 'specialValues', 'links', 'subdominio']
-        dados_combinados = dados_combinados.drop(columns=colunas_para_dropar)
+    try:
+        dados_combinados = extrair(subdominios)
 
         # Caminho do arquivo CSV
         caminho_unidades = 'unidades.csv'
@@ -116,7 +151,8 @@ if __name__ == '__main__':
             print(f"Arquivo existente excluído: {caminho_unidades}")
 
         # Salvar o DataFrame em CSV
-        dados_combinados.to_csv(caminho_unidades, index=False)
+        with perfil.estagio('write'):
+            dados_combinados.to_csv(caminho_unidades, index=False)
         print("Dados combinados salvos em 'unidades'.")
 
     except requests.HTTPError as http_err:
@@ -136,3 +172,5 @@ if __name__ == '__main__':
     with open(caminho_tempo_execucao, 'w') as arquivo_tempo:
         arquivo_tempo.write(f"Tempo de execução: {tempo_execucao:.2f} segundos\n")
     print(f"Tempo de execução salvo em: {caminho_tempo_execucao}")
+
+    perfil.finalizar('unidades')
\ No newline at end of file
@@ -0,0 +1,209 @@
+import os
+from datetime import datetime, date
+import pandas as pd
+
+# Agregados materializados das contas a receber e recebidas, mantidos de forma incremental.
+# Cada execução compara a contribuição de cada parcela (subdominio + ChaveEspecifica) com a
+# execução anterior e só soma/subtrai as parcelas novas, alteradas ou removidas.
+#
+# Arquivos no diretório:
+#   <tabela>.csv           agregado consultado pelos dashboards (poucos KB)
+#   _estado_<tabela>.pkl   contribuição de cada parcela, usada para subtrair valores antigos
+#
+# Os valores de parcelas com várias categorias financeiras são rateados por financialCategoryRate
+# (percentual), para que a soma das linhas da parcela não conte o valor mais de uma vez.
+
+DIMENSOES = ['subdominio', 'companyId', 'projectId', 'costCenterId', 'financialCategoryId']
+
+# Tabela -> coluna de data, granularidade do período e colunas de valor.
+# As contas a receber ficam por dia (e não por mês): o aging conta os dias de atraso de cada
+# vencimento até a data de referência, e com o mês inteiro num só período as parcelas cairiam
+# na faixa errada (ex.: vencidas há 10 ou há 40 dias no mesmo mês). O fluxo previsto soma os
+# dias por mês na consulta.
+TABELAS = {
+    'a_receber': {'data': 'dueDate', 'periodo': 'dia', 'valores': ['correctedBalanceAmount', 'balanceAmount']},
+    'recebidas': {'data': 'paymentDate', 'periodo': 'mes', 'valores': ['netAmount', 'grossAmount']},
+}
+
+# Faixas de aging (dias de atraso): (rótulo, mínimo, máximo)
+FAIXAS_AGING = [
+    ('A vencer', None, 0),
+    ('1-30', 1, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('91-180', 91, 180),
+    ('181-360', 181, 360),
+    ('Acima de 360', 361, None),
+]
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para converter uma coluna de identificadores em texto estável ('12' e não '12.0')
+def _texto(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        serie = pd.to_numeric(serie, errors='coerce').round().astype('Int64')
+    return serie.astype(str).replace({'<NA>': '', 'nan': '', 'None': ''})
+
+
+# Função para calcular a contribuição de cada linha para a tabela agregada
+def contribuicoes(df, tabela):
+    config = TABELAS[tabela]
+    if 'financialCategoryRate' in df.columns:
+        rateio = pd.to_numeric(df['financialCategoryRate'], errors='coerce').fillna(100) / 100
+    else:
+        rateio = pd.Series(1.0, index=df.index)
+
+    contrib = pd.DataFrame({'chave': _texto(df['subdominio']) + '|' + _texto(df['ChaveEspecifica'])})
+    for dimensao in DIMENSOES:
+        contrib[dimensao] = _texto(df[dimensao]) if dimensao in df.columns else ''
+    contrib['data'] = pd.to_datetime(df[config['data']], errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+    for valor in config['valores']:
+        contrib[valor] = pd.to_numeric(df[valor], errors='coerce').fillna(0) * rateio
+    contrib['quantidade'] = rateio
+    return contrib.reset_index(drop=True)
+
+
+# Função para agrupar contribuições no formato da tabela agregada
+def agrupar(contrib, tabela):
+    config = TABELAS[tabela]
+    periodo = contrib['data'] if config['periodo'] == 'dia' else contrib['data'].str[:7]
+    colunas = DIMENSOES + ['periodo']
+    return (contrib.assign(periodo=periodo)
+            .groupby(colunas)[config['valores'] + ['quantidade']].sum())
+
+
+# Função para calcular o hash das contribuições de cada parcela
+def _hashes(contrib):
+    hashes_linhas = pd.util.hash_pandas_object(contrib, index=False)
+    return hashes_linhas.groupby(contrib['chave'].values).sum()
+
+
+# Funções para ler e gravar os arquivos do diretório
+def caminho_agregado(diretorio, tabela):
+    return os.path.join(diretorio, f"{tabela}.csv")
+
+
+def caminho_estado(diretorio, tabela):
+    return os.path.join(diretorio, f"_estado_{tabela}.pkl")
+
+
+def ler_agregado(diretorio, tabela):
+    caminho = caminho_agregado(diretorio, tabela)
+    if not os.path.exists(caminho):
+        return None
+    return pd.read_csv(caminho, dtype={dimensao: str for dimensao in DIMENSOES + ['periodo']}, keep_default_na=False)
+
+
+def _gravar_atomico(gravar, caminho):
+    temporario = f"{caminho}.tmp"
+    gravar(temporario)
+    os.replace(temporario, caminho)
+
+
+# Função para marcar as contribuições com data dentro do escopo: (inicio, fim) para todos os
+# subdomínios ou {subdominio: (inicio, fim)}, quando cada tenant tem o seu período
+def _no_escopo(contrib, escopo):
+    if isinstance(escopo, dict):
+        # Subdomínios fora do dicionário ficam fora do escopo (início depois de qualquer data)
+        inicio = contrib['subdominio'].map({subdominio: periodo[0] for subdominio, periodo in escopo.items()}).fillna('~')
+        fim = contrib['subdominio'].map({subdominio: periodo[1] for subdominio, periodo in escopo.items()}).fillna('')
+        return (contrib['data'] >= inicio) & (contrib['data'] <= fim)
+    inicio, fim = escopo
+    return (contrib['data'] >= inicio) & (contrib['data'] <= fim)
+
+
+# Função principal: atualiza o agregado a partir das linhas da execução atual.
+# 'escopo' (inicio, fim) limita a atualização às contribuições com data no período extraído: as
+# de fora do período (outros recebimentos da mesma parcela, por exemplo) ficam como estavam.
+# Com {subdominio: (inicio, fim)}, o período vale por subdomínio.
+# Sem escopo, a execução é tratada como a carteira completa.
+def atualizar(df, tabela, diretorio, escopo=None):
+    os.makedirs(diretorio, exist_ok=True)
+    novo = contribuicoes(df, tabela)
+    if escopo is not None:
+        fora = ~_no_escopo(novo, escopo)
+        if fora.any():
+            log_status(f"Agregado '{tabela}': {int(fora.sum())} linha(s) fora do período extraído ignorada(s)")
+            novo = novo[~fora].reset_index(drop=True)
+
+    # Sem agregado ou estado anteriores, recomeça do zero (a execução atual entra inteira)
+    caminho = caminho_estado(diretorio, tabela)
+    agregado = ler_agregado(diretorio, tabela)
+    if agregado is None or not os.path.exists(caminho):
+        estado = novo.iloc[0:0]
+        agregado = agrupar(estado, tabela)
+    else:
+        estado = pd.read_pickle(caminho)
+        agregado = agregado.set_index(DIMENSOES + ['periodo'])
+
+    # Contribuições fora do escopo não são comparadas nem substituídas
+    preservado = estado.iloc[0:0]
+    if escopo is not None:
+        dentro = _no_escopo(estado, escopo)
+        preservado = estado[~dentro]
+        estado = estado[dentro]
+
+    hashes_novo = _hashes(novo)
+    hashes_estado = _hashes(estado)
+    comuns = hashes_novo.index.intersection(hashes_estado.index)
+    diferentes = comuns[hashes_novo[comuns].values != hashes_estado[comuns].values]
+    alteradas = hashes_novo.index.difference(hashes_estado.index).append(diferentes)
+
+    removidas = set(estado['chave']) - set(hashes_novo.index)
+
+    afetadas = set(alteradas) | removidas
+    saindo = estado[estado['chave'].isin(afetadas)]
+    entrando = novo[novo['chave'].isin(set(alteradas))]
+
+    # Agregado novo = agregado anterior - contribuições antigas + contribuições novas
+    agregado = agregado.add(agrupar(entrando, tabela), fill_value=0).sub(agrupar(saindo, tabela), fill_value=0)
+    agregado = agregado[agregado['quantidade'].abs() > 1e-9].reset_index()
+    estado = pd.concat([preservado, estado[~estado['chave'].isin(afetadas)], entrando], ignore_index=True)
+
+    _gravar_atomico(lambda destino: agregado.to_csv(destino, index=False), caminho_agregado(diretorio, tabela))
+    _gravar_atomico(lambda destino: estado.to_pickle(destino, compression=None), caminho)
+    log_status(f"Agregado '{tabela}' atualizado: {len(alteradas)} parcela(s) nova(s)/alterada(s), "
+               f"{len(removidas)} removida(s), {len(agregado)} linha(s) agregadas")
+    return agregado
+
+
+# Consultas dos dashboards (leem apenas os agregados)
+
+# Função para o saldo em aberto por faixa de aging na data de referência
+def aging(diretorio, data_referencia=None, dimensoes=('subdominio',)):
+    agregado = ler_agregado(diretorio, 'a_receber')
+    referencia = pd.Timestamp(data_referencia or date.today())
+    dias = (referencia - pd.to_datetime(agregado['periodo'], errors='coerce')).dt.days
+
+    faixa = pd.Series('Sem vencimento', index=agregado.index)
+    for rotulo, minimo, maximo in FAIXAS_AGING:
+        filtro = dias.notna()
+        if minimo is not None:
+            filtro &= dias >= minimo
+        if maximo is not None:
+            filtro &= dias <= maximo
+        faixa[filtro] = rotulo
+
+    return (agregado.assign(faixa=faixa)
+            .groupby(list(dimensoes) + ['faixa'])[['correctedBalanceAmount', 'quantidade']].sum()
+            .reset_index())
+
+
+# Função para as entradas previstas por mês de vencimento
+def fluxo_previsto(diretorio, dimensoes=('subdominio',)):
+    agregado = ler_agregado(diretorio, 'a_receber')
+    return (agregado.assign(mes=agregado['periodo'].str[:7])
+            .groupby(list(dimensoes) + ['mes'])[['correctedBalanceAmount', 'quantidade']].sum()
+            .reset_index())
+
+
+# Função para os valores recebidos por mês de pagamento
+def recebido_por_mes(diretorio, dimensoes=('subdominio',)):
+    agregado = ler_agregado(diretorio, 'recebidas')
+    return (agregado.rename(columns={'periodo': 'mes'})
+            .groupby(list(dimensoes) + ['mes'])[['netAmount', 'grossAmount', 'quantidade']].sum()
+            .reset_index())
@@ -0,0 +1,222 @@
+import os
+import time
+from datetime import datetime
+import pandas as pd
+
+# Cache dos DataFrames finais dos extratores em arquivos Arrow IPC (Feather v2), para
+# recarregar nos notebooks sem interpretar os CSVs de novo.
+#
+# A leitura é feita por mapeamento de memória (pa.memory_map): as colunas apontam direto para
+# as páginas do arquivo, sem cópia, e vários kernels do Jupyter que abrem o mesmo arquivo
+# compartilham as mesmas páginas no cache do sistema operacional.
+# Os arquivos ficam sem compressão (compressão obrigaria a descompactar para a memória).
+#
+# Uso no notebook:
+#   import cache_arrow
+#   df = cache_arrow.carregar('a_receber')
+#   df = cache_arrow.carregar('recebidas', colunas=['subdominio', 'paymentDate', 'netAmount'])
+#
+# A gravação pelos extratores é opcional: só acontece com SIENGE_CACHE_ARROW definido, com o
+# diretório do cache ou '1' para o padrão (cache_arrow). A leitura usa o mesmo diretório.
+# Cada gravação cria uma nova versão (<nome>.<versão>.arrow): um arquivo aberto em outro kernel
+# não impede a atualização (no Windows, um arquivo mapeado não pode ser substituído) e as
+# versões antigas são removidas quando ninguém mais as usa.
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+_CONFIGURACAO = os.environ.get('SIENGE_CACHE_ARROW', '')
+ATIVO = _CONFIGURACAO not in ('', '0')  # Gravação pelos extratores
+DIRETORIO = _CONFIGURACAO if _CONFIGURACAO not in ('', '0', '1') else 'cache_arrow'
+EXTENSAO = '.arrow'
+TAMANHO_LOTE = 64 * 1024  # Linhas por lote (record batch) no arquivo
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para verificar se o pyarrow está instalado
+def disponivel():
+    return pa is not None
+
+
+# Função para listar as versões gravadas de um nome: [(versão, caminho)], da mais antiga à mais nova
+def _versoes(nome, diretorio):
+    if not os.path.isdir(diretorio):
+        return []
+    versoes = []
+    for arquivo in os.listdir(diretorio):
+        versao = arquivo[len(nome) + 1:-len(EXTENSAO)]
+        if arquivo.startswith(f"{nome}.") and arquivo.endswith(EXTENSAO) and versao.isdigit():
+            versoes.append((int(versao), os.path.join(diretorio, arquivo)))
+    return sorted(versoes)
+
+
+# Função para o arquivo da versão mais recente de um nome
+def caminho_atual(nome, diretorio=None):
+    diretorio = diretorio or DIRETORIO
+    versoes = _versoes(nome, diretorio)
+    if not versoes:
+        raise FileNotFoundError(f"Cache Arrow '{nome}' não encontrado em {diretorio}. "
+                                f"Execute o extrator com SIENGE_CACHE_ARROW definido.")
+    return versoes[-1][1]
+
+
+# Função para remover as versões antigas (as que ainda estão mapeadas em algum processo no
+# Windows ficam para a próxima gravação)
+def _limpar(nome, diretorio):
+    for _, caminho in _versoes(nome, diretorio)[:-1]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+# Função para gravar os lotes (record batches) de uma nova versão. Retorna o caminho do arquivo.
+def _gravar(nome, diretorio, esquema, lotes):
+    if pa is None:
+        raise ImportError("O cache Arrow requer o pyarrow (pip install pyarrow)")
+    diretorio = diretorio or DIRETORIO
+    os.makedirs(diretorio, exist_ok=True)
+    inicio = time.perf_counter()
+    esquema = esquema.with_metadata({**(esquema.metadata or {}),
+                                     b'gerado_em': datetime.now().isoformat(timespec='seconds').encode()})
+
+    destino = os.path.join(diretorio, f"{nome}.{time.time_ns()}{EXTENSAO}")
+    temporario = f"{destino}.tmp"
+    linhas = 0
+    try:
+        with pa.OSFile(temporario, 'wb') as arquivo, pa.ipc.new_file(arquivo, esquema) as escritor:
+            for lote in lotes:
+                escritor.write_batch(lote.replace_schema_metadata(esquema.metadata))
+                linhas += lote.num_rows
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    os.replace(temporario, destino)
+    _limpar(nome, diretorio)
+    log_status(f"Cache Arrow '{nome}' gravado em {destino}: {linhas} linha(s) em {time.perf_counter() - inicio:.1f} s")
+    return destino
+
+
+# Função para gravar um DataFrame no cache. Retorna o caminho do arquivo.
+def salvar(df, nome, diretorio=None):
+    if pa is None:
+        raise ImportError("O cache Arrow requer o pyarrow (pip install pyarrow)")
+    df = df.copy(deep=False)
+    # Colunas de texto com tipos mistos viram 'string' para o Arrow (como na base colunar)
+    for coluna in df.columns[df.dtypes == object]:
+        df[coluna] = df[coluna].astype('string')
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    return _gravar(nome, diretorio, tabela.schema, tabela.to_batches(max_chunksize=TAMANHO_LOTE))
+
+
+# Função para o tipo Arrow de cada coluna de um CSV, lido em blocos: inteiros, decimais e
+# booleanos quando todos os blocos concordam, texto nos demais casos (colunas só com vazios
+# também viram texto)
+def _tipos_csv(caminho_csv, opcoes_csv):
+    tipos = {}
+    for bloco in pd.read_csv(caminho_csv, chunksize=TAMANHO_LOTE, **opcoes_csv):
+        for coluna in bloco.columns:
+            serie = bloco[coluna]
+            if serie.isna().all():
+                tipos.setdefault(coluna, None)
+                continue
+            if pd.api.types.is_bool_dtype(serie):
+                tipo = pa.bool_()
+            elif pd.api.types.is_integer_dtype(serie):
+                tipo = pa.int64()
+            elif pd.api.types.is_float_dtype(serie):
+                tipo = pa.float64()
+            else:
+                tipo = pa.large_string()
+            anterior = tipos.get(coluna)
+            if anterior is None or anterior == tipo:
+                tipos[coluna] = tipo
+            elif {anterior, tipo} == {pa.int64(), pa.float64()}:
+                tipos[coluna] = pa.float64()
+            else:
+                tipos[coluna] = pa.large_string()
+    return pa.schema([(coluna, tipo or pa.large_string()) for coluna, tipo in tipos.items()])
+
+
+# Função para gravar no cache um CSV gravado em partes (vendas, clientes), sem carregá-lo
+# inteiro: uma leitura em blocos descobre os tipos e a segunda grava os lotes
+def salvar_csv(caminho_csv, nome, diretorio=None, **opcoes_csv):
+    if pa is None:
+        raise ImportError("O cache Arrow requer o pyarrow (pip install pyarrow)")
+    esquema = _tipos_csv(caminho_csv, opcoes_csv)
+    tipos_pandas = {campo.name: {pa.int64(): 'int64', pa.float64(): 'float64', pa.bool_(): 'boolean'}.get(campo.type, 'string')
+                    for campo in esquema}
+    blocos = pd.read_csv(caminho_csv, chunksize=TAMANHO_LOTE, dtype=tipos_pandas, **opcoes_csv)
+    return _gravar(nome, diretorio, esquema,
+                   (pa.RecordBatch.from_pandas(bloco, schema=esquema, preserve_index=False) for bloco in blocos))
+
+
+# Funções usadas pelos extratores: gravam o cache se o pyarrow estiver instalado e o cache
+# estiver ligado (SIENGE_CACHE_ARROW ou 'diretorio' informado). Uma falha no cache não
+# interrompe a extração.
+def atualizar(df, nome, diretorio=None):
+    if pa is None or not (diretorio or ATIVO):
+        return None
+    try:
+        return salvar(df, nome, diretorio)
+    except (OSError, ValueError, pa.ArrowException) as erro:
+        log_status(f"Cache Arrow '{nome}' não foi gravado: {erro}")
+        return None
+
+
+# (para os CSVs gravados em partes, sem o DataFrame inteiro em memória: vendas, clientes)
+def atualizar_csv(caminho_csv, nome, diretorio=None, **opcoes_csv):
+    if pa is None or not (diretorio or ATIVO) or not os.path.exists(caminho_csv):
+        return None
+    try:
+        return salvar_csv(caminho_csv, nome, diretorio, **opcoes_csv)
+    except (OSError, ValueError, pa.ArrowException) as erro:  # Inclui erros de leitura do CSV
+        log_status(f"Cache Arrow '{nome}' não foi gravado: {erro}")
+        return None
+
+
+# Função para abrir o cache como tabela Arrow mapeada em memória (sem cópia)
+def ler_tabela(nome, colunas=None, diretorio=None):
+    if pa is None:
+        raise ImportError("O cache Arrow requer o pyarrow (pip install pyarrow)")
+    # O mapeamento continua válido enquanto a tabela (ou colunas dela) estiver em uso
+    tabela = pa.ipc.open_file(pa.memory_map(caminho_atual(nome, diretorio), 'r')).read_all()
+    return tabela.select(colunas) if colunas else tabela
+
+
+# Função para carregar o cache como DataFrame.
+# Com 'tipos_arrow' (padrão), as colunas usam tipos do pandas apoiados no Arrow (pd.ArrowDtype)
+# e continuam apontando para o arquivo mapeado: carga sem cópia. Sem 'tipos_arrow', as colunas
+# viram os tipos numpy de sempre (cópia para a memória do processo, como ao ler o CSV).
+def carregar(nome, colunas=None, diretorio=None, tipos_arrow=True):
+    tabela = ler_tabela(nome, colunas, diretorio)
+    if tipos_arrow:
+        return tabela.to_pandas(types_mapper=pd.ArrowDtype)
+    return tabela.to_pandas()
+
+
+# Função para listar o que há no cache: {nome: {'caminho', 'gerado_em', 'linhas', 'colunas'}}
+def listar(diretorio=None):
+    diretorio = diretorio or DIRETORIO
+    if pa is None or not os.path.isdir(diretorio):
+        return {}
+    nomes = {partes[0] for partes in (arquivo.rsplit('.', 2) for arquivo in os.listdir(diretorio))
+             if len(partes) == 3 and partes[1].isdigit() and f".{partes[2]}" == EXTENSAO}
+    conteudo = {}
+    for nome in sorted(nomes):
+        caminho = caminho_atual(nome, diretorio)
+        leitor = pa.ipc.open_file(pa.memory_map(caminho, 'r'))
+        metadados = leitor.schema.metadata or {}
+        conteudo[nome] = {
+            'caminho': caminho,
+            'gerado_em': metadados.get(b'gerado_em', b'').decode(),
+            'linhas': sum(leitor.get_batch(indice).num_rows for indice in range(leitor.num_record_batches)),
+            'colunas': leitor.schema.names,
+        }
+    return conteudo
@@ -0,0 +1,40 @@
+import os
+import sys
+import importlib.util
+from importlib.machinery import SourceFileLoader
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+# Scripts de extração do repositório (alguns não são importáveis pelo nome, ex.: 'Contas_A_Receber_2.0.PY')
+SCRIPTS = {
+    'a_receber': os.path.join('A_RECEBER', 'Contas_A_Receber_2.0.PY'),
+    'recebidas': os.path.join('RECEBIDAS', 'CONTAS_RECEBIDAS_FINAL.py'),
+    'extratos': 'Extratos.py',
+    'vendas': 'vendas.py',
+    'unidades': os.path.join('Unidades', 'Unidades.py'),
+    'clientes': 'gerar_tels.py',
+}
+
+_carregados = {}
+
+
+# Função para carregar um script de extração como módulo, sem executar o bloco __main__
+def carregar_script(nome):
+    if nome in _carregados:
+        return _carregados[nome]
+    if nome not in SCRIPTS:
+        raise ValueError(f"Script não reconhecido: {nome}")
+
+    # Os scripts importam módulos da raiz (Credenciais, perfil)
+    if DIRETORIO_RAIZ not in sys.path:
+        sys.path.insert(0, DIRETORIO_RAIZ)
+
+    caminho = os.path.join(DIRETORIO_RAIZ, SCRIPTS[nome])
+    nome_modulo = f"sienge_{nome}"
+    loader = SourceFileLoader(nome_modulo, caminho)
+    spec = importlib.util.spec_from_loader(nome_modulo, loader)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome_modulo] = modulo
+    loader.exec_module(modulo)
+    _carregados[nome] = modulo
+    return modulo
@@ -0,0 +1,257 @@
+import os
+import gzip
+import json
+import time
+import atexit
+import base64
+import asyncio
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Cassete de gravação/reprodução das respostas da API Sienge, para medir versões do código de
+# transformação com as mesmas entradas (dados de produção), sem rede.
+#
+# Ativação por variáveis de ambiente (lidas por todos os extratores na importação):
+#   SIENGE_CASSETE=gravar:caminho.cassete      grava as respostas reais
+#   SIENGE_CASSETE=reproduzir:caminho.cassete  responde a partir do cassete, sem acessar a API
+#   SIENGE_CASSETE_VELOCIDADE=0                sem espera (padrão); 1 = latências gravadas; 2 = duas vezes mais rápido
+#
+# O cassete é um JSON Lines compactado com gzip: uma resposta por linha (método, URL, status,
+# cabeçalhos, corpo e latência). Os cabeçalhos da requisição (Authorization) não são gravados,
+# nem cookies da resposta. Requisições repetidas (mesmo método e URL) são reproduzidas na
+# ordem em que foram gravadas; a última resposta se repete quando a fila acaba.
+# Intercepta requests.Session.send (requests.get também passa por ele) e
+# aiohttp.ClientSession._request.
+
+CABECALHOS_IGNORADOS = {'set-cookie', 'authorization', 'content-encoding', 'transfer-encoding', 'content-length'}
+
+_lock = threading.Lock()
+_modo = None
+_arquivo = None
+_respostas = {}
+_velocidade = 0.0
+_originais = {}
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para a chave de uma requisição: método + URL com os parâmetros em ordem
+def _chave(metodo, url, params=None):
+    partes = urlsplit(str(url))
+    parametros = parse_qsl(partes.query, keep_blank_values=True)
+    if params:
+        parametros += [(str(nome), str(valor)) for nome, valor in dict(params).items() if valor is not None]
+    consulta = urlencode(sorted(parametros))
+    return f"{metodo.upper()} {urlunsplit((partes.scheme, partes.netloc, partes.path, consulta, ''))}"
+
+
+# Função para gravar uma resposta no cassete
+def _gravar(chave, status, motivo, cabecalhos, corpo, latencia):
+    try:
+        corpo_texto, codificacao = corpo.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        corpo_texto, codificacao = base64.b64encode(corpo).decode('ascii'), 'base64'
+    registro = {
+        'chave': chave,
+        'status': status,
+        'motivo': motivo,
+        'cabecalhos': {nome: valor for nome, valor in cabecalhos.items() if nome.lower() not in CABECALHOS_IGNORADOS},
+        'corpo': corpo_texto,
+        'codificacao': codificacao,
+        'latencia': round(latencia, 4),
+    }
+    linha = (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+    with _lock:
+        _arquivo.write(linha)
+
+
+# Função para obter a próxima resposta gravada de uma requisição
+def _reproduzir(chave):
+    with _lock:
+        fila = _respostas.get(chave)
+        if not fila:
+            return None
+        registro = fila.pop(0) if len(fila) > 1 else fila[0]
+    if registro['codificacao'] == 'base64':
+        corpo = base64.b64decode(registro['corpo'])
+    else:
+        corpo = registro['corpo'].encode('utf-8')
+    return registro, corpo
+
+
+# Função para a espera simulada de uma resposta reproduzida
+def _espera(registro):
+    return registro['latencia'] / _velocidade if _velocidade > 0 else 0
+
+
+# Função para carregar as respostas de um cassete
+def carregar(caminho):
+    respostas = {}
+    with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            registro = json.loads(linha)
+            respostas.setdefault(registro['chave'], []).append(registro)
+    return respostas
+
+
+def _send_requests(sessao, requisicao, **kwargs):
+    import requests
+
+    chave = _chave(requisicao.method, requisicao.url)
+    if _modo == 'gravar':
+        inicio = time.perf_counter()
+        resposta = _originais['requests'](sessao, requisicao, **kwargs)
+        _gravar(chave, resposta.status_code, resposta.reason, resposta.headers, resposta.content,
+                time.perf_counter() - inicio)
+        return resposta
+
+    gravada = _reproduzir(chave)
+    if gravada is None:
+        raise requests.ConnectionError(f"Cassete sem resposta para {chave}", request=requisicao)
+    registro, corpo = gravada
+    time.sleep(_espera(registro))
+    resposta = requests.Response()
+    resposta.status_code = registro['status']
+    resposta.reason = registro['motivo']
+    resposta.headers = requests.structures.CaseInsensitiveDict(registro['cabecalhos'])
+    resposta._content = corpo
+    resposta.encoding = requests.utils.get_encoding_from_headers(resposta.headers)
+    resposta.url = requisicao.url
+    resposta.request = requisicao
+    return resposta
+
+
+# Resposta aiohttp reproduzida do cassete (interface usada pelos extratores)
+class RespostaGravada:
+    def __init__(self, metodo, url, registro, corpo):
+        import aiohttp
+        from multidict import CIMultiDict, CIMultiDictProxy
+        from yarl import URL
+
+        self.method = metodo
+        self.url = URL(str(url))
+        self.status = registro['status']
+        self.reason = registro['motivo']
+        self.headers = CIMultiDictProxy(CIMultiDict(registro['cabecalhos']))
+        self.request_info = aiohttp.RequestInfo(self.url, metodo, CIMultiDictProxy(CIMultiDict()), self.url)
+        self.history = ()
+        self._corpo = corpo
+
+    async def read(self):
+        return self._corpo
+
+    async def text(self, encoding=None, errors='strict'):
+        return self._corpo.decode(encoding or 'utf-8', errors)
+
+    async def json(self, **kwargs):
+        return json.loads(self._corpo)
+
+    @property
+    def ok(self):
+        return self.status < 400
+
+    def raise_for_status(self):
+        import aiohttp
+
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(self.request_info, self.history, status=self.status,
+                                              message=self.reason, headers=self.headers)
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excecao):
+        pass
+
+
+async def _request_aiohttp(sessao, metodo, url, **kwargs):
+    import aiohttp
+
+    chave = _chave(metodo, url, kwargs.get('params'))
+    if _modo == 'gravar':
+        inicio = time.perf_counter()
+        resposta = await _originais['aiohttp'](sessao, metodo, url, **kwargs)
+        corpo = await resposta.read()  # O corpo fica em memória; o extrator lê a mesma cópia
+        _gravar(chave, resposta.status, resposta.reason, resposta.headers, corpo, time.perf_counter() - inicio)
+        return resposta
+
+    gravada = _reproduzir(chave)
+    if gravada is None:
+        raise aiohttp.ClientConnectionError(f"Cassete sem resposta para {chave}")
+    registro, corpo = gravada
+    await asyncio.sleep(_espera(registro))
+    return RespostaGravada(metodo, url, registro, corpo)
+
+
+# Função para ativar o cassete ('gravar' ou 'reproduzir'); chamadas repetidas são ignoradas
+def ativar(modo, caminho, velocidade=0.0):
+    global _modo, _arquivo, _respostas, _velocidade
+    if modo not in ('gravar', 'reproduzir'):
+        raise ValueError(f"Modo de cassete inválido: {modo} (use gravar ou reproduzir)")
+    with _lock:
+        if _modo is not None:
+            return
+        if modo == 'gravar':
+            _arquivo = gzip.open(caminho, 'ab')
+            atexit.register(desativar)
+        else:
+            _respostas = carregar(caminho)
+        _modo = modo
+        _velocidade = float(velocidade)
+
+    try:
+        import requests
+        _originais['requests'] = requests.Session.send
+        requests.Session.send = _send_requests
+    except ImportError:
+        pass
+    try:
+        import aiohttp
+        _originais['aiohttp'] = aiohttp.ClientSession._request
+        aiohttp.ClientSession._request = _request_aiohttp
+    except ImportError:
+        pass
+    descricao = f"{sum(len(fila) for fila in _respostas.values())} resposta(s)" if modo == 'reproduzir' else 'gravação'
+    log_status(f"Cassete ativo ({modo}): {caminho} - {descricao}")
+
+
+# Função para desativar o cassete (fecha o arquivo gravado e restaura as bibliotecas)
+def desativar():
+    global _modo, _arquivo
+    with _lock:
+        if _arquivo is not None:
+            _arquivo.close()
+            _arquivo = None
+        _modo = None
+    if 'requests' in _originais:
+        import requests
+        requests.Session.send = _originais.pop('requests')
+    if 'aiohttp' in _originais:
+        import aiohttp
+        aiohttp.ClientSession._request = _originais.pop('aiohttp')
+
+
+# Função para saber se as respostas vêm do cassete (sem acesso à API)
+def reproduzindo():
+    return _modo == 'reproduzir'
+
+
+# Função para ativar o cassete a partir das variáveis de ambiente (sem a variável, não faz nada)
+def ativar_por_ambiente():
+    configuracao = os.environ.get('SIENGE_CASSETE')
+    if not configuracao:
+        return
+    modo, separador, caminho = configuracao.partition(':')
+    if not separador or not caminho:
+        raise ValueError("SIENGE_CASSETE deve ter o formato gravar:caminho ou reproduzir:caminho")
+    ativar(modo, caminho, os.environ.get('SIENGE_CASSETE_VELOCIDADE', '0'))
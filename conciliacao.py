@@ -0,0 +1,339 @@
+import os
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import formatacao
+import particoes
+
+# Conciliação entre as fontes: recebimentos do income (netAmount) x recibos do histórico de
+# extratos (receipt_netReceipt), e saldos em aberto do A_RECEBER x saldo das parcelas no extrato.
+#
+# Cada parcela vira uma chave inteira de 64 bits (subdomínio, empresa, conta, parcela) e as fontes
+# são agregadas e cruzadas por essa chave (junção por hash sobre int64), sem montar chaves em texto.
+# Resultado: divergências por parcela e totais por subdomínio e mês.
+#
+# Bits da chave (sem sinal): subdomínio 6 | empresa 14 | conta 31 | parcela 12
+# Se os valores de uma parte não cabem nos bits (negativos ou grandes demais), essa parte entra na
+# chave pelo código denso do valor (posição entre os valores distintos de todas as fontes).
+BITS = [('subdominio', 6), ('empresa', 14), ('conta', 31), ('parcela', 12)]
+TOLERANCIA = 0.01  # Diferença aceita, em reais
+
+# Fonte -> colunas de empresa, conta, parcela, valor e data; 'agregacao' soma os valores da parcela
+# ou pega o primeiro (saldo repetido nas linhas da parcela)
+FONTES = {
+    'recebidas': {'empresa': 'companyId', 'conta': 'billId', 'parcela': 'installmentId',
+                  'valor': 'netAmount', 'data': 'paymentDate', 'agregacao': 'soma'},
+    'extratos': {'empresa': 'company_id', 'conta': 'billReceivableId', 'parcela': 'installment_id',
+                 'valor': 'receipt_netReceipt', 'data': 'receipt_date', 'agregacao': 'soma'},
+    'a_receber': {'empresa': 'companyId', 'conta': 'billId', 'parcela': 'installmentId',
+                  'valor': 'correctedBalanceAmount', 'data': 'dueDate', 'agregacao': 'soma'},
+    'extratos_saldo': {'empresa': 'company_id', 'conta': 'billReceivableId', 'parcela': 'installment_id',
+                       'valor': 'currentBalance', 'data': 'dueDate', 'agregacao': 'primeiro'},
+}
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para os dicionários das partes da chave cujos valores não cabem nos bits, considerando
+# todas as fontes preparadas: {parte: valores distintos ordenados}
+def dicionarios_chave(preparados):
+    dicionarios = {}
+    for nome, bits in BITS:
+        valores = np.concatenate([preparado[nome].to_numpy() for preparado in preparados])
+        if len(valores) and (valores.min() < 0 or valores.max() >= 1 << bits):
+            dicionarios[nome] = np.unique(valores)
+            log_status(f"Conciliação: valores de {nome} fora de {bits} bits ({valores.min()} a {valores.max()}), "
+                       f"chave montada com {len(dicionarios[nome])} código(s) denso(s)")
+    return dicionarios
+
+
+# Função para montar as chaves compostas (arrays inteiros -> int64). As partes presentes em
+# 'dicionarios' entram pela posição do valor no dicionário.
+def chave_composta(subdominio, empresa, conta, parcela, dicionarios=None):
+    dicionarios = dicionarios or {}
+    chave = np.zeros(len(empresa), dtype=np.int64)
+    for (nome, bits), valores in zip(BITS, (subdominio, empresa, conta, parcela)):
+        valores = np.asarray(valores, dtype=np.int64)
+        if nome in dicionarios:
+            valores = np.searchsorted(dicionarios[nome], valores)
+        if len(valores) and (valores.min() < 0 or valores.max() >= 1 << bits):
+            raise ValueError(f"Valor de {nome} fora do intervalo da chave ({bits} bits): "
+                             f"{valores.min()} a {valores.max()}")
+        chave = (chave << bits) | valores
+    return chave
+
+
+# Função para separar as chaves compostas em colunas (com os valores originais das partes
+# codificadas pelos 'dicionarios')
+def decompor(chaves, dicionarios=None):
+    dicionarios = dicionarios or {}
+    chaves = np.asarray(chaves, dtype=np.int64)
+    partes = {}
+    deslocamento = 0
+    for nome, bits in reversed(BITS):
+        partes[nome] = (chaves >> deslocamento) & ((1 << bits) - 1)
+        if nome in dicionarios:
+            partes[nome] = dicionarios[nome][partes[nome]]
+        deslocamento += bits
+    return {nome: partes[nome] for nome, _ in BITS}
+
+
+# Função para o mês de uma coluna de datas como inteiro (ano * 12 + mês - 1)
+def _mes(serie):
+    datas = pd.to_datetime(serie, errors='coerce')
+    return (datas.dt.year * 12 + datas.dt.month - 1).fillna(-1).astype(np.int32).to_numpy()
+
+
+# Função para preparar uma fonte: DataFrame com as partes da chave (inteiros), mes e valor (linhas
+# sem chave são descartadas; linhas sem valor, como parcelas do extrato sem recebimento, não entram
+# na comparação). A chave é montada depois, em chavear, com os dicionários de todas as fontes.
+def preparar(df, fonte, subdominios):
+    config = FONTES[fonte]
+    ids = {parte: formatacao.ler_numero(df[config[parte]]) for parte in ('empresa', 'conta', 'parcela')}
+    validas = np.ones(len(df), dtype=bool)
+    for valores in ids.values():
+        validas &= valores.notna().to_numpy()
+    codigos = pd.Categorical(df['subdominio'].astype(str), categories=subdominios).codes
+    validas &= codigos >= 0
+
+    valor = formatacao.ler_numero(df[config['valor']])
+    # Parcelas com várias categorias financeiras aparecem em várias linhas: valor rateado
+    if 'financialCategoryRate' in df.columns:
+        valor = valor * formatacao.ler_numero(df['financialCategoryRate']).fillna(100) / 100
+
+    descartadas = int((~validas).sum())
+    if descartadas:
+        log_status(f"Conciliação: {descartadas} linha(s) de {fonte} sem empresa/conta/parcela descartada(s)")
+    validas &= valor.notna().to_numpy()
+    partes = {'subdominio': codigos[validas].astype(np.int64)}
+    for parte in ('empresa', 'conta', 'parcela'):
+        partes[parte] = np.rint(ids[parte].to_numpy()[validas]).astype(np.int64)
+    return pd.DataFrame({**partes, 'mes': _mes(df[config['data']])[validas], 'valor': valor.to_numpy()[validas]})
+
+
+# Função para trocar as partes da chave das fontes preparadas pela chave composta; retorna os
+# dicionários usados (para o decompor)
+def chavear(preparados):
+    dicionarios = dicionarios_chave(preparados)
+    for preparado in preparados:
+        chaves = chave_composta(*(preparado.pop(nome).to_numpy() for nome, _ in BITS), dicionarios)
+        preparado.insert(0, 'chave', chaves)
+    return dicionarios
+
+
+# Função para agregar os valores de um lado por grupo ('soma' ou 'primeiro'); grupos sem linhas
+# desse lado ficam com 0
+def _agregar(grupos, valores, quantidade, agregacao):
+    if agregacao == 'soma':
+        return np.bincount(grupos, weights=valores, minlength=quantidade)
+    resultado = np.zeros(quantidade)
+    unicos, primeiras = np.unique(grupos, return_index=True)
+    resultado[unicos] = valores[primeiras]
+    return resultado
+
+
+# Função para cruzar duas fontes preparadas: agrega cada uma por parcela (e por mês, com
+# 'por_mes') e junta os grupos das duas (junção externa). Os grupos são numerados uma vez
+# com factorize sobre as chaves inteiras das duas fontes juntas, e cada lado é agregado com
+# bincount nesses números, sem índices de pandas.
+# Sem 'por_mes', o mês do resultado é o menor da primeira fonte que tiver a parcela.
+def cruzar(esquerda, direita, fonte_esquerda, fonte_direita, nome_esquerda, nome_direita, por_mes):
+    tamanho_esquerda = len(esquerda)
+    codigos, chaves = pd.factorize(np.concatenate([esquerda['chave'].to_numpy(), direita['chave'].to_numpy()]))
+    meses = np.concatenate([esquerda['mes'].to_numpy(), direita['mes'].to_numpy()]).astype(np.int64)
+
+    if por_mes:
+        menor_mes = int(meses.min(initial=0))
+        faixa = int(meses.max(initial=0)) - menor_mes + 1
+        grupos, unicos = pd.factorize(codigos * faixa + (meses - menor_mes))
+        resultado = pd.DataFrame({'chave': chaves[unicos // faixa], 'mes': (unicos % faixa + menor_mes).astype(np.int32)})
+    else:
+        grupos = codigos
+        resultado = pd.DataFrame({'chave': chaves})
+
+    quantidade = len(resultado)
+    lados = [(fonte_esquerda, nome_esquerda, esquerda, grupos[:tamanho_esquerda], meses[:tamanho_esquerda]),
+             (fonte_direita, nome_direita, direita, grupos[tamanho_esquerda:], meses[tamanho_esquerda:])]
+    if not por_mes:
+        mes = np.full(quantidade, np.iinfo(np.int64).max)
+        for _, _, _, grupos_lado, meses_lado in reversed(lados):
+            menor = np.full(quantidade, np.iinfo(np.int64).max)
+            np.minimum.at(menor, grupos_lado, meses_lado)
+            mes = np.where(menor < np.iinfo(np.int64).max, menor, mes)
+        resultado['mes'] = mes.astype(np.int32)
+    for fonte, nome, preparado, grupos_lado, _ in lados:
+        resultado[nome] = _agregar(grupos_lado, preparado['valor'].to_numpy(), quantidade, FONTES[fonte]['agregacao'])
+    resultado['diferenca'] = resultado[nome_esquerda] - resultado[nome_direita]
+    return resultado
+
+
+# Função para o texto 'AAAA-MM' dos meses inteiros (vazio para data ausente)
+def _texto_mes(meses):
+    return [f"{mes // 12:04d}-{mes % 12 + 1:02d}" if mes >= 0 else '' for mes in meses]
+
+
+# Função para o mês inteiro de um texto 'AAAA-MM'
+def _mes_texto(texto):
+    ano, mes = texto.split('-')[:2]
+    return int(ano) * 12 + int(mes) - 1
+
+
+# Função para o período (mês inicial, mês final) da comparação de recebimentos: o informado
+# ('AAAA-MM'; None em um dos lados usa o limite dos dados) ou os meses cobertos pelo income.
+# O dados_atualizaveis.csv cobre só o ano corrente: sem o período, todo recebimento de anos
+# anteriores no histórico de extratos apareceria como divergência.
+def _periodo_recebido(preparado, periodo):
+    inicio, fim = periodo or (None, None)
+    meses = preparado['mes'][preparado['mes'] >= 0]
+    if inicio is None and len(meses):
+        inicio = int(meses.min())
+    elif inicio is not None:
+        inicio = _mes_texto(inicio)
+    if fim is None and len(meses):
+        fim = int(meses.max())
+    elif fim is not None:
+        fim = _mes_texto(fim)
+    return inicio, fim
+
+
+# Função para manter só as linhas dentro do período (limites None não filtram)
+def _no_periodo(preparado, inicio, fim):
+    filtro = preparado['mes'] >= (inicio if inicio is not None else 0)
+    if fim is not None:
+        filtro &= preparado['mes'] <= fim
+    return preparado[filtro]
+
+
+# Função para as colunas legíveis de um resultado (chave e mês inteiros)
+def _expandir(df, subdominios, dicionarios):
+    df = df.reset_index(drop=True)
+    partes = decompor(df.pop('chave').to_numpy(), dicionarios)
+    df.insert(0, 'subdominio', subdominios[partes['subdominio']])
+    df.insert(1, 'companyId', partes['empresa'])
+    df.insert(2, 'billId', partes['conta'])
+    df.insert(3, 'installmentId', partes['parcela'])
+    df['mes'] = _texto_mes(df['mes'])
+    return df
+
+
+# Função principal: concilia as fontes (DataFrames; a_receber é opcional).
+# Os recebimentos são comparados só no 'periodo' ('AAAA-MM', 'AAAA-MM'); sem ele, nos meses
+# cobertos pelo income. Retorna (divergencias, resumo): parcelas com diferença acima da tolerância e totais por
+# subdomínio e mês (mês de pagamento para os recebimentos e de vencimento para os saldos).
+def conciliar(recebidas, extratos, a_receber=None, tolerancia=TOLERANCIA, periodo=None):
+    inicio = time.perf_counter()
+    fontes = {'recebidas': recebidas, 'extratos': extratos, 'a_receber': a_receber}
+    for nome, df in fontes.items():
+        if df is not None and 'subdominio' not in df.columns:
+            raise ValueError(f"A fonte {nome} não tem a coluna 'subdominio'")
+    subdominios = sorted(set().union(*(df['subdominio'].astype(str).unique() for df in fontes.values() if df is not None)))
+    if len(subdominios) >= 1 << BITS[0][1]:
+        raise ValueError(f"Subdomínios demais para a chave: {len(subdominios)}")
+
+    preparados = {'recebidas': preparar(recebidas, 'recebidas', subdominios),
+                  'extratos': preparar(extratos, 'extratos', subdominios)}
+    if a_receber is not None:
+        preparados['a_receber'] = preparar(a_receber, 'a_receber', subdominios)
+        preparados['extratos_saldo'] = preparar(extratos, 'extratos_saldo', subdominios)
+    dicionarios = chavear(list(preparados.values()))
+
+    recebidas_preparadas = preparados['recebidas']
+    mes_inicial, mes_final = _periodo_recebido(recebidas_preparadas, periodo)
+    if mes_inicial is not None or mes_final is not None:
+        log_status(f"Conciliação de recebimentos de {_texto_mes([mes_inicial])[0] if mes_inicial is not None else 'início'} "
+                   f"a {_texto_mes([mes_final])[0] if mes_final is not None else 'fim'}")
+    comparacoes = {
+        'recebido': cruzar(_no_periodo(recebidas_preparadas, mes_inicial, mes_final),
+                           _no_periodo(preparados['extratos'], mes_inicial, mes_final),
+                           'recebidas', 'extratos', 'recebido_income', 'recebido_extrato', por_mes=True),
+    }
+    if a_receber is not None:
+        comparacoes['saldo'] = cruzar(preparados['a_receber'], preparados['extratos_saldo'],
+                                      'a_receber', 'extratos_saldo', 'saldo_a_receber', 'saldo_extrato', por_mes=False)
+
+    subdominios = np.asarray(subdominios, dtype=object)
+    divergencias = []
+    resumos = []
+    for tipo, comparacao in comparacoes.items():
+        diverge = comparacao['diferenca'].abs() > tolerancia
+        divergencias.append(_expandir(comparacao[diverge].sort_values(['chave', 'mes']), subdominios, dicionarios)
+                            .assign(tipo=tipo))
+
+        tabela = comparacao.rename(columns={'diferenca': f'diferenca_{tipo}'})
+        tabela[f'divergentes_{tipo}'] = diverge.astype(np.int64)
+        tabela['subdominio'] = decompor(tabela.pop('chave').to_numpy())['subdominio']
+        resumos.append(tabela.groupby(['subdominio', 'mes']).sum())
+
+    divergencias = pd.concat(divergencias, ignore_index=True)
+    resumo = pd.concat(resumos, axis=1).fillna(0)
+    for coluna in resumo.columns[resumo.columns.str.startswith('divergentes_')]:
+        resumo[coluna] = resumo[coluna].astype(np.int64)
+    resumo = resumo.sort_index().reset_index()
+    resumo['subdominio'] = subdominios[resumo['subdominio'].to_numpy()]
+    resumo['mes'] = _texto_mes(resumo['mes'])
+
+    log_status(f"Conciliação concluída em {time.perf_counter() - inicio:.1f} s: "
+               f"{len(divergencias)} divergência(s) acima de {tolerancia:.2f}")
+    return divergencias, resumo
+
+
+# Funções para ler as saídas dos extratores (CSVs no padrão brasileiro ou base colunar)
+def ler_csv(caminho, colunas):
+    cabecalho = pd.read_csv(caminho, nrows=0).columns
+    return pd.read_csv(caminho, usecols=[coluna for coluna in colunas if coluna in cabecalho],
+                       dtype=str, keep_default_na=False, na_values=[''])
+
+
+# (sem caminho nem partições na base colunar, retorna None)
+def ler_fonte(fonte, caminho, diretorio_colunar=None):
+    config = FONTES[fonte]
+    colunas = ['subdominio', config['empresa'], config['conta'], config['parcela'], config['valor'], config['data'],
+               'financialCategoryRate']
+    if diretorio_colunar and particoes.listar_particoes(diretorio_colunar, fonte):
+        return particoes.ler(diretorio_colunar, fonte, colunas)
+    return ler_csv(caminho, colunas) if caminho else None
+
+
+# Função para ler o histórico de extratos (CSV largo ou tabelas normalizadas com o prefixo)
+def ler_extratos(caminho):
+    if os.path.exists(f"{caminho}_recebimentos.csv"):
+        recebimentos = pd.read_csv(f"{caminho}_recebimentos.csv")
+        parcelas = pd.read_csv(f"{caminho}_parcelas.csv")
+        contas = pd.read_csv(f"{caminho}_contas.csv", usecols=['subdominio', 'billReceivableId', 'company_id'])
+        chave = ['subdominio', 'billReceivableId']
+        return contas.merge(parcelas, on=chave).merge(recebimentos, on=chave + ['installment_id'], how='left')
+    return pd.read_csv(caminho)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conciliação entre income, histórico de extratos e contas a receber")
+    parser.add_argument('--recebidas', default='dados_atualizaveis.csv', help="CSV do CONTAS_RECEBIDAS_FINAL.py")
+    parser.add_argument('--extratos', default='Extratos_combined.csv',
+                        help="CSV largo do Extratos.py ou prefixo das tabelas normalizadas (ex.: Extratos)")
+    parser.add_argument('--a-receber', help="CSV do Contas_A_Receber_2.0.PY (opcional)")
+    parser.add_argument('--colunar', help="Base colunar (lida no lugar dos CSVs de recebidas/a receber, se existir)")
+    parser.add_argument('--saida', default='conciliacao', help="Prefixo dos arquivos de saída")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--inicio', help="Primeiro mês (AAAA-MM) dos recebimentos comparados (padrão: o do income)")
+    parser.add_argument('--fim', help="Último mês (AAAA-MM) dos recebimentos comparados (padrão: o do income)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    recebidas = ler_fonte('recebidas', args.recebidas, args.colunar)
+    extratos = ler_extratos(args.extratos)
+    a_receber = ler_fonte('a_receber', args.a_receber, args.colunar)
+    log_status(f"Fontes lidas em {time.perf_counter() - inicio:.1f} s")
+
+    divergencias, resumo = conciliar(recebidas, extratos, a_receber, args.tolerancia, (args.inicio, args.fim))
+    divergencias.to_csv(f"{args.saida}_divergencias.csv", index=False)
+    resumo.to_csv(f"{args.saida}_resumo.csv", index=False)
+    log_status(f"Resultados salvos em {args.saida}_divergencias.csv e {args.saida}_resumo.csv")
+
+
+if __name__ == '__main__':
+    main()
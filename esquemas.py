@@ -0,0 +1,212 @@
+import json
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+# Decodificador com validação dos esquemas. Sem msgspec, usa json.loads sem validar
+# (os registros seguem como vieram da API).
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Marca campos cujo tipo não é validado (valor repassado como veio da API)
+QUALQUER = Any
+
+
+# Erro para respostas da API que não seguem o esquema declarado
+class EsquemaIncompativel(ValueError):
+    pass
+
+
+# Esquemas declarados por endpoint.
+# Cada campo é um tipo (int, float, str, bool, QUALQUER), um dicionário (objeto aninhado)
+# ou uma lista com um dicionário (lista de objetos). Todos os campos aceitam null/ausência.
+# Campos não declarados são descartados na decodificação, exceto quando 'preservar_desconhecidos'
+# está ativo (endpoints cuja saída mantém todas as colunas da API: os registros seguem como
+# dicionários e o esquema só valida).
+
+RECEIPT_INCOME = {
+    'grossAmount': float, 'monetaryCorrectionAmount': float, 'interestAmount': float, 'fineAmount': float,
+    'discountAmount': float, 'taxAmount': float, 'netAmount': float, 'additionAmount': float,
+    'insuranceAmount': float, 'dueAdmAmount': float, 'calculationDate': str, 'paymentDate': str,
+    'accountCompanyId': int, 'accountNumber': QUALQUER, 'accountType': QUALQUER, 'sequencialNumber': int,
+    'indexerId': int, 'embeddedInterestAmount': float, 'proRata': QUALQUER,
+}
+
+CATEGORIA_INCOME = {
+    'costCenterId': int, 'costCenterName': str, 'financialCategoryId': QUALQUER, 'financialCategoryName': str,
+    'financialCategoryReducer': QUALQUER, 'financialCategoryType': QUALQUER, 'financialCategoryRate': float,
+}
+
+INCOME = {
+    'companyId': int, 'companyName': str, 'businessAreaId': int, 'businessAreaName': str,
+    'projectId': int, 'projectName': str, 'groupCompanyId': int, 'groupCompanyName': str,
+    'holdingId': int, 'holdingName': str, 'subsidiaryId': int, 'subsidiaryName': str,
+    'businessTypeId': int, 'businessTypeName': str, 'clientId': int, 'clientName': str,
+    'billId': int, 'installmentId': int, 'documentIdentificationId': QUALQUER, 'documentIdentificationName': str,
+    'documentNumber': QUALQUER, 'documentForecast': QUALQUER, 'originId': QUALQUER,
+    'originalAmount': float, 'discountAmount': float, 'taxAmount': float, 'indexerId': int, 'indexerName': str,
+    'dueDate': str, 'issueDate': str, 'billDate': str, 'installmentBaseDate': str, 'balanceAmount': float,
+    'correctedBalanceAmount': float, 'periodicityType': QUALQUER, 'embeddedInterestAmount': float,
+    'interestType': QUALQUER, 'interestRate': float, 'correctionType': QUALQUER, 'interestBaseDate': str,
+    'defaulterSituation': QUALQUER, 'subJudicie': QUALQUER, 'mainUnit': QUALQUER, 'installmentNumber': QUALQUER,
+    'paymentTerm': {'id': QUALQUER, 'descrition': str},
+    'operationTypeId': int, 'operationTypeName': str,
+    'receipts': [RECEIPT_INCOME],
+    'receiptsCategories': [CATEGORIA_INCOME],
+}
+
+RECEIPT_EXTRATO = {
+    'days': QUALQUER, 'date': str, 'value': float, 'extra': float, 'discount': float,
+    'netReceipt': float, 'type': QUALQUER,
+}
+
+PARCELA_EXTRATO = {
+    'id': int, 'annualCorrection': QUALQUER, 'sentToScripturalCharge': QUALQUER,
+    'paymentTerms': {'id': QUALQUER, 'description': str},
+    'baseDate': str, 'originalValue': float, 'dueDate': str, 'indexerId': int, 'calculationDate': str,
+    'currentBalance': float, 'currentBalanceWithAddition': float, 'generatedBillet': QUALQUER,
+    'installmentSituation': QUALQUER, 'installmentNumber': QUALQUER,
+    'receipts': [RECEIPT_EXTRATO],
+}
+
+CUSTOMER_EXTRACT_HISTORY = {
+    'billReceivableId': int,
+    'company': {'id': int, 'name': str},
+    'costCenter': {'id': int, 'name': str},
+    'customer': {'id': int, 'name': str, 'document': QUALQUER},
+    'emissionDate': str, 'lastRenegotiationDate': str, 'correctionDate': str, 'document': QUALQUER,
+    'privateArea': float, 'oldestInstallmentDate': str, 'revokedBillReceivableDate': str,
+    'units': [{'id': int, 'name': str}],
+    'installments': [PARCELA_EXTRATO],
+}
+
+SALES_CONTRACTS = {
+    'companyId': int, 'enterpriseId': int, 'receivableBillId': QUALQUER,
+    'value': float, 'totalSellingValue': float,
+    'salesContractCustomers': [{}], 'salesContractUnits': [{}],
+}
+
+UNITS = {
+    'privateArea': float, 'enterpriseId': int, 'indexerId': int,
+}
+
+CUSTOMERS = {
+    'id': int, 'name': str, 'phones': [{}],
+}
+
+# Endpoint -> (chave da lista de registros no envelope, campos, preservar_desconhecidos)
+ESQUEMAS = {
+    'income': ('data', INCOME, False),
+    'customer-extract-history': ('data', CUSTOMER_EXTRACT_HISTORY, False),
+    'sales-contracts': ('results', SALES_CONTRACTS, True),
+    'units': ('results', UNITS, True),
+    'customers': ('results', CUSTOMERS, True),
+}
+
+# Função para ler um campo de um Struct como nos dicionários da API (nulo = ausente), para os
+# tratamentos que usam registro.get(campo, padrão) receberem os Structs sem conversão
+def _obter(registro, campo, padrao=None):
+    valor = getattr(registro, campo, None)
+    return padrao if valor is None else valor
+
+
+# Função para montar a classe Struct (msgspec) de um esquema declarado
+def _montar_struct(nome, campos):
+    definicao = []
+    for campo, tipo in campos.items():
+        if isinstance(tipo, dict):
+            tipo = _montar_struct(f"{nome}_{campo}", tipo) if tipo else Dict[str, Any]
+        elif isinstance(tipo, list):
+            item = tipo[0]
+            tipo = List[_montar_struct(f"{nome}_{campo}", item) if item else Dict[str, Any]]
+        definicao.append((campo, Optional[tipo], None))
+    return msgspec.defstruct(nome, definicao, namespace={'get': _obter})
+
+
+# Função para montar o decodificador (msgspec) de um endpoint: (decodificador, tipo para validar
+# os registros preservados como dicionários, ou None)
+def _montar_decodificador(endpoint):
+    chave, campos, preservar = ESQUEMAS[endpoint]
+    struct = List[_montar_struct(endpoint.replace('-', '_'), campos)]
+    registro = List[Dict[str, Any]] if preservar else struct
+    envelope = msgspec.defstruct(f"Envelope_{endpoint.replace('-', '_')}",
+                                 [(chave, Optional[registro], None),
+                                  ('resultSetMetadata', Optional[Dict[str, Any]], None)])
+    if preservar:
+        # Alguns endpoints paginados podem devolver a lista de registros sem envelope
+        return msgspec.json.Decoder(Union[envelope, registro]), struct
+    return msgspec.json.Decoder(envelope), None
+
+
+_decodificadores = {}
+
+
+# Função principal: decodifica o corpo da resposta nos registros do esquema declarado.
+# Retorna (registros, resultSetMetadata). Com msgspec, os registros dos endpoints sem
+# 'preservar_desconhecidos' são Structs só com os campos declarados (ler com .get(campo) ou
+# montar o DataFrame com normalizar); os demais, dicionários validados pelo esquema.
+def decodificar(endpoint, conteudo):
+    chave, campos, preservar = ESQUEMAS[endpoint]
+
+    try:
+        if msgspec is not None:
+            if endpoint not in _decodificadores:
+                _decodificadores[endpoint] = _montar_decodificador(endpoint)
+            decodificador, validacao = _decodificadores[endpoint]
+            try:
+                dados = decodificador.decode(conteudo)
+                if isinstance(dados, list):
+                    registros, metadados = dados, {}
+                else:
+                    registros, metadados = getattr(dados, chave) or [], dados.resultSetMetadata or {}
+                if validacao is not None:
+                    msgspec.convert(registros, validacao)  # Validação em C, os dicionários seguem como estão
+            except msgspec.ValidationError as e:
+                raise EsquemaIncompativel(str(e)) from e
+        else:
+            dados = json.loads(conteudo)
+            if isinstance(dados, list) and preservar:
+                registros, metadados = dados, {}
+            elif isinstance(dados, dict):
+                registros, metadados = dados.get(chave) or [], dados.get('resultSetMetadata') or {}
+            else:
+                raise EsquemaIncompativel(f"envelope inesperado ({type(dados).__name__})")
+            if not isinstance(registros, list):
+                raise EsquemaIncompativel(f"'$.{chave}' não é lista")
+    except EsquemaIncompativel as e:
+        raise EsquemaIncompativel(f"Resposta de '{endpoint}' fora do esquema declarado: {e}") from e
+    return registros, metadados
+
+
+# Função para montar as colunas de uma lista de Structs: objetos aninhados viram 'campo.subcampo',
+# listas ficam como estão e campos sempre nulos não geram coluna (como no pd.json_normalize)
+def _colunas_struct(itens, classe, prefixo, colunas):
+    vazio = (None,) * len(classe.__struct_fields__)
+    # Transposição em C: uma tupla de valores por campo
+    transpostos = zip(*[msgspec.structs.astuple(item) if isinstance(item, classe) else vazio for item in itens])
+    for campo, valores in zip(classe.__struct_fields__, transpostos):
+        exemplo = next((valor for valor in valores if valor is not None), None)
+        if exemplo is None:
+            continue
+        if isinstance(exemplo, msgspec.Struct):
+            _colunas_struct(valores, type(exemplo), f"{prefixo}{campo}.", colunas)
+        else:
+            colunas[f"{prefixo}{campo}"] = valores
+
+
+# Função para montar o DataFrame dos registros decodificados (lista ou Series, como no
+# pd.json_normalize). Com os Structs, as colunas são lidas direto dos atributos, sem montar
+# dicionários intermediários.
+def normalizar(registros):
+    if msgspec is None:
+        return pd.json_normalize(registros)
+    itens = list(registros)
+    classe = next((type(item) for item in itens if isinstance(item, msgspec.Struct)), None)
+    if classe is None:
+        return pd.json_normalize(registros)
+    colunas = {}
+    _colunas_struct(itens, classe, '', colunas)
+    indice = registros.index if isinstance(registros, pd.Series) else None
+    return pd.DataFrame(colunas, index=indice if indice is not None else pd.RangeIndex(len(itens)))
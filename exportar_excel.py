@@ -0,0 +1,157 @@
+import re
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Exportação para Excel em modo somente escrita (streaming), com memória limitada.
+# Usa xlsxwriter (constant_memory) quando disponível, senão openpyxl (write_only).
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+LIMITE_LINHAS_EXCEL = 1_048_576  # Limite de linhas por planilha, incluindo o cabeçalho
+TAMANHO_BLOCO = 50_000  # Linhas convertidas por vez para objetos Python
+CASAS_PADRAO = 2  # Casas decimais das colunas de valor (float) sem regra
+IDENTIFICADOR = re.compile(r'(^id|_id|Id)$')  # companyId, billId, unit_id...: sem formato de número
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para gerar um nome de planilha válido (máx. 31 caracteres, sem []:*?/\)
+def nome_planilha(nome, parte=1):
+    nome = re.sub(r'[\[\]:*?/\\]', '_', str(nome)) or 'Dados'
+    sufixo = f" ({parte})" if parte > 1 else ''
+    return nome[:31 - len(sufixo)] + sufixo
+
+
+# Função para separar um DataFrame em uma planilha por subdomínio. Os grupos são gerados um a
+# um, na hora de gravar cada planilha (sem copiar o DataFrame inteiro de uma vez).
+def por_subdominio(df, coluna='subdominio'):
+    codigos, subdominios = pd.factorize(df[coluna], sort=True)  # Vazios ficam de fora (-1), como no groupby
+    ordem = np.argsort(codigos, kind='stable')
+    limites = np.searchsorted(codigos[ordem], np.arange(len(subdominios) + 1))
+    for indice, subdominio in enumerate(subdominios):
+        yield subdominio, df.iloc[ordem[limites[indice]:limites[indice + 1]]]
+
+
+# Função para percorrer o DataFrame em blocos de linhas (None no lugar de NaN)
+def _blocos(df, tamanho_bloco):
+    for inicio in range(0, len(df), tamanho_bloco):
+        bloco = df.iloc[inicio:inicio + tamanho_bloco]
+        bloco = bloco.astype(object).where(bloco.notna(), None)
+        yield from bloco.itertuples(index=False, name=None)
+
+
+# Função para o formato de número de cada coluna: {índice da coluna: num_format}.
+# Padrão: colunas de valor (float) com 2 casas; inteiros e identificadores sem formato.
+# 'regras' ({coluna: casas decimais}, None = sem formato) segue o formatacao.formatar_colunas.
+def _formatos_colunas(df, regras=None):
+    regras = regras or {}
+    formatos = {}
+    for indice, coluna in enumerate(df.columns):
+        if coluna in regras:
+            casas = regras[coluna]
+        elif pd.api.types.is_float_dtype(df[coluna]) and not IDENTIFICADOR.search(str(coluna)):
+            casas = CASAS_PADRAO
+        else:
+            casas = None
+        if casas is not None:
+            formatos[indice] = '#,##0' + ('.' + '0' * casas if casas else '')
+    return formatos
+
+
+def _exportar_xlsxwriter(planilhas, caminho, tamanho_bloco, regras):
+    workbook = xlsxwriter.Workbook(caminho, {'constant_memory': True, 'nan_inf_to_errors': True})
+    formato_cabecalho = workbook.add_format({'bold': True})
+    formatos = {}  # num_format -> formato do workbook
+    total = 0
+    try:
+        for nome, df in planilhas:
+            colunas = list(df.columns)
+            formatos_colunas = {indice: formatos.setdefault(num_format, workbook.add_format({'num_format': num_format}))
+                                for indice, num_format in _formatos_colunas(df, regras).items()}
+            parte, linha, worksheet = 0, LIMITE_LINHAS_EXCEL, None
+            for valores in _blocos(df, tamanho_bloco):
+                # Nova planilha ao atingir o limite de linhas do Excel
+                if linha >= LIMITE_LINHAS_EXCEL:
+                    parte += 1
+                    worksheet = workbook.add_worksheet(nome_planilha(nome, parte))
+                    for indice, formato in formatos_colunas.items():
+                        worksheet.set_column(indice, indice, None, formato)
+                    worksheet.write_row(0, 0, colunas, formato_cabecalho)
+                    linha = 1
+                worksheet.write_row(linha, 0, valores)
+                linha += 1
+                total += 1
+            if worksheet is None:
+                workbook.add_worksheet(nome_planilha(nome)).write_row(0, 0, colunas, formato_cabecalho)
+    finally:
+        workbook.close()
+    return total
+
+
+# Função para uma célula do modo somente escrita do openpyxl com formato (negrito ou número)
+def _celula(worksheet, valor, num_format=None, negrito=False):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    celula = WriteOnlyCell(worksheet, value=valor)
+    if num_format:
+        celula.number_format = num_format
+    if negrito:
+        celula.font = Font(bold=True)
+    return celula
+
+
+# No modo somente escrita não há formato por coluna: as células das colunas com formato de
+# número são gravadas como WriteOnlyCell, as demais como valores simples
+def _exportar_openpyxl(planilhas, caminho, tamanho_bloco, regras):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    total = 0
+    for nome, df in planilhas:
+        colunas = list(df.columns)
+        formatos_colunas = _formatos_colunas(df, regras)
+        parte, linha, worksheet = 0, LIMITE_LINHAS_EXCEL, None
+        for valores in _blocos(df, tamanho_bloco):
+            if linha >= LIMITE_LINHAS_EXCEL:
+                parte += 1
+                worksheet = workbook.create_sheet(nome_planilha(nome, parte))
+                worksheet.append([_celula(worksheet, coluna, negrito=True) for coluna in colunas])
+                linha = 1
+            if formatos_colunas:
+                valores = list(valores)
+                for indice, num_format in formatos_colunas.items():
+                    valores[indice] = _celula(worksheet, valores[indice], num_format)
+            worksheet.append(valores)
+            linha += 1
+            total += 1
+        if worksheet is None:
+            worksheet = workbook.create_sheet(nome_planilha(nome))
+            worksheet.append([_celula(worksheet, coluna, negrito=True) for coluna in colunas])
+    workbook.save(caminho)
+    return total
+
+
+# Função principal: grava várias planilhas ({nome: DataFrame} ou pares (nome, DataFrame), como
+# os de por_subdominio) em um arquivo .xlsx.
+# As colunas numéricas devem chegar numéricas (antes da formatação pt-BR em texto).
+# 'regras' ajusta as casas decimais do formato por coluna.
+def exportar(planilhas, caminho, tamanho_bloco=TAMANHO_BLOCO, regras=None):
+    inicio = time.perf_counter()
+    if isinstance(planilhas, dict):
+        planilhas = planilhas.items()
+    if xlsxwriter is not None:
+        total = _exportar_xlsxwriter(planilhas, caminho, tamanho_bloco, regras)
+    else:
+        total = _exportar_openpyxl(planilhas, caminho, tamanho_bloco, regras)
+    duracao = time.perf_counter() - inicio
+    log_status(f"Excel salvo em {caminho}: {total} linha(s) em {duracao:.1f} s "
+               f"({total / duracao if duracao else 0:,.0f} linhas/s)")
+    return total
@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime
+import pandas as pd
+from carregador import carregar_script
+import tenants
+import cache_arrow
+
+# Fila de trabalho em SQLite para distribuir extrações entre processos e máquinas.
+# O arquivo da fila e a pasta de resultados devem ficar em um diretório compartilhado.
+# Observação: o travamento do SQLite depende do sistema de arquivos; em compartilhamentos
+# de rede (SMB/NFS) use o modo de journal padrão (DELETE), nunca WAL.
+# Segurança: os resultados parciais são pickles, e consolidar executa o que estiver neles ao
+# carregá-los. A fila e a pasta de resultados só podem ser graváveis por usuários confiáveis.
+
+DURACAO_LEASE = 300  # Segundos que um trabalhador mantém a tarefa sem renovar
+INTERVALO_HEARTBEAT = 60  # Intervalo de renovação do lease
+MAX_TENTATIVAS = 3
+LIMITE_PAGINA = 200
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para abrir a conexão com a fila, criando a tabela se necessário
+def conectar(caminho_fila):
+    conexao = sqlite3.connect(caminho_fila, timeout=60, isolation_level=None)
+    conexao.execute("""
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            endpoint TEXT NOT NULL,
+            subdominio TEXT NOT NULL,
+            parametros TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            trabalhador TEXT,
+            lease_ate REAL,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT,
+            atualizado_em REAL,
+            UNIQUE (endpoint, subdominio, parametros)
+        )
+    """)
+    return conexao
+
+
+# Função para inserir tarefas na fila (tarefas repetidas são ignoradas)
+def enfileirar(caminho_fila, endpoint, subdominio, parametros_lista):
+    conexao = conectar(caminho_fila)
+    agora = time.time()
+    inseridas = 0
+    try:
+        conexao.execute("BEGIN IMMEDIATE")
+        for parametros in parametros_lista:
+            inseridas += conexao.execute(
+                "INSERT OR IGNORE INTO tarefas (endpoint, subdominio, parametros, atualizado_em) VALUES (?, ?, ?, ?)",
+                (endpoint, subdominio, json.dumps(parametros, sort_keys=True), agora)).rowcount
+        conexao.execute("COMMIT")
+    finally:
+        conexao.close()
+    log_status(f"{inseridas} tarefa(s) de {endpoint} enfileirada(s) para o subdomínio: {subdominio}")
+    return inseridas
+
+
+# Função para arrendar a próxima tarefa pendente ou com lease expirado.
+# Lease expirado conta como tentativa (o trabalhador caiu no meio da tarefa): ao atingir
+# MAX_TENTATIVAS, a tarefa é marcada como 'falhou' em vez de ser arrendada de novo.
+def arrendar(conexao, trabalhador):
+    agora = time.time()
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        while True:
+            linha = conexao.execute("""
+                SELECT id, endpoint, subdominio, parametros, tentativas, status, trabalhador FROM tarefas
+                WHERE status = 'pendente' OR (status = 'em_execucao' AND lease_ate < ?)
+                ORDER BY id LIMIT 1
+            """, (agora,)).fetchone()
+            if linha is None:
+                conexao.execute("COMMIT")
+                return None
+            tentativas = linha[4]
+            if linha[5] == 'em_execucao':
+                tentativas += 1
+                if tentativas >= MAX_TENTATIVAS:
+                    conexao.execute(
+                        "UPDATE tarefas SET status = 'falhou', tentativas = ?, lease_ate = NULL, erro = ?, atualizado_em = ? "
+                        "WHERE id = ?",
+                        (tentativas, f"Lease expirado (trabalhador {linha[6]})", agora, linha[0]))
+                    log_status(f"Tarefa {linha[0]} marcada como falha após {tentativas} lease(s) expirado(s)")
+                    continue
+            conexao.execute(
+                "UPDATE tarefas SET status = 'em_execucao', trabalhador = ?, lease_ate = ?, tentativas = ?, atualizado_em = ? "
+                "WHERE id = ?",
+                (trabalhador, agora + DURACAO_LEASE, tentativas, agora, linha[0]))
+            conexao.execute("COMMIT")
+            break
+    except Exception:
+        conexao.execute("ROLLBACK")
+        raise
+    return {
+        'id': linha[0],
+        'endpoint': linha[1],
+        'subdominio': linha[2],
+        'parametros': json.loads(linha[3]),
+        'tentativas': tentativas,
+    }
+
+
+# Função para renovar o lease de uma tarefa (heartbeat); retorna False se o lease foi perdido
+def renovar(conexao, tarefa_id, trabalhador):
+    agora = time.time()
+    cursor = conexao.execute(
+        "UPDATE tarefas SET lease_ate = ?, atualizado_em = ? WHERE id = ? AND trabalhador = ? AND status = 'em_execucao'",
+        (agora + DURACAO_LEASE, agora, tarefa_id, trabalhador))
+    return cursor.rowcount == 1
+
+
+# Função para marcar a tarefa como concluída (somente pelo dono do lease)
+def concluir(conexao, tarefa_id, trabalhador):
+    cursor = conexao.execute(
+        "UPDATE tarefas SET status = 'concluida', lease_ate = NULL, erro = NULL, atualizado_em = ? "
+        "WHERE id = ? AND trabalhador = ? AND status = 'em_execucao'",
+        (time.time(), tarefa_id, trabalhador))
+    return cursor.rowcount == 1
+
+
+# Função para registrar falha; a tarefa volta para a fila até atingir MAX_TENTATIVAS
+def falhar(conexao, tarefa_id, trabalhador, erro):
+    conexao.execute("""
+        UPDATE tarefas SET
+            tentativas = tentativas + 1,
+            status = CASE WHEN tentativas + 1 >= ? THEN 'falhou' ELSE 'pendente' END,
+            lease_ate = NULL, erro = ?, atualizado_em = ?
+        WHERE id = ? AND trabalhador = ? AND status = 'em_execucao'
+    """, (MAX_TENTATIVAS, str(erro), time.time(), tarefa_id, trabalhador))
+
+
+# Função para contar as tarefas por endpoint e status
+def resumo(caminho_fila):
+    conexao = conectar(caminho_fila)
+    try:
+        return conexao.execute(
+            "SELECT endpoint, status, COUNT(*) FROM tarefas GROUP BY endpoint, status ORDER BY endpoint, status").fetchall()
+    finally:
+        conexao.close()
+
+
+# Função para gerar intervalos de datas (mesma regra de janelas dos extratores)
+def gerar_janelas(start_year, end_year, interval):
+    janelas = []
+    for year in range(start_year, end_year + 1, interval):
+        janelas.append({'inicio': f'{year}-01-01', 'fim': f'{min(year + interval - 1, end_year)}-12-31'})
+    return janelas
+
+
+# Funções que executam uma tarefa e retornam um DataFrame.
+# Falha na busca gera exceção (e não um resultado vazio), para a fila tentar de novo.
+def executar_a_receber(subdominio, parametros):
+    return carregar_script('a_receber').process_data(subdominio, parametros['inicio'], parametros['fim'], falhar=True)
+
+
+def executar_recebidas(subdominio, parametros):
+    return carregar_script('recebidas').process_data(subdominio, parametros['inicio'], parametros['fim'], falhar=True)
+
+
+def executar_extratos(subdominio, parametros):
+    extratos = carregar_script('extratos')
+    dados = asyncio.run(extratos.obter_dados_do_extrato(subdominio, parametros['inicio'], parametros['fim']))
+    df = extratos.converter_para_dataframe(dados or {})
+    df['subdominio'] = subdominio
+    return df
+
+
+def url_unidades(subdominio, limit, offset):
+    return f'https://api.sienge.com.br/{subdominio}/public/api/v1/units?limit={limit}&offset={offset}'
+
+
+def executar_unidades(subdominio, parametros):
+    unidades = carregar_script('unidades')
+    data = unidades.fazer_requisicao(url_unidades(subdominio, parametros['limit'], parametros['offset']),
+                                     subdominio, janela=f"offset={parametros['offset']}")
+    results = data.get('results', [])
+    for result in results:
+        result['subdominio'] = subdominio
+    return pd.DataFrame(results)
+
+
+# Funções que gravam o resultado consolidado de um endpoint
+def gravar_a_receber(df, caminho):
+    a_receber = carregar_script('a_receber')
+    a_receber.save_to_csv_in_chunks(a_receber.adjust_data(df), caminho)
+
+
+def gravar_recebidas(df, caminho):
+    gravar_csv(carregar_script('recebidas').formatar_dados(df), caminho)
+
+
+def gravar_csv(df, caminho):
+    df.to_csv(caminho, index=False)
+
+
+def gravar_unidades(df, caminho):
+    gravar_csv(carregar_script('unidades').tratar_dados(df), caminho)
+
+
+# Endpoints disponíveis na fila: como dividir, executar e consolidar
+# ('cache': nome no cache Arrow, quando diferente do endpoint)
+ENDPOINTS = {
+    'a_receber': {'divisao': 'janela', 'intervalo': 5, 'executar': executar_a_receber,
+                  'gravar': gravar_a_receber, 'saida': 'dados_recebidos.csv'},
+    'recebidas': {'divisao': 'janela', 'intervalo': 1, 'executar': executar_recebidas,
+                  'gravar': gravar_recebidas, 'saida': 'dados_historicos.csv', 'cache': 'recebidas_historico'},
+    'extratos': {'divisao': 'janela', 'intervalo': 5, 'executar': executar_extratos,
+                 'gravar': gravar_csv, 'saida': 'Extratos_combined.csv'},
+    'unidades': {'divisao': 'offset', 'executar': executar_unidades,
+                 'gravar': gravar_unidades, 'saida': 'unidades.csv'},
+}
+
+
+# Função do coordenador: divide o trabalho de um endpoint em tarefas
+# Sem subdomínios ou anos informados, usa o registro de tenants (tenants.json)
+def coordenar(caminho_fila, endpoint, subdominios=None, start_year=None, end_year=None):
+    config = ENDPOINTS[endpoint]
+    for subdominio in subdominios or tenants.subdominios(endpoint):
+        if config['divisao'] == 'janela':
+            tenant_inicio, tenant_fim = tenants.intervalo_anos(subdominio)
+            parametros_lista = gerar_janelas(start_year or tenant_inicio, end_year or tenant_fim, config['intervalo'])
+        else:
+            # Consulta apenas a contagem total para dividir em páginas
+            unidades = carregar_script('unidades')
+            data = unidades.fazer_requisicao(url_unidades(subdominio, 1, 0), subdominio)
+            total = data.get('resultSetMetadata', {}).get('count', 0)
+            parametros_lista = [{'offset': offset, 'limit': LIMITE_PAGINA}
+                                for offset in range(0, total, LIMITE_PAGINA)]
+        enfileirar(caminho_fila, endpoint, subdominio, parametros_lista)
+
+
+# Função para o caminho do resultado parcial de uma tarefa
+def caminho_resultado(dir_resultados, endpoint, tarefa_id):
+    return os.path.join(dir_resultados, endpoint, f"{tarefa_id}.pkl")
+
+
+# Loop do trabalhador: arrenda, executa, renova o lease e conclui tarefas até a fila esvaziar
+def trabalhar(caminho_fila, dir_resultados, espera_vazia=0):
+    trabalhador = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    conexao = conectar(caminho_fila)
+    executadas = 0
+
+    while True:
+        tarefa = arrendar(conexao, trabalhador)
+        if tarefa is None:
+            if espera_vazia <= 0:
+                break
+            time.sleep(espera_vazia)
+            continue
+
+        log_status(f"[{trabalhador}] Executando tarefa {tarefa['id']}: {tarefa['endpoint']} - {tarefa['subdominio']} - {tarefa['parametros']}")
+
+        # Heartbeat em thread separada, com conexão própria
+        parar = threading.Event()
+
+        def heartbeat():
+            conexao_heartbeat = conectar(caminho_fila)
+            try:
+                while not parar.wait(INTERVALO_HEARTBEAT):
+                    if not renovar(conexao_heartbeat, tarefa['id'], trabalhador):
+                        log_status(f"[{trabalhador}] Lease perdido para a tarefa {tarefa['id']}")
+                        break
+            finally:
+                conexao_heartbeat.close()
+
+        thread_heartbeat = threading.Thread(target=heartbeat, daemon=True)
+        thread_heartbeat.start()
+        try:
+            df = ENDPOINTS[tarefa['endpoint']]['executar'](tarefa['subdominio'], tarefa['parametros'])
+
+            # Grava o resultado de forma atômica: uma reexecução sobrescreve o mesmo arquivo
+            destino = caminho_resultado(dir_resultados, tarefa['endpoint'], tarefa['id'])
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            temporario = f"{destino}.{trabalhador}.tmp"
+            df.to_pickle(temporario)
+            os.replace(temporario, destino)
+
+            if concluir(conexao, tarefa['id'], trabalhador):
+                executadas += 1
+            else:
+                log_status(f"[{trabalhador}] Tarefa {tarefa['id']} já foi reatribuída; resultado descartado pela fila")
+        except Exception as e:
+            log_status(f"[{trabalhador}] Erro na tarefa {tarefa['id']}: {e}")
+            falhar(conexao, tarefa['id'], trabalhador, e)
+        finally:
+            parar.set()
+            thread_heartbeat.join()
+
+    conexao.close()
+    log_status(f"[{trabalhador}] Encerrado após {executadas} tarefa(s).")
+    return executadas
+
+
+# Função para iniciar vários trabalhadores locais em processos separados
+def trabalhar_em_processos(caminho_fila, dir_resultados, processos, espera_vazia=0):
+    if processos <= 1:
+        return trabalhar(caminho_fila, dir_resultados, espera_vazia)
+    with multiprocessing.Pool(processos) as pool:
+        return sum(pool.starmap(trabalhar, [(caminho_fila, dir_resultados, espera_vazia)] * processos))
+
+
+# Função para juntar os resultados parciais de um endpoint no arquivo final
+def consolidar(caminho_fila, dir_resultados, endpoint, caminho_saida=None, parcial=False):
+    conexao = conectar(caminho_fila)
+    try:
+        linhas = conexao.execute("SELECT id, status FROM tarefas WHERE endpoint = ? ORDER BY id", (endpoint,)).fetchall()
+    finally:
+        conexao.close()
+
+    pendentes = [tarefa_id for tarefa_id, status in linhas if status != 'concluida']
+    if pendentes and not parcial:
+        log_status(f"{len(pendentes)} tarefa(s) de {endpoint} ainda não concluída(s). Use --parcial para consolidar mesmo assim.")
+        return None
+
+    frames = []
+    for tarefa_id, status in linhas:
+        caminho = caminho_resultado(dir_resultados, endpoint, tarefa_id)
+        if status == 'concluida' and os.path.exists(caminho):
+            df = pd.read_pickle(caminho)
+            if not df.empty:
+                frames.append(df)
+
+    if not frames:
+        log_status(f"Nenhum dado foi processado para {endpoint}.")
+        return None
+
+    caminho_saida = caminho_saida or ENDPOINTS[endpoint]['saida']
+    df = pd.concat(frames, ignore_index=True)
+    cache_arrow.atualizar(df, ENDPOINTS[endpoint].get('cache', endpoint))  # Antes da formatação: valores numéricos
+    ENDPOINTS[endpoint]['gravar'](df, caminho_saida)
+    log_status(f"Todos os dados de {endpoint} foram salvos no arquivo: {caminho_saida}")
+    return caminho_saida
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fila de trabalho compartilhada para as extrações da API Sienge")
+    parser.add_argument('--fila', default='fila_trabalho.db', help="Arquivo SQLite da fila (em diretório compartilhado)")
+    parser.add_argument('--resultados', default='resultados_fila', help="Pasta compartilhada para os resultados parciais")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    parser_enfileirar = comandos.add_parser('enfileirar', help="Coordenador: divide e enfileira as tarefas")
+    parser_enfileirar.add_argument('endpoint', choices=sorted(ENDPOINTS))
+    parser_enfileirar.add_argument('--subdominios', nargs='+', help="Padrão: tenants do registro que rodam o endpoint")
+    parser_enfileirar.add_argument('--inicio', type=int, help="Ano inicial (endpoints por janela; padrão do tenant)")
+    parser_enfileirar.add_argument('--fim', type=int, help="Ano final (endpoints por janela; padrão do tenant)")
+
+    parser_trabalhar = comandos.add_parser('trabalhar', help="Trabalhador: executa tarefas até a fila esvaziar")
+    parser_trabalhar.add_argument('--processos', type=int, default=1)
+    parser_trabalhar.add_argument('--espera', type=float, default=0,
+                                  help="Segundos entre consultas com a fila vazia (0 = encerrar quando vazia)")
+
+    parser_consolidar = comandos.add_parser('consolidar', help="Junta os resultados parciais no arquivo final")
+    parser_consolidar.add_argument('endpoint', choices=sorted(ENDPOINTS))
+    parser_consolidar.add_argument('--saida')
+    parser_consolidar.add_argument('--parcial', action='store_true')
+
+    comandos.add_parser('status', help="Mostra a contagem de tarefas por status")
+
+    args = parser.parse_args()
+    if args.comando == 'enfileirar':
+        coordenar(args.fila, args.endpoint, args.subdominios, args.inicio, args.fim)
+    elif args.comando == 'trabalhar':
+        trabalhar_em_processos(args.fila, args.resultados, args.processos, args.espera)
+    elif args.comando == 'consolidar':
+        consolidar(args.fila, args.resultados, args.endpoint, args.saida, args.parcial)
+    else:
+        for endpoint, status, quantidade in resumo(args.fila):
+            print(f"{endpoint:<12} {status:<12} {quantidade:>6}")
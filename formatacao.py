@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Formatação de números no padrão brasileiro (1.234,56) aplicada por coluna.
+# Com pyarrow, os textos são montados com funções vetorizadas do Arrow (conversão de inteiros
+# para texto, preenchimento e junção), sem chamar uma função Python por célula, e vão direto
+# para uma coluna de strings Arrow. Valores que não são representados com exatidão (muito
+# grandes ou a meio centavo do arredondamento) passam pelo formatador do Python, com o mesmo
+# resultado. Sem pyarrow, todos os valores passam pelo formatador do Python.
+#
+# Regras por coluna: {coluna: casas decimais}; None mantém a coluna numérica.
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+CASAS_PADRAO = 2
+
+
+# Função para formatar um valor isolado
+def _formatar_python(valor, casas, milhar, decimal):
+    texto = f'{valor:,.{casas}f}'
+    return texto.translate(str.maketrans({',': milhar, '.': decimal}))
+
+
+# Função para o texto da parte inteira (não negativa), com o separador de milhar: os números
+# a partir de 1000 viram '<milhares><milhar><últimos 3 dígitos>', repetindo para os milhares
+def _texto_inteiros(inteiros, milhar):
+    texto = pc.cast(pa.array(inteiros), pa.string())
+    grandes = inteiros >= 1000
+    if milhar and grandes.any():
+        selecionados = inteiros[grandes]
+        ultimos = pc.utf8_lpad(pc.cast(pa.array(selecionados % 1000), pa.string()), 3, '0')
+        agrupados = pc.binary_join_element_wise(_texto_inteiros(selecionados // 1000, milhar), ultimos, milhar)
+        texto = pc.replace_with_mask(texto, pa.array(grandes), agrupados)
+    return texto
+
+
+# Função para formatar uma série numérica; nulos continuam nulos
+def formatar_numero(serie, casas=CASAS_PADRAO, milhar='.', decimal=','):
+    if len(milhar) > 1 or len(decimal) != 1:
+        raise ValueError("Separadores de milhar e decimal devem ter um caractere")
+    valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    finitos = np.isfinite(valores)
+    if pa is None:
+        return pd.Series([_formatar_python(valor, casas, milhar, decimal) if finito else np.nan
+                          for valor, finito in zip(valores, finitos)], index=serie.index, name=serie.name, dtype=object)
+
+    escala = 10 ** casas
+    with np.errstate(invalid='ignore'):
+        escalados = np.abs(valores) * float(escala)
+        exatos = finitos & (escalados < 2 ** 53) & (np.abs(escalados - np.floor(escalados) - 0.5) > 1e-6)
+    unidades = np.rint(np.where(exatos, escalados, 0)).astype(np.int64)
+    inteiros = unidades // escala
+
+    texto = _texto_inteiros(inteiros, milhar)
+    if casas:
+        fracao = pc.utf8_lpad(pc.cast(pa.array(unidades - inteiros * escala), pa.string()), casas, '0')
+        texto = pc.binary_join_element_wise(texto, fracao, decimal)
+    negativos = np.signbit(valores) & exatos  # Como o Python, -0.001 vira '-0,00'
+    if negativos.any():
+        texto = pc.if_else(pa.array(negativos), pc.binary_join_element_wise('-', texto, ''), texto)
+    texto = pc.if_else(pa.array(finitos), texto, pa.scalar(None, pa.string()))
+
+    inexatos = finitos & ~exatos
+    if inexatos.any():
+        extras = [_formatar_python(valor, casas, milhar, decimal) for valor in valores[inexatos]]
+        texto = pc.replace_with_mask(texto, pa.array(inexatos), pa.array(extras, pa.string()))
+    return pd.Series(pd.arrays.ArrowStringArray(texto), index=serie.index, name=serie.name)
+
+
+# Função para formatar as colunas numéricas de um DataFrame (padrão: todas as float e int).
+# 'regras' ajusta as casas decimais por coluna; None deixa a coluna numérica.
+def formatar_colunas(df, regras=None, colunas=None, milhar='.', decimal=','):
+    regras = regras or {}
+    if colunas is None:
+        colunas = df.select_dtypes(include=['float', 'int']).columns
+    for coluna in colunas:
+        casas = regras.get(coluna, CASAS_PADRAO)
+        if casas is not None:
+            df[coluna] = formatar_numero(df[coluna], casas, milhar, decimal)
+    return df
+
+
+# Função para ler de volta números gravados no padrão brasileiro ('1.234,56' -> 1234.56).
+# Colunas já numéricas passam direto; textos inválidos ou vazios viram NaN.
+def ler_numero(serie, milhar='.', decimal=','):
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64')
+    if pa is not None:  # Com pyarrow, sem converter texto a texto no Python
+        try:
+            texto = pa.array(serie, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            texto = None  # Textos misturados com números: caminho do pandas
+        if texto is not None:
+            if milhar:
+                texto = pc.replace_substring(texto, milhar, '')
+            texto = pc.replace_substring(texto, decimal, '.')
+            validos = pc.match_substring_regex(texto, r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$')
+            numeros = pc.cast(pc.utf8_trim_whitespace(pc.if_else(validos, texto, None)), pa.float64())
+            return pd.Series(numeros.to_numpy(zero_copy_only=False), index=serie.index, name=serie.name)
+
+    # Os valores que já são números passam direto; só os textos são convertidos
+    e_texto = serie.map(lambda valor: isinstance(valor, str)).astype(bool)
+    numeros = pd.to_numeric(serie.where(~e_texto), errors='coerce').astype('float64')
+    texto = serie[e_texto].astype('string')
+    if milhar:
+        texto = texto.str.replace(milhar, '', regex=False)
+    numeros[e_texto] = pd.to_numeric(texto.str.replace(decimal, '.', regex=False),
+                                     errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return numeros
@@ -3,10 +3,19 @@ import asyncio
 import pandas as pd
 import base64
 from Credenciais import obter_credenciais
+import perfil
+import esquemas
+import tenants
+import pipeline
+import cassete
+import limites_tempo
+import cache_arrow
 
+# Cassete de gravação/reprodução da API (variável SIENGE_CASSETE; sem ela, não faz nada)
+cassete.ativar_por_ambiente()
 
 
-# Função assíncrona para fazer a requisição à API com paginação
+# Função assíncrona para fazer a requisição à API com paginação (gerador: uma página por vez)
 async def buscar_clientes(subdominio):
     url = f'https://api.sienge.com.br/{subdominio}/public/api/v1/customers'
     token = obter_credenciais(subdominio)
@@ -15,71 +24,51 @@ async def buscar_clientes(subdominio):
     }
     limit = 200  # Número máximo de registros por página
     offset = 0
-    all_data = []
 
-    while True:
-        params = {
-            'limit': limit,
-            'offset': offset
-        }
-
-        # Imprime que uma requisição está sendo feita
-        print(f"Fazendo requisição para {subdominio} - Offset: {offset}")
-
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
+    # Uma sessão para todas as páginas do subdomínio (conexões reaproveitadas)
+    async with aiohttp.ClientSession() as session:
+        while True:
+            params = {
+                'limit': limit,
+                'offset': offset
+            }
+
+            # Imprime que uma requisição está sendo feita
+            print(f"Fazendo requisição para {subdominio} - Offset: {offset}")
+
+            try:
+                with perfil.estagio('fetch', subdominio, f"offset={offset}"):  # Orçamento em limites_tempo.obter_async
+                    response = await limites_tempo.obter_async(session, 'clientes', url, subdominio=subdominio,
+                                                               headers=headers, params=params)
                     response.raise_for_status()  # Lança uma exceção para erros HTTP
-                    data = await response.json()
-
-                    # Verifica a estrutura dos dados
-                    if isinstance(data, dict) and 'results' in data:
-                        results = data['results']
-                    elif isinstance(data, list):
-                        results = data
-                    else:
-                        raise ValueError("Estrutura de dados inesperada.")
-
-                    if not results:
-                        break  # Sai do loop se não houver mais resultados
-
-                    # Adiciona o subdomínio à cada registro de cliente
-                    for cliente in results:
-                        cliente['subdominio'] = subdominio
+                    corpo = await response.read()
+                # Decodifica validando o esquema declarado (envelope com 'results' ou lista direta)
+                with perfil.estagio('decode', subdominio, f"offset={offset}"):
+                    results, _ = esquemas.decodificar('customers', corpo)
 
-                    all_data.extend(results)
-                    offset += limit  # Atualiza o offset para a próxima página
+                if not results:
+                    break  # Sai do loop se não houver mais resultados
 
-        except aiohttp.ClientError as e:
-            print(f"Erro na requisição para {subdominio}: {e}")
-            break
+                # Adiciona o subdomínio à cada registro de cliente
+                for cliente in results:
+                    cliente['subdominio'] = subdominio
 
-    return all_data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Erro na requisição para {subdominio}: {e}")
+                break
 
-# Função principal assíncrona para buscar clientes de múltiplos subdomínios
-async def main():
-    subdominios = ['macapainvest', 'sej']  # Subdomínios desejados
-    df_clientes = []
-
-    tasks = []  # Lista para armazenar tarefas assíncronas
-    for subdominio in subdominios:
-        tasks.append(buscar_clientes(subdominio))
-
-    # Aguarda todas as tarefas assíncronas
-    results = await asyncio.gather(*tasks)
+            yield results
+            offset += limit  # Atualiza o offset para a próxima página
 
-    # Processa os resultados e cria o DataFrame
-    for clientes in results:
-        if clientes:
-            df_temp = pd.DataFrame(clientes)
-            df_clientes.append(df_temp)
-
-    # Concatenar todos os DataFrames
-    if df_clientes:
-        df_final = pd.concat(df_clientes, ignore_index=True)
+# Função para tratar uma página de clientes (uma linha por telefone).
+# 'inicio' continua o 'indexador_unico' das páginas anteriores.
+def tratar_pagina(clientes, inicio):
+    with perfil.estagio('normalize'):
+        df_final = pd.DataFrame(clientes)
 
+    with perfil.estagio('merge'):
         # Adicionar coluna 'indexador_unico'
-        df_final['indexador_unico'] = df_final.index + 1  # Adiciona o indexador começando de 1
+        df_final['indexador_unico'] = df_final.index + inicio + 1  # Adiciona o indexador começando de 1
 
         # Expandir e tratar colunas que são listas
         colunas_para_expandir = ['phones']
@@ -89,19 +78,52 @@ async def main():
                 df_temp = df_final[['indexador_unico', col]].copy()
                 df_temp[col] = df_temp.apply(lambda row: [{'indexador_unico': row['indexador_unico'], **item} for item in row[col]] if isinstance(row[col], list) else row[col], axis=1)
                 expanded_df = pd.json_normalize(df_temp.explode(col)[col])
+                if 'indexador_unico' not in expanded_df.columns:  # Página sem nenhum telefone
+                    expanded_df['indexador_unico'] = pd.Series(dtype=int)
                 expanded_df = expanded_df.dropna(subset=['indexador_unico'])
                 expanded_df['indexador_unico'] = expanded_df['indexador_unico'].astype(int)
                 df_final = df_final.drop(columns=[col])
                 df_final = pd.merge(df_final, expanded_df, on='indexador_unico', how='left')
-                df_final = df_final.drop(columns=['addresses', 'procurators', 'contacts', 'spouse', 'familyIncome'])
+                df_final = df_final.drop(columns=['addresses', 'procurators', 'contacts', 'spouse', 'familyIncome'], errors='ignore')
+    return df_final
 
-        print("DataFrame final dos clientes:")
-    else:
+# Função principal assíncrona para buscar clientes de múltiplos subdomínios.
+# Busca, tratamento e gravação em pipeline: a página N é tratada enquanto a N+1 é baixada.
+# Retorna {arquivo publicado: linhas} (vazio se nenhum cliente foi buscado)
+async def main():
+    subdominios = tenants.subdominios('clientes')  # Registro de tenants (tenants.json)
+    gravador = pipeline.GravadorCSV('clientes.csv', sep=';')
+    total_clientes = 0
+
+    def tratar(clientes):
+        nonlocal total_clientes
+        df = tratar_pagina(clientes, total_clientes)
+        total_clientes += len(clientes)
+        return df
+
+    def gravar(df):
+        with perfil.estagio('write'):
+            gravador.gravar(df)
+
+    try:
+        await pipeline.executar([buscar_clientes(subdominio) for subdominio in subdominios], tratar, gravar)
+    except BaseException:
+        gravador.descartar()
+        raise
+
+    if not total_clientes:
+        gravador.descartar()
         print("Nenhum cliente foi buscado.")
+        return {}
 
-    # Salvar DataFrame em CSV
-    df_final.to_csv('clientes.csv', index=False, sep=';')
+    linhas = gravador.fechar()
+    print(f"Clientes gravados em clientes.csv: {total_clientes} clientes, {linhas} linhas")
+    with perfil.estagio('write'):
+        cache_arrow.atualizar_csv('clientes.csv', 'clientes', sep=';')
+    return {'clientes.csv': linhas}
 
 # Rodar a função principal
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    perfil.configurar_por_argv()  # Use --profile para medir tempo e memória por estágio
+    asyncio.run(main())
+    perfil.finalizar('clientes')
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import atexit
+import asyncio
+import threading
+import contextlib
+from concurrent.futures import Future, as_completed, TimeoutError as TempoEsgotado
+from datetime import datetime
+import tenants
+import perfil
+
+# Limites de tempo por classe de endpoint e requisições duplicadas ("hedge") contra atrasos.
+#
+# Classes (ajustáveis por SIENGE_TIMEOUT_<CLASSE>=conexao,leitura,total, em segundos):
+#   paginado  páginas de 200 registros (vendas, unidades, clientes)
+#   bulk      janelas da API bulk-data (a receber, recebidas, extratos)
+# Com requests valem conexão e leitura (a leitura é o tempo máximo sem receber bytes);
+# com aiohttp valem os três, incluindo o tempo total da requisição.
+#
+# Hedge (opcional, SIENGE_HEDGE_PERCENTIL=95): quando uma requisição passa do percentil das
+# latências recentes do endpoint, uma cópia é disparada e vale a primeira resposta. As latências
+# ficam em latencias.json (ou no caminho de SIENGE_LATENCIAS) e são aproveitadas nas próximas
+# execuções. Cada tentativa ocupa seu próprio lugar no orçamento do tenant (tenants.orcamento
+# com requests, em thread própria até terminar; tenants.orcamento_async com aiohttp, até
+# terminar ou ser cancelada): a concorrência do tenant nunca passa de max_requisicoes. O tempo
+# até a cópia conta a partir do envio da primeira tentativa (a espera por um lugar no orçamento
+# não conta). Com --profile, essa espera é medida no estágio 'espera', fora do 'fetch'.
+
+CLASSES = {
+    'paginado': {'conexao': 10, 'leitura': 60, 'total': 120},
+    'bulk': {'conexao': 10, 'leitura': 300, 'total': 600},
+}
+ENDPOINTS = {
+    'a_receber': 'bulk',
+    'recebidas': 'bulk',
+    'extratos': 'bulk',
+    'vendas': 'paginado',
+    'unidades': 'paginado',
+    'clientes': 'paginado',
+}
+AMOSTRAS_MAXIMAS = 500  # Latências guardadas por endpoint
+AMOSTRAS_MINIMAS = 20  # Abaixo disso o percentil não é confiável e não há hedge
+HEDGE_MINIMO = 1.0  # Segundos mínimos antes de disparar a cópia
+
+_lock = threading.Lock()
+_latencias = None
+_novas = 0
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para os limites de tempo de um endpoint: {'conexao', 'leitura', 'total'}
+def limites(endpoint):
+    classe = ENDPOINTS.get(endpoint, 'paginado')
+    valores = dict(CLASSES[classe])
+    ajuste = os.environ.get(f"SIENGE_TIMEOUT_{classe.upper()}")
+    if ajuste:
+        conexao, leitura, total = (float(valor) for valor in ajuste.split(','))
+        valores = {'conexao': conexao, 'leitura': leitura, 'total': total}
+    return valores
+
+
+# Função para o timeout do requests: (conexão, leitura)
+def timeout_requests(endpoint):
+    valores = limites(endpoint)
+    return valores['conexao'], valores['leitura']
+
+
+# Função para o timeout do aiohttp
+def timeout_aiohttp(endpoint):
+    import aiohttp
+
+    valores = limites(endpoint)
+    return aiohttp.ClientTimeout(total=valores['total'], sock_connect=valores['conexao'], sock_read=valores['leitura'])
+
+
+# Função para o caminho do histórico de latências
+def caminho_latencias():
+    return os.environ.get('SIENGE_LATENCIAS', 'latencias.json')
+
+
+# Função para carregar o histórico de latências (uma vez por processo)
+def _carregar():
+    global _latencias
+    if _latencias is None:
+        _latencias = {}
+        if os.path.exists(caminho_latencias()):
+            with open(caminho_latencias(), 'r', encoding='utf-8') as arquivo:
+                _latencias = json.load(arquivo)
+        atexit.register(salvar_latencias)
+    return _latencias
+
+
+# Função para gravar o histórico de latências
+def salvar_latencias():
+    with _lock:
+        if not _latencias:
+            return
+        conteudo = json.dumps(_latencias)
+    temporario = f"{caminho_latencias()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho_latencias())
+
+
+# Função para registrar a latência de uma resposta bem-sucedida
+def registrar(endpoint, duracao):
+    global _novas
+    with _lock:
+        amostras = _carregar().setdefault(endpoint, [])
+        amostras.append(round(duracao, 3))
+        del amostras[:-AMOSTRAS_MAXIMAS]
+        _novas += 1
+        salvar = _novas % 50 == 0
+    if salvar:  # Processos longos (servico_atualizacao.py) também guardam o histórico
+        salvar_latencias()
+
+
+# Função para o tempo de espera antes da cópia (None: hedge desligado ou poucas amostras)
+def limite_hedge(endpoint):
+    percentil = os.environ.get('SIENGE_HEDGE_PERCENTIL')
+    if not percentil:
+        return None
+    with _lock:
+        amostras = sorted(_carregar().get(endpoint, []))
+    if len(amostras) < AMOSTRAS_MINIMAS:
+        return None
+    posicao = min(int(len(amostras) * float(percentil) / 100), len(amostras) - 1)
+    return max(amostras[posicao], HEDGE_MINIMO)
+
+
+# Funções para o orçamento do tenant (sem subdomínio, nenhum limite)
+def _orcamento(subdominio):
+    return tenants.orcamento(subdominio) if subdominio else contextlib.nullcontext()
+
+
+def _orcamento_async(subdominio):
+    return tenants.orcamento_async(subdominio) if subdominio else contextlib.nullcontext()
+
+
+# Função para disparar uma tentativa em thread própria, dentro do orçamento do tenant.
+# Retorna (futuro, enviado): 'enviado' é marcado quando a requisição sai. Se 'necessaria()'
+# for falsa quando o lugar no orçamento sair, a tentativa é cancelada sem requisição.
+def _disparar(sessao, url, kwargs, subdominio, necessaria=lambda: True):
+    futuro = Future()
+    enviado = threading.Event()
+
+    def executar():
+        try:
+            with _orcamento(subdominio):
+                enviado.set()
+                if necessaria():
+                    futuro.set_result(sessao.get(url, **kwargs))
+                else:
+                    futuro.cancel()
+        except Exception as e:
+            futuro.set_exception(e)
+        finally:
+            enviado.set()
+
+    threading.Thread(target=executar, name='hedge', daemon=True).start()
+    return futuro, enviado
+
+
+# Função para a primeira resposta sem erro entre as tentativas (se todas falharem, o último erro)
+def _primeira_resposta(futuros):
+    erro = None
+    for futuro in as_completed(futuros):
+        try:
+            return futuro.result()
+        except Exception as e:
+            erro = e
+    raise erro
+
+
+# Função para GET com hedge: a cópia sai se a primeira tentativa passar de 'espera' segundos
+# desde o envio; vale a primeira resposta. Retorna (resposta, duração).
+def _get_com_hedge(sessao, endpoint, url, kwargs, subdominio, espera):
+    primeira, enviado = _disparar(sessao, url, kwargs, subdominio)
+    with perfil.estagio('espera', subdominio):
+        enviado.wait()
+    inicio = time.perf_counter()
+    try:
+        return primeira.result(timeout=espera), time.perf_counter() - inicio
+    except TempoEsgotado:
+        pass
+    log_status(f"Requisição de {endpoint} passou de {espera:.1f} s; disparando cópia")
+    # Se a primeira responder antes de a cópia conseguir lugar no orçamento, a cópia não sai
+    copia, _ = _disparar(sessao, url, kwargs, subdominio,
+                         necessaria=lambda: not (primeira.done() and primeira.exception() is None))
+    resposta = _primeira_resposta([primeira, copia])
+    return resposta, time.perf_counter() - inicio
+
+
+# Função para GET com requests: timeout da classe do endpoint, orçamento do tenant (com
+# 'subdominio') e hedge opcional
+def get(sessao, endpoint, url, subdominio=None, **kwargs):
+    kwargs.setdefault('timeout', timeout_requests(endpoint))
+    espera = limite_hedge(endpoint)
+    if espera is None:
+        with contextlib.ExitStack() as pilha:
+            with perfil.estagio('espera', subdominio):
+                pilha.enter_context(_orcamento(subdominio))
+            inicio = time.perf_counter()
+            resposta = sessao.get(url, **kwargs)
+            duracao = time.perf_counter() - inicio
+    else:
+        resposta, duracao = _get_com_hedge(sessao, endpoint, url, kwargs, subdominio, espera)
+    if resposta.ok:
+        registrar(endpoint, duracao)
+    return resposta
+
+
+# Função para GET com aiohttp: timeout da classe do endpoint, orçamento do tenant (com
+# 'subdominio') e hedge opcional.
+# A resposta volta com o corpo já lido (response.read()/text() continuam funcionando).
+async def obter_async(session, endpoint, url, subdominio=None, **kwargs):
+    kwargs.setdefault('timeout', timeout_aiohttp(endpoint))
+
+    # Uma tentativa dentro do orçamento; 'enviado' é marcado quando ela sai. Se 'necessaria()'
+    # for falsa quando o lugar no orçamento sair, a tentativa termina sem requisição.
+    async def uma_requisicao(enviado, necessaria=lambda: True):
+        try:
+            async with _orcamento_async(subdominio):
+                enviado.set()
+                if not necessaria():
+                    raise RuntimeError("Cópia dispensada: a primeira tentativa já respondeu")
+                async with session.get(url, **kwargs) as resposta:
+                    await resposta.read()
+                return resposta
+        finally:
+            enviado.set()
+
+    espera = limite_hedge(endpoint)
+    enviado = asyncio.Event()
+    tarefas = [asyncio.ensure_future(uma_requisicao(enviado))]
+    try:
+        with perfil.estagio('espera', subdominio):
+            await enviado.wait()
+        inicio = time.perf_counter()
+        if espera is not None:
+            feitas, _ = await asyncio.wait(tarefas, timeout=espera)
+            if not feitas:
+                log_status(f"Requisição de {endpoint} passou de {espera:.1f} s; disparando cópia")
+                primeira = tarefas[0]
+                tarefas.append(asyncio.ensure_future(uma_requisicao(
+                    asyncio.Event(),
+                    necessaria=lambda: not (primeira.done() and not primeira.cancelled() and primeira.exception() is None))))
+        resposta = await _primeira_resposta_async(tarefas)
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+    if resposta.status < 400:
+        registrar(endpoint, time.perf_counter() - inicio)
+    return resposta
+
+
+async def _primeira_resposta_async(tarefas):
+    erro = None
+    for proxima in asyncio.as_completed(tarefas):
+        try:
+            return await proxima
+        except Exception as e:
+            erro = e
+    raise erro
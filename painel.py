@@ -0,0 +1,198 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+import particoes
+import formatacao
+
+# Painel Streamlit sobre as saídas dos extratores (dataset colunar particionado).
+# Execução: streamlit run painel.py
+# Carrega só as colunas e partições (subdomínio, ano) necessárias e guarda os DataFrames em
+# um cache com limite explícito de memória (LRU por bytes).
+
+DIRETORIO_COLUNAR = os.environ.get('SIENGE_DIRETORIO_COLUNAR', 'colunar')
+LIMITE_CACHE_MB = int(os.environ.get('SIENGE_LIMITE_CACHE_MB', '1024'))
+LINHAS_TABELA = 1000
+
+# Dataset -> colunas de data, valor e agrupamento usadas pelo painel
+DATASETS = {
+    'a_receber': {
+        'titulo': 'Contas a receber',
+        'data': 'dueDate',
+        'valor': 'correctedBalanceAmount',
+        'colunas': ['ChaveEspecifica', 'companyName', 'projectName', 'clientName', 'costCenterName',
+                    'financialCategoryName', 'dueDate', 'correctedBalanceAmount', 'defaulterSituation'],
+    },
+    'recebidas': {
+        'titulo': 'Contas recebidas',
+        'data': 'paymentDate',
+        'valor': 'netAmount',
+        'colunas': ['ChaveEspecifica', 'companyName', 'projectName', 'clientName', 'costCenterName',
+                    'financialCategoryName', 'paymentDate', 'netAmount', 'grossAmount'],
+    },
+}
+DIMENSOES = particoes.COLUNAS_FILTRO
+
+
+# Cache LRU com limite de memória (bytes); os itens menos usados são descartados primeiro
+class CacheLimitado:
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.itens = OrderedDict()
+        self.tamanhos = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def obter(self, chave, carregar):
+        with self.lock:
+            if chave in self.itens:
+                self.itens.move_to_end(chave)
+                return self.itens[chave]
+        valor = carregar()
+        tamanho = int(valor.memory_usage(deep=True).sum())
+        with self.lock:
+            if chave not in self.itens:
+                self.itens[chave] = valor
+                self.tamanhos[chave] = tamanho
+                self.total_bytes += tamanho
+            while self.total_bytes > self.limite_bytes and len(self.itens) > 1:
+                antiga, _ = self.itens.popitem(last=False)
+                self.total_bytes -= self.tamanhos.pop(antiga)
+        return valor
+
+    def limpar(self):
+        with self.lock:
+            self.itens.clear()
+            self.tamanhos.clear()
+            self.total_bytes = 0
+
+
+# Cache compartilhado entre as sessões do Streamlit
+@st.cache_resource
+def cache_particoes():
+    return CacheLimitado(LIMITE_CACHE_MB * 1024 * 1024 * 3 // 4)
+
+
+@st.cache_resource
+def cache_filtros():
+    return CacheLimitado(LIMITE_CACHE_MB * 1024 * 1024 // 4)
+
+
+# Função para carregar as partições selecionadas (cada partição fica no cache separadamente)
+def carregar(dataset, subdominios, anos):
+    config = DATASETS[dataset]
+    metadados = particoes.ler_metadados(DIRETORIO_COLUNAR, dataset)
+    versao = metadados.get('atualizado_em')  # Nova extração invalida o cache
+    frames = []
+    for subdominio, ano, arquivo in particoes.listar_particoes(DIRETORIO_COLUNAR, dataset):
+        if subdominio in subdominios and ano in anos:
+            frames.append(cache_particoes().obter(
+                (dataset, versao, subdominio, ano),
+                lambda arquivo=arquivo, subdominio=subdominio: preparar(
+                    particoes.ler_particao(arquivo, subdominio, config['colunas']), config)))
+    if not frames:
+        return pd.DataFrame(columns=['subdominio', 'mes'] + config['colunas'])
+    return pd.concat(frames, ignore_index=True)
+
+
+# Função para preparar os tipos da partição (categorias reduzem memória e aceleram filtros)
+def preparar(df, config):
+    df['mes'] = pd.to_datetime(df[config['data']], errors='coerce').dt.to_period('M').astype(str)
+    for coluna in ['subdominio'] + DIMENSOES:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype('category')
+    return df
+
+
+# Função para as opções dos filtros de dimensão, lidas dos metadados das partições (sem carregar
+# nem concatenar os dados). Em cache até a próxima extração ('versao').
+@st.cache_data(show_spinner=False)
+def opcoes_filtros(dataset, versao, subdominios, anos):
+    opcoes = {}
+    for subdominio, ano, arquivo in particoes.listar_particoes(DIRETORIO_COLUNAR, dataset):
+        if subdominio in subdominios and ano in anos:
+            for coluna, valores in particoes.ler_valores_filtro(arquivo, DIMENSOES).items():
+                opcoes.setdefault(coluna, set()).update(valores)
+    return {coluna: sorted(opcoes[coluna]) for coluna in DIMENSOES if coluna in opcoes}
+
+
+# Função para aplicar os filtros de dimensão (resultado também fica em cache)
+def filtrar(dataset, subdominios, anos, filtros):
+    chave = (dataset, particoes.ler_metadados(DIRETORIO_COLUNAR, dataset).get('atualizado_em'),
+             tuple(subdominios), tuple(anos), tuple((coluna, tuple(valores)) for coluna, valores in filtros.items()))
+
+    def calcular():
+        df = carregar(dataset, subdominios, anos)
+        for coluna, valores in filtros.items():
+            if valores:
+                df = df[df[coluna].isin(valores)]
+        return df
+
+    return cache_filtros().obter(chave, calcular)
+
+
+# Função para formatar um número isolado no padrão brasileiro (1.234,56)
+def numero(valor, casas=formatacao.CASAS_PADRAO):
+    return formatacao.formatar_numero(pd.Series([valor]), casas).iloc[0]
+
+
+# Função para descrever há quanto tempo os dados foram atualizados
+def frescor(metadados):
+    if not metadados.get('atualizado_em'):
+        return "Sem registro de atualização"
+    atualizado = datetime.fromisoformat(metadados['atualizado_em'])
+    minutos = int((datetime.now() - atualizado).total_seconds() // 60)
+    idade = f"{minutos} min" if minutos < 120 else f"{minutos // 60} h"
+    return f"Atualizado em {atualizado.strftime('%d/%m/%Y %H:%M')} (há {idade}) - {numero(metadados.get('linhas', 0), 0)} linhas"
+
+
+def main():
+    st.set_page_config(page_title="Extrações API Sienge", layout='wide')
+
+    dataset = st.sidebar.selectbox("Base", list(DATASETS), format_func=lambda nome: DATASETS[nome]['titulo'])
+    config = DATASETS[dataset]
+    metadados = particoes.ler_metadados(DIRETORIO_COLUNAR, dataset)
+    st.title(config['titulo'])
+    st.caption(frescor(metadados))
+
+    disponiveis = particoes.listar_particoes(DIRETORIO_COLUNAR, dataset)
+    if not disponiveis:
+        st.warning(f"Nenhuma partição encontrada em '{DIRETORIO_COLUNAR}/{dataset}'. Execute o extrator primeiro.")
+        return
+
+    todos_subdominios = sorted({subdominio for subdominio, _, _ in disponiveis})
+    todos_anos = sorted({ano for _, ano, _ in disponiveis})
+    subdominios = st.sidebar.multiselect("Subdomínios", todos_subdominios, default=todos_subdominios)
+    ano_inicial, ano_final = st.sidebar.select_slider(
+        "Anos", options=todos_anos, value=(todos_anos[max(len(todos_anos) - 3, 0)], todos_anos[-1]))
+    anos = [ano for ano in todos_anos if ano_inicial <= ano <= ano_final]
+
+    filtros = {}
+    for coluna, opcoes in opcoes_filtros(dataset, metadados.get('atualizado_em'), tuple(subdominios), tuple(anos)).items():
+        filtros[coluna] = st.sidebar.multiselect(coluna, opcoes)
+
+    if st.sidebar.button("Recarregar dados"):
+        cache_particoes().limpar()
+        cache_filtros().limpar()
+        opcoes_filtros.clear()
+
+    df = filtrar(dataset, subdominios, anos, filtros)
+    valor = config['valor']
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total", numero(df[valor].sum()))
+    col2.metric("Linhas", numero(len(df), 0))
+    col3.metric("Parcelas", numero(df['ChaveEspecifica'].nunique(), 0))
+
+    por_mes = df.groupby(['mes', 'subdominio'], observed=True)[valor].sum().unstack('subdominio').fillna(0)
+    st.bar_chart(por_mes)
+
+    st.dataframe(df.head(LINHAS_TABELA), use_container_width=True)
+    st.sidebar.caption(f"Cache: {cache_particoes().total_bytes / 1024 / 1024:,.0f} MB de partições, "
+                       f"{cache_filtros().total_bytes / 1024 / 1024:,.0f} MB de filtros")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import os
+import json
+import shutil
+import importlib.util
+from datetime import datetime
+import pandas as pd
+
+# Armazenamento colunar (Parquet) particionado por subdomínio e ano, para leitura seletiva
+# de colunas e partições (painel Streamlit e notebooks).
+#
+# Estrutura: <raiz>/<dataset>/subdominio=<x>/ano=<aaaa>/dados.parquet
+#            <raiz>/<dataset>/_metadados.json   (data da última atualização, total de linhas, colunas)
+# Cada dados.parquet guarda nos metadados do arquivo os valores distintos das colunas de
+# filtro (COLUNAS_FILTRO), lidos pelo painel sem carregar os dados.
+
+ARQUIVO_METADADOS = '_metadados.json'
+COLUNAS_FILTRO = ['companyName', 'projectName', 'costCenterName', 'financialCategoryName']
+CHAVE_VALORES = b'valores_filtro'
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para verificar se há engine Parquet instalada (pyarrow)
+def disponivel():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+# Função para o diretório de uma partição
+def caminho_particao(raiz, dataset, subdominio, ano):
+    return os.path.join(raiz, dataset, f"subdominio={subdominio}", f"ano={ano}")
+
+
+# Função para listar as partições gravadas: [(subdominio, ano, caminho_arquivo)]
+def listar_particoes(raiz, dataset):
+    base = os.path.join(raiz, dataset)
+    particoes = []
+    if not os.path.isdir(base):
+        return particoes
+    for pasta_subdominio in sorted(os.listdir(base)):
+        if not pasta_subdominio.startswith('subdominio='):
+            continue
+        for pasta_ano in sorted(os.listdir(os.path.join(base, pasta_subdominio))):
+            arquivo = os.path.join(base, pasta_subdominio, pasta_ano, 'dados.parquet')
+            if pasta_ano.startswith('ano=') and os.path.exists(arquivo):
+                particoes.append((pasta_subdominio.split('=', 1)[1], int(pasta_ano.split('=', 1)[1]), arquivo))
+    return particoes
+
+
+# Função para ler os metadados da última atualização do dataset
+def ler_metadados(raiz, dataset):
+    caminho = os.path.join(raiz, dataset, ARQUIVO_METADADOS)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+# Função para os valores distintos das colunas de filtro de uma partição
+def valores_filtro(df, colunas=COLUNAS_FILTRO):
+    return {coluna: sorted(str(valor) for valor in df[coluna].dropna().unique())
+            for coluna in colunas if coluna in df.columns}
+
+
+# Função para gravar o DataFrame particionado.
+# Somente as partições (subdomínio, ano) presentes no DataFrame são substituídas; com
+# 'substituir_tudo', partições que não vieram na execução são removidas (carteira completa).
+def gravar_particionado(df, raiz, dataset, coluna_data, substituir_tudo=False):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.copy()
+    # Colunas de texto com tipos mistos viram 'string' para gravação consistente no Parquet
+    for coluna in df.columns[df.dtypes == object]:
+        df[coluna] = df[coluna].astype('string')
+    anos = pd.to_datetime(df[coluna_data], errors='coerce').dt.year.fillna(0).astype(int)
+
+    gravadas = set()
+    for (subdominio, ano), grupo in df.groupby([df['subdominio'].astype(str), anos], sort=False):
+        pasta = caminho_particao(raiz, dataset, subdominio, ano)
+        os.makedirs(pasta, exist_ok=True)
+        destino = os.path.join(pasta, 'dados.parquet')
+        temporario = f"{destino}.tmp"
+        tabela = pa.Table.from_pandas(grupo.drop(columns=['subdominio']), preserve_index=False)
+        tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}),
+                                                 CHAVE_VALORES: json.dumps(valores_filtro(grupo)).encode()})
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, destino)
+        gravadas.add(os.path.normpath(destino))
+
+    if substituir_tudo:
+        for _, _, arquivo in listar_particoes(raiz, dataset):
+            if os.path.normpath(arquivo) not in gravadas:
+                shutil.rmtree(os.path.dirname(arquivo))
+
+    # 'linhas' é o total do dataset (todas as partições), não só as linhas desta gravação
+    linhas = sum(pq.read_metadata(arquivo).num_rows for _, _, arquivo in listar_particoes(raiz, dataset))
+    metadados = {
+        'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+        'linhas': int(linhas),
+        'particoes_gravadas': len(gravadas),
+        'colunas': [str(coluna) for coluna in df.columns],
+    }
+    caminho_metadados = os.path.join(raiz, dataset, ARQUIVO_METADADOS)
+    with open(f"{caminho_metadados}.tmp", 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo, indent=1)
+    os.replace(f"{caminho_metadados}.tmp", caminho_metadados)
+    log_status(f"Dataset colunar '{dataset}' gravado em {raiz}: {len(gravadas)} partição(ões), {len(df)} linha(s) gravada(s), {linhas} no total")
+
+
+# Função para ler apenas as colunas e partições necessárias
+def ler(raiz, dataset, colunas=None, subdominios=None, anos=None):
+    frames = []
+    for subdominio, ano, arquivo in listar_particoes(raiz, dataset):
+        if subdominios is not None and subdominio not in subdominios:
+            continue
+        if anos is not None and ano not in anos:
+            continue
+        frames.append(ler_particao(arquivo, subdominio, colunas))
+    if not frames:
+        return pd.DataFrame(columns=['subdominio'] + list(colunas or []))
+    return pd.concat(frames, ignore_index=True)
+
+
+# Função para ler uma partição, recolocando a coluna 'subdominio'
+def ler_particao(arquivo, subdominio, colunas=None):
+    colunas = [coluna for coluna in colunas if coluna != 'subdominio'] if colunas else None
+    df = pd.read_parquet(arquivo, columns=colunas)
+    df.insert(0, 'subdominio', subdominio)
+    return df
+
+
+# Função para ler os valores das colunas de filtro de uma partição: dos metadados do arquivo
+# (só o rodapé do Parquet) ou, em partições gravadas antes deles, lendo apenas essas colunas
+def ler_valores_filtro(arquivo, colunas=COLUNAS_FILTRO):
+    import pyarrow.parquet as pq
+
+    esquema = pq.read_schema(arquivo)
+    gravados = (esquema.metadata or {}).get(CHAVE_VALORES)
+    if gravados is not None:
+        valores = json.loads(gravados)
+        return {coluna: valores[coluna] for coluna in colunas if coluna in valores}
+    presentes = [coluna for coluna in colunas if coluna in esquema.names]
+    return valores_filtro(pd.read_parquet(arquivo, columns=presentes), presentes) if presentes else {}
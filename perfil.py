@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# Estágios padronizados do pipeline de extração ('espera': fila no orçamento do tenant, antes
+# da requisição sair)
+ESTAGIOS = ['espera', 'fetch', 'decode', 'normalize', 'merge', 'format', 'write']
+
+_ativo = False
+_lock = threading.Lock()
+_medicoes = []
+_estagios_abertos = 0
+_estagio_atual = contextvars.ContextVar('estagio_atual', default=None)  # Estágio aberto na thread/tarefa
+
+
+# Função para ativar o modo de perfilamento
+def ativar():
+    global _ativo
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _ativo = True
+
+
+# Função para verificar se o perfilamento está ativo
+def perfil_ativo():
+    return _ativo
+
+
+# Função para ativar o perfilamento quando o script recebe a opção --profile
+def configurar_por_argv(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if '--profile' in argv:
+        ativar()
+    return _ativo
+
+
+# Função para saber se o código roda em um loop de eventos (estágio assíncrono)
+def _assincrono():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# Gerenciador de contexto que mede um estágio do pipeline
+# Registra tempo de parede, tempo de CPU da thread e pico de memória (tracemalloc).
+# Estágios dentro de um loop de eventos registram só o tempo de parede: o tempo de CPU da
+# thread do loop inclui as outras tarefas que rodam enquanto o estágio aguarda.
+# Estágios abertos dentro de outro (ex.: 'espera' dentro de 'fetch') têm o tempo descontado
+# do estágio de fora e herdam dele o subdomínio e a janela.
+# Em execuções concorrentes (threads ou tarefas assíncronas) o pico de memória e o
+# tempo de CPU de estágios sobrepostos são aproximados: o pico só é reiniciado
+# quando nenhum outro estágio está aberto.
+@contextmanager
+def estagio(nome, subdominio=None, janela=None):
+    global _estagios_abertos
+    if not _ativo:
+        yield
+        return
+
+    externo = _estagio_atual.get()
+    if externo is not None:
+        subdominio = subdominio or externo['subdominio']
+        janela = janela or externo['janela']
+    atual = {'subdominio': subdominio, 'janela': janela, 'parede_internos': 0.0, 'cpu_internos': 0.0}
+    token = _estagio_atual.set(atual)
+    assincrono = _assincrono()
+
+    with _lock:
+        if _estagios_abertos == 0:
+            tracemalloc.reset_peak()
+        _estagios_abertos += 1
+        memoria_inicial = tracemalloc.get_traced_memory()[0]
+
+    inicio_parede = time.perf_counter()
+    inicio_cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        parede = time.perf_counter() - inicio_parede
+        cpu = None if assincrono else time.thread_time() - inicio_cpu
+        _estagio_atual.reset(token)
+        if externo is not None:
+            externo['parede_internos'] += parede
+            externo['cpu_internos'] += cpu or 0.0
+        with _lock:
+            pico = max(tracemalloc.get_traced_memory()[1] - memoria_inicial, 0)
+            _estagios_abertos -= 1
+            _medicoes.append({
+                'estagio': nome,
+                'subdominio': subdominio or '-',
+                'janela': janela or '-',
+                'parede': max(parede - atual['parede_internos'], 0.0),
+                'cpu': None if cpu is None else max(cpu - atual['cpu_internos'], 0.0),
+                'pico_memoria': pico,
+            })
+
+
+# Função para obter uma cópia das medições registradas
+def medicoes():
+    with _lock:
+        return list(_medicoes)
+
+
+# Função para formatar bytes em uma unidade legível
+def format_bytes(quantidade):
+    for unidade in ['B', 'KB', 'MB', 'GB']:
+        if quantidade < 1024 or unidade == 'GB':
+            return f"{quantidade:.1f} {unidade}"
+        quantidade /= 1024
+
+
+# Função para agrupar medições por um conjunto de campos ('cpu' fica None quando o grupo só
+# tem estágios assíncronos)
+def agrupar(registros, campos):
+    grupos = {}
+    for registro in registros:
+        chave = tuple(registro[campo] for campo in campos)
+        grupo = grupos.setdefault(chave, {'chamadas': 0, 'parede': 0.0, 'cpu': None, 'pico_memoria': 0})
+        grupo['chamadas'] += 1
+        grupo['parede'] += registro['parede']
+        if registro['cpu'] is not None:
+            grupo['cpu'] = (grupo['cpu'] or 0.0) + registro['cpu']
+        grupo['pico_memoria'] = max(grupo['pico_memoria'], registro['pico_memoria'])
+    return grupos
+
+
+# Função para o texto do tempo de CPU ('-' nos estágios assíncronos)
+def _texto_cpu(cpu):
+    return '-' if cpu is None else f"{cpu:.2f}"
+
+
+# Função para montar a tabela resumo (por estágio e por subdomínio/janela)
+def tabela_resumo(registros):
+    ordem = {nome: indice for indice, nome in enumerate(ESTAGIOS)}
+    total_parede = sum(r['parede'] for r in registros) or 1.0
+
+    linhas = [f"{'Estágio':<10} {'Chamadas':>8} {'Parede (s)':>11} {'CPU (s)':>9} {'% Parede':>9} {'Pico mem.':>11}"]
+    por_estagio = agrupar(registros, ['estagio'])
+    for (nome,), grupo in sorted(por_estagio.items(), key=lambda item: ordem.get(item[0][0], len(ordem))):
+        linhas.append(f"{nome:<10} {grupo['chamadas']:>8} {grupo['parede']:>11.2f} {_texto_cpu(grupo['cpu']):>9} "
+                      f"{100 * grupo['parede'] / total_parede:>8.1f}% {format_bytes(grupo['pico_memoria']):>11}")
+
+    linhas.append('')
+    linhas.append(f"{'Subdomínio':<15} {'Janela':<23} {'Estágio':<10} {'Parede (s)':>11} {'CPU (s)':>9} {'Pico mem.':>11}")
+    detalhado = agrupar(registros, ['subdominio', 'janela', 'estagio'])
+    for (subdominio, janela, nome), grupo in sorted(detalhado.items(),
+                                                    key=lambda item: (item[0][0], item[0][1], ordem.get(item[0][2], len(ordem)))):
+        linhas.append(f"{subdominio:<15} {janela:<23} {nome:<10} {grupo['parede']:>11.2f} {_texto_cpu(grupo['cpu']):>9} "
+                      f"{format_bytes(grupo['pico_memoria']):>11}")
+    return '\n'.join(linhas)
+
+
+# Função para gerar o perfil no formato "collapsed stacks" (flamegraph.pl, speedscope, inferno)
+# Cada linha: script;subdominio;janela;estagio <microssegundos de parede>
+def pilhas_colapsadas(registros, script):
+    pilhas = agrupar(registros, ['subdominio', 'janela', 'estagio'])
+    linhas = []
+    for (subdominio, janela, nome), grupo in sorted(pilhas.items()):
+        microssegundos = int(grupo['parede'] * 1_000_000)
+        if microssegundos > 0:
+            linhas.append(f"{script};{subdominio};{janela};{nome} {microssegundos}")
+    return '\n'.join(linhas) + '\n'
+
+
+# Função para gravar o perfil e a tabela resumo ao fim da execução
+def finalizar(script, diretorio='.'):
+    if not _ativo:
+        return None
+    registros = medicoes()
+    carimbo = datetime.now().strftime('%Y%m%d_%H%M%S')
+    caminho_pilhas = os.path.join(diretorio, f"perfil_{script}_{carimbo}.folded")
+    caminho_resumo = os.path.join(diretorio, f"perfil_{script}_{carimbo}.txt")
+
+    resumo = tabela_resumo(registros)
+    with open(caminho_pilhas, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(pilhas_colapsadas(registros, script))
+    with open(caminho_resumo, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(resumo + '\n')
+
+    print(resumo)
+    print(f"Perfil salvo em: {caminho_pilhas} e {caminho_resumo}")
+    return caminho_pilhas, caminho_resumo
@@ -0,0 +1,130 @@
+import os
+import glob
+import shutil
+import asyncio
+import pandas as pd
+
+# Pipeline produtor/consumidor com filas limitadas entre os estágios fetch -> normalize -> write.
+# Enquanto a página N é normalizada, a página N+1 já está sendo baixada e os lotes anteriores
+# estão sendo gravados. As filas limitadas seguram a busca quando a normalização ou a gravação
+# ficam para trás, então a memória fica limitada a alguns lotes em trânsito.
+#
+# produtores: geradores assíncronos (um por subdomínio, por exemplo) que entregam lotes de registros
+# normalizar: função síncrona lote -> resultado (roda em thread, fora do loop de eventos)
+# gravar:     função síncrona resultado -> None (roda em thread, na ordem de chegada)
+
+TAMANHO_FILA = 4  # Lotes em trânsito entre dois estágios
+FIM = object()  # Marca de fim de fila
+TAMANHO_BLOCO_CSV = 100_000  # Linhas relidas por vez ao completar colunas em GravadorCSV.fechar()
+
+
+# Função para consumir um produtor e colocar seus lotes na fila
+async def _produzir(produtor, fila):
+    async for lote in produtor:
+        await fila.put(lote)
+
+
+# Função para aguardar todos os produtores e sinalizar o fim da fila de lotes
+async def _buscar(produtores, fila):
+    await asyncio.gather(*(_produzir(produtor, fila) for produtor in produtores))
+    await fila.put(FIM)
+
+
+# Função do estágio de normalização (um lote por vez, preservando a ordem)
+async def _normalizar(normalizar, entrada, saida):
+    while True:
+        lote = await entrada.get()
+        if lote is FIM:
+            await saida.put(FIM)
+            return
+        await saida.put(await asyncio.to_thread(normalizar, lote))
+
+
+# Função do estágio de gravação
+async def _gravar(gravar, entrada):
+    lotes = 0
+    while True:
+        resultado = await entrada.get()
+        if resultado is FIM:
+            return lotes
+        await asyncio.to_thread(gravar, resultado)
+        lotes += 1
+
+
+# Função principal: executa os três estágios ao mesmo tempo e retorna o número de lotes gravados.
+# Se um estágio falhar, os demais são cancelados e a exceção é propagada.
+async def executar(produtores, normalizar, gravar, tamanho_fila=TAMANHO_FILA):
+    fila_lotes = asyncio.Queue(tamanho_fila)
+    fila_resultados = asyncio.Queue(tamanho_fila)
+    tarefas = [
+        asyncio.ensure_future(_buscar(produtores, fila_lotes)),
+        asyncio.ensure_future(_normalizar(normalizar, fila_lotes, fila_resultados)),
+        asyncio.ensure_future(_gravar(gravar, fila_resultados)),
+    ]
+    try:
+        _, _, lotes = await asyncio.gather(*tarefas)
+    finally:
+        for tarefa in tarefas:
+            if not tarefa.done():
+                tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+    return lotes
+
+
+# Gravador de CSV incremental: cada lote é acrescentado a arquivos temporários, que só
+# substituem o destino em fechar() (os leitores nunca veem um CSV pela metade).
+# Lotes com colunas novas ampliam a lista de colunas (união, como faria o pd.concat de todos
+# os lotes) e passam a ser gravados em um novo trecho; em fechar() o cabeçalho é gravado uma
+# vez e só os trechos mais estreitos são relidos, em blocos, para completar as colunas.
+class GravadorCSV:
+    def __init__(self, caminho, **opcoes_csv):
+        self.caminho = caminho
+        self.temporario = f"{caminho}.tmp"
+        self.opcoes_csv = {'index': False, **opcoes_csv}
+        self.colunas = None
+        self.trechos = []  # [(arquivo, quantidade de colunas)]
+        self.linhas = 0
+        self.descartar()
+
+    def gravar(self, df):
+        if len(df.columns) == 0:  # Lote sem nenhuma coluna (página vazia)
+            return
+        if self.colunas is None:
+            self.colunas = []
+        novas = [coluna for coluna in df.columns if coluna not in self.colunas]
+        self.colunas += novas
+        if df.empty:
+            return
+        if novas or not self.trechos:
+            self.trechos.append((f"{self.temporario}.{len(self.trechos)}", len(self.colunas)))
+        arquivo, _ = self.trechos[-1]
+        df.reindex(columns=self.colunas).to_csv(arquivo, mode='a', header=False, **self.opcoes_csv)
+        self.linhas += len(df)
+
+    # Função para copiar um trecho para o arquivo final, completando as colunas que surgiram depois
+    def _copiar_trecho(self, arquivo, quantidade):
+        if quantidade == len(self.colunas):
+            with open(arquivo, 'rb') as origem, open(self.temporario, 'ab') as destino:
+                shutil.copyfileobj(origem, destino)
+            return
+        opcoes_leitura = {chave: valor for chave, valor in self.opcoes_csv.items() if chave in ('sep', 'encoding')}
+        for bloco in pd.read_csv(arquivo, header=None, names=self.colunas[:quantidade], dtype=str,
+                                 keep_default_na=False, chunksize=TAMANHO_BLOCO_CSV, **opcoes_leitura):
+            bloco.reindex(columns=self.colunas, fill_value='').to_csv(self.temporario, mode='a', header=False,
+                                                                       **self.opcoes_csv)
+
+    # Função para publicar o arquivo (sem nenhum lote, grava um CSV vazio)
+    def fechar(self):
+        pd.DataFrame(columns=self.colunas or []).to_csv(self.temporario, **self.opcoes_csv)
+        for arquivo, quantidade in self.trechos:
+            self._copiar_trecho(arquivo, quantidade)
+            os.remove(arquivo)
+        self.trechos = []
+        os.replace(self.temporario, self.caminho)
+        return self.linhas
+
+    # Função para descartar os arquivos temporários (execução com erro mantém o CSV anterior)
+    def descartar(self):
+        for arquivo in glob.glob(f"{glob.escape(self.temporario)}*"):
+            os.remove(arquivo)
+        self.trechos = []
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import argparse
+from datetime import datetime
+from carregador import carregar_script
+import particoes
+import tenants
+
+# Serviço de atualização contínua: substitui o agendamento de cada script no Agendador de
+# Tarefas do Windows. Os scripts são carregados uma vez (pandas importado, sessões HTTP e
+# registro de tenants mantidos entre os ciclos) e cada base é atualizada no seu próprio
+# intervalo. Se o ciclo anterior de uma base ainda estiver rodando, o ciclo é pulado.
+# Cada base é gravada em um arquivo temporário e publicada com os.replace, então os leitores
+# (Power BI, painel) nunca veem um CSV pela metade.
+#
+# Execução: python servico_atualizacao.py [--bases recebidas,unidades] [--intervalo recebidas=10] [--uma-vez]
+
+# Intervalo padrão de atualização de cada base, em minutos
+INTERVALOS = {
+    'recebidas': 15,
+    'a_receber': 60,
+    'extratos': 6 * 60,
+    'vendas': 6 * 60,
+    'unidades': 24 * 60,
+    'clientes': 24 * 60,
+}
+ARQUIVO_ESTADO = 'servico_estado.json'
+TENTATIVAS_PUBLICACAO = 5  # No Windows, o destino pode estar aberto por outro programa
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para o caminho temporário de um arquivo de saída
+def temporario(destino):
+    return f"{destino}.tmp"
+
+
+# Função para preparar o temporário no início do ciclo: um temporário que sobrou de um ciclo
+# interrompido não pode ser publicado como se fosse deste ciclo
+def novo_temporario(destino):
+    origem = temporario(destino)
+    if os.path.exists(origem):
+        os.remove(origem)
+    return origem
+
+
+# Função para publicar o arquivo temporário no destino (substituição atômica)
+def publicar(destino):
+    origem = temporario(destino)
+    if not os.path.exists(origem):
+        return False
+    for tentativa in range(TENTATIVAS_PUBLICACAO):
+        try:
+            os.replace(origem, destino)
+            return True
+        except PermissionError:
+            if tentativa == TENTATIVAS_PUBLICACAO - 1:
+                raise
+            time.sleep(2)
+
+
+# Funções de atualização de cada base (síncronas rodam em thread; assíncronas no loop do serviço).
+# Retornam os arquivos publicados.
+def atualizar_a_receber():
+    a_receber = carregar_script('a_receber')
+    destino = 'dados_recebidos.csv'
+    diretorio_colunar = 'colunar' if particoes.disponivel() else None
+    a_receber.main(tenants.subdominios('a_receber'), None, None, novo_temporario(destino),
+                   diretorio_snapshots='snapshots_a_receber', diretorio_agregados='agregados',
+                   diretorio_colunar=diretorio_colunar)
+    return [destino] if publicar(destino) else []
+
+
+def atualizar_recebidas():
+    recebidas = carregar_script('recebidas')
+    destino = 'dados_atualizaveis.csv'
+    diretorio_colunar = 'colunar' if particoes.disponivel() else None
+    recebidas.save_current_data(tenants.subdominios('recebidas'), 'agregados', None, diretorio_colunar,
+                                file_path=novo_temporario(destino))
+    return [destino] if publicar(destino) else []
+
+
+def atualizar_unidades():
+    unidades = carregar_script('unidades')
+    destino = 'unidades.csv'
+    unidades.extrair(tenants.subdominios('unidades')).to_csv(novo_temporario(destino), index=False)
+    return [destino] if publicar(destino) else []
+
+
+async def atualizar_extratos():
+    extratos = carregar_script('extratos')
+    destino = 'Extratos_combined.csv'
+    await extratos.main(tenants.subdominios('extratos'), caminho=novo_temporario(destino))
+    return [destino] if publicar(destino) else []
+
+
+async def atualizar_vendas():
+    # O vendas.py já publica os CSVs ao final (pipeline.GravadorCSV)
+    return list(await carregar_script('vendas').main())
+
+
+async def atualizar_clientes():
+    # O gerar_tels.py já publica o CSV ao final (pipeline.GravadorCSV), se houver clientes
+    return list(await carregar_script('clientes').main())
+
+
+ATUALIZACOES = {
+    'recebidas': atualizar_recebidas,
+    'a_receber': atualizar_a_receber,
+    'extratos': atualizar_extratos,
+    'vendas': atualizar_vendas,
+    'unidades': atualizar_unidades,
+    'clientes': atualizar_clientes,
+}
+
+
+# Serviço: agenda as bases e registra o estado de cada uma em servico_estado.json
+class Servico:
+    def __init__(self, intervalos, arquivo_estado=ARQUIVO_ESTADO):
+        self.intervalos = intervalos
+        self.arquivo_estado = arquivo_estado
+        self.estado = {nome: {'intervalo_min': minutos, 'ciclos': 0, 'ciclos_pulados': 0}
+                       for nome, minutos in intervalos.items()}
+        self.em_execucao = {}
+
+    # Função para gravar o estado (também de forma atômica)
+    def salvar_estado(self):
+        with open(temporario(self.arquivo_estado), 'w', encoding='utf-8') as arquivo:
+            json.dump(self.estado, arquivo, indent=1, ensure_ascii=False)
+        os.replace(temporario(self.arquivo_estado), self.arquivo_estado)
+
+    # Função para executar um ciclo de atualização de uma base
+    async def ciclo(self, nome):
+        estado = self.estado[nome]
+        inicio = time.perf_counter()
+        estado['ultimo_inicio'] = datetime.now().isoformat(timespec='seconds')
+        log_status(f"Atualizando {nome}")
+        try:
+            atualizacao = ATUALIZACOES[nome]
+            if inspect.iscoroutinefunction(atualizacao):
+                publicados = await atualizacao()
+            else:
+                publicados = await asyncio.to_thread(atualizacao)
+        except Exception as e:
+            estado['ultimo_erro'] = f"{datetime.now().isoformat(timespec='seconds')} - {e}"
+            log_status(f"Erro ao atualizar {nome}: {e}")
+        else:
+            estado['ultima_publicacao'] = datetime.now().isoformat(timespec='seconds')
+            estado['arquivos'] = publicados
+            log_status(f"{nome} publicado em {time.perf_counter() - inicio:.1f} s: {', '.join(publicados) or 'sem dados'}")
+        estado['ciclos'] += 1
+        estado['duracao_s'] = round(time.perf_counter() - inicio, 1)
+        self.salvar_estado()
+
+    # Função para agendar uma base: um ciclo a cada intervalo, pulando se o anterior não terminou
+    async def agendar(self, nome):
+        intervalo = self.intervalos[nome] * 60
+        proximo = time.monotonic()
+        while True:
+            tarefa = self.em_execucao.get(nome)
+            if tarefa is not None and not tarefa.done():
+                self.estado[nome]['ciclos_pulados'] += 1
+                log_status(f"Ciclo de {nome} pulado: a atualização anterior ainda está em execução")
+            else:
+                self.em_execucao[nome] = asyncio.ensure_future(self.ciclo(nome))
+            proximo += intervalo
+            await asyncio.sleep(max(proximo - time.monotonic(), 0))
+
+    # Função para rodar o serviço (ou um único ciclo de cada base)
+    async def executar(self, uma_vez=False):
+        log_status("Serviço de atualização iniciado: " +
+                   ', '.join(f"{nome} a cada {minutos} min" for nome, minutos in self.intervalos.items()))
+        if uma_vez:
+            await asyncio.gather(*(self.ciclo(nome) for nome in self.intervalos))
+            return
+        agendadores = [asyncio.ensure_future(self.agendar(nome)) for nome in self.intervalos]
+        try:
+            await asyncio.gather(*agendadores)
+        finally:
+            for tarefa in agendadores + list(self.em_execucao.values()):
+                tarefa.cancel()
+
+
+# Função para ler os intervalos da linha de comando (ex.: --intervalo recebidas=10)
+def ler_intervalos(bases, ajustes):
+    intervalos = {nome: INTERVALOS[nome] for nome in bases}
+    for ajuste in ajustes:
+        nome, _, minutos = ajuste.partition('=')
+        if nome not in intervalos or not minutos.replace('.', '', 1).isdigit() or float(minutos) <= 0:
+            raise ValueError(f"Intervalo inválido: {ajuste} (use base=minutos, com base entre {', '.join(intervalos)})")
+        intervalos[nome] = float(minutos)
+    return intervalos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de atualização contínua das bases Sienge")
+    parser.add_argument('--bases', help="Bases separadas por vírgula (padrão: todas)")
+    parser.add_argument('--intervalo', action='append', default=[], help="Intervalo em minutos: base=minutos")
+    parser.add_argument('--uma-vez', action='store_true', help="Atualiza cada base uma vez e encerra")
+    args = parser.parse_args()
+
+    bases = args.bases.split(',') if args.bases else list(INTERVALOS)
+    desconhecidas = set(bases) - set(INTERVALOS)
+    if desconhecidas:
+        parser.error(f"Bases não reconhecidas: {', '.join(sorted(desconhecidas))}")
+    try:
+        intervalos = ler_intervalos(bases, args.intervalo)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        asyncio.run(Servico(intervalos).executar(uma_vez=args.uma_vez))
+    except KeyboardInterrupt:
+        log_status("Serviço de atualização encerrado")
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
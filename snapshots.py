@@ -0,0 +1,162 @@
+import os
+import json
+from datetime import datetime, date
+import pandas as pd
+
+# Armazenamento de fotos diárias (snapshots) com compressão por diferença.
+# Cada dia grava apenas as chaves alteradas/novas (upsert) e as removidas (delete) em relação
+# ao dia anterior; a cada INTERVALO_CHECKPOINT dias é gravada uma foto completa.
+# A reconstrução de uma data parte do último checkpoint e aplica as diferenças seguintes.
+# As fotos guardam os valores numéricos (antes da formatação pt-BR dos CSVs) e a reconstrução
+# devolve numéricas as colunas que só têm números, prontas para as contas de aging.
+#
+# Estrutura do diretório:
+#   AAAA-MM-DD.completo.csv.gz   foto completa (checkpoint)
+#   AAAA-MM-DD.delta.csv.gz      linhas das chaves alteradas + coluna '_operacao' (U/D)
+#   indice.json                  lista ordenada das datas e tipos gravados
+
+INTERVALO_CHECKPOINT = 30
+COLUNAS_CHAVE = ['subdominio', 'ChaveEspecifica']
+COLUNA_OPERACAO = '_operacao'
+
+
+# Função para fazer o log dos status
+def log_status(message):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+
+# Função para ler o índice do armazenamento
+def ler_indice(diretorio):
+    caminho = os.path.join(diretorio, 'indice.json')
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+# Função para gravar o índice de forma atômica
+def gravar_indice(diretorio, indice):
+    caminho = os.path.join(diretorio, 'indice.json')
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(indice, arquivo, indent=1)
+    os.replace(temporario, caminho)
+
+
+# Função para o caminho do arquivo de uma data
+def caminho_arquivo(diretorio, data, tipo):
+    return os.path.join(diretorio, f"{data}.{tipo}.csv.gz")
+
+
+# Função para normalizar o DataFrame como texto (comparação estável entre execuções).
+# Colunas decimais só com valores inteiros (ids com vazios) são gravadas sem o '.0'.
+def normalizar(df):
+    df = df.copy(deep=False)
+    for coluna in df.columns[[pd.api.types.is_float_dtype(tipo) for tipo in df.dtypes]]:
+        validos = df[coluna].dropna()
+        if (validos % 1 == 0).all() and (validos.abs() < 2 ** 53).all():
+            df[coluna] = df[coluna].astype('Int64')
+    return df.astype(str).where(df.notna(), '').reset_index(drop=True)
+
+
+# Função para converter de volta para números as colunas em que todos os valores são números
+def _numericos(df):
+    for coluna in df.columns:
+        preenchidos = df[coluna] != ''
+        numeros = pd.to_numeric(df[coluna].where(preenchidos), errors='coerce')
+        if preenchidos.any() and numeros[preenchidos].notna().all():
+            df[coluna] = numeros
+    return df
+
+
+# Função para ler um arquivo do armazenamento
+def ler_arquivo(diretorio, data, tipo):
+    return pd.read_csv(caminho_arquivo(diretorio, data, tipo), dtype=str, keep_default_na=False)
+
+
+# Função para montar a chave composta (subdomínio + ChaveEspecifica) de cada linha
+def chaves(df):
+    return df['subdominio'] + '|' + df['ChaveEspecifica']
+
+
+# Função para calcular o hash de cada chave (considera todas as linhas da chave)
+# Uma chave pode ter várias linhas (ex.: uma por categoria financeira da parcela).
+def hashes_por_chave(df):
+    hashes_linhas = pd.util.hash_pandas_object(df, index=False)
+    return hashes_linhas.groupby(chaves(df).values).sum()
+
+
+# Função para reconstruir a foto de uma data (a última gravada até essa data).
+# Com 'texto', todas as colunas voltam como gravadas (texto, vazios como '').
+def reconstruir(diretorio, data=None, texto=False):
+    data = str(data or date.today())
+    indice = [item for item in ler_indice(diretorio) if item['data'] <= data]
+    if not indice:
+        raise ValueError(f"Nenhum snapshot gravado até a data: {data}")
+
+    # Último checkpoint até a data e as diferenças posteriores
+    posicao = max(i for i, item in enumerate(indice) if item['tipo'] == 'completo')
+    df = ler_arquivo(diretorio, indice[posicao]['data'], 'completo')
+
+    for item in indice[posicao + 1:]:
+        delta = ler_arquivo(diretorio, item['data'], 'delta')
+        upserts = delta[delta[COLUNA_OPERACAO] == 'U'].drop(columns=[COLUNA_OPERACAO])
+        df = pd.concat([df[~chaves(df).isin(set(chaves(delta)))], upserts], ignore_index=True)
+    df = df.fillna('')
+    return df if texto else _numericos(df)
+
+
+# Função principal: registra a foto do dia como checkpoint ou diferença
+def registrar(df, diretorio, data=None, intervalo_checkpoint=INTERVALO_CHECKPOINT):
+    data = str(data or date.today())
+    os.makedirs(diretorio, exist_ok=True)
+    atual = normalizar(df)
+    indice = ler_indice(diretorio)
+    if indice and indice[-1]['data'] > data:
+        raise ValueError(f"Já existe snapshot posterior a {data}; as diferenças seguintes dependem da foto desse dia.")
+
+    # Uma nova execução no mesmo dia substitui a foto do dia
+    if indice and indice[-1]['data'] == data:
+        substituida = indice.pop()
+        os.remove(caminho_arquivo(diretorio, data, substituida['tipo']))
+    anteriores = indice
+
+    # Checkpoint no primeiro registro ou quando o último completo está distante
+    ultimo_completo = max((item['data'] for item in anteriores if item['tipo'] == 'completo'), default=None)
+    completo = (ultimo_completo is None or
+                (date.fromisoformat(data) - date.fromisoformat(ultimo_completo)).days >= intervalo_checkpoint)
+
+    if completo:
+        atual.to_csv(caminho_arquivo(diretorio, data, 'completo'), index=False, compression='gzip')
+        linhas_gravadas = len(atual)
+    else:
+        anterior = reconstruir(diretorio, anteriores[-1]['data'], texto=True).reindex(columns=atual.columns, fill_value='')
+        hashes_atual = hashes_por_chave(atual)
+        hashes_anterior = hashes_por_chave(anterior)
+
+        comuns = hashes_atual.index.intersection(hashes_anterior.index)
+        diferentes = comuns[hashes_atual[comuns].values != hashes_anterior[comuns].values]
+        alteradas = hashes_atual.index.difference(hashes_anterior.index).append(diferentes)
+        removidas = hashes_anterior.index.difference(hashes_atual.index)
+
+        upserts = atual[chaves(atual).isin(set(alteradas))].assign(**{COLUNA_OPERACAO: 'U'})
+        deletes = pd.DataFrame([chave.split('|', 1) for chave in removidas], columns=COLUNAS_CHAVE)
+        deletes[COLUNA_OPERACAO] = 'D'
+
+        delta = pd.concat([upserts, deletes.reindex(columns=upserts.columns, fill_value='')], ignore_index=True)
+        delta.to_csv(caminho_arquivo(diretorio, data, 'delta'), index=False, compression='gzip')
+        linhas_gravadas = len(delta)
+
+    tipo = 'completo' if completo else 'delta'
+    gravar_indice(diretorio, indice + [{'data': data, 'tipo': tipo, 'linhas': linhas_gravadas}])
+    log_status(f"Snapshot {tipo} de {data} gravado em {diretorio}: {linhas_gravadas} linha(s) de {len(atual)}")
+    return tipo, linhas_gravadas
+
+
+if __name__ == '__main__':
+    import sys
+    # Uso: python snapshots.py <diretorio> <AAAA-MM-DD> <arquivo_saida.csv>
+    diretorio, data, saida = sys.argv[1:4]
+    foto = reconstruir(diretorio, data)
+    foto.to_csv(saida, index=False)
+    log_status(f"Foto de {data} reconstruída em {saida}: {len(foto)} linha(s)")
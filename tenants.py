@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+
+# Registro de tenants (subdomínios Sienge) carregado de arquivo JSON ou de variáveis de ambiente.
+#
+# Arquivo (padrão: tenants.json na raiz ou caminho em SIENGE_TENANTS), ver tenants.exemplo.json:
+#   {"padrao": {...}, "tenants": [{"subdominio": "sej", "usuario": "...", "senha": "...", ...}]}
+# Somente variáveis de ambiente:
+#   SIENGE_SUBDOMINIOS=sej,macapainvest
+#   SIENGE_SEJ_USUARIO / SIENGE_SEJ_SENHA (também sobrescrevem as credenciais do arquivo)
+#
+# Campos por tenant (os ausentes vêm de "padrao"):
+#   endpoints               extratores que rodam para o tenant (a_receber, recebidas, extratos, vendas, unidades, clientes)
+#   ano_inicial, ano_final  intervalo de datas das extrações por janela
+#   max_requisicoes         requisições simultâneas permitidas para o tenant
+#   requisicoes_por_minuto  limite de ritmo (opcional)
+
+ENDPOINTS = ['a_receber', 'recebidas', 'extratos', 'vendas', 'unidades', 'clientes']
+
+PADRAO = {
+    'endpoints': ENDPOINTS,
+    'ano_inicial': 2001,
+    'ano_final': 2040,
+    'max_requisicoes': 5,
+    'requisicoes_por_minuto': None,
+}
+
+_registro = None
+_lock = threading.Lock()
+_orcamentos = {}
+_proxima_requisicao = {}
+
+
+# Função para o nome das variáveis de ambiente de um subdomínio
+def _variavel(subdominio, campo):
+    return f"SIENGE_{subdominio.upper().replace('-', '_')}_{campo}"
+
+
+# Função para carregar o registro (arquivo ou variáveis de ambiente)
+def carregar_registro(caminho=None):
+    caminho = caminho or os.environ.get('SIENGE_TENANTS') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tenants.json')
+
+    if os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            conteudo = json.load(arquivo)
+    elif os.environ.get('SIENGE_SUBDOMINIOS'):
+        conteudo = {'tenants': [{'subdominio': subdominio.strip()}
+                                for subdominio in os.environ['SIENGE_SUBDOMINIOS'].split(',') if subdominio.strip()]}
+    else:
+        raise ValueError(f"Registro de tenants não encontrado: crie {caminho} (ver tenants.exemplo.json) "
+                         f"ou defina SIENGE_SUBDOMINIOS")
+
+    padrao = {**PADRAO, **conteudo.get('padrao', {})}
+    registro = {}
+    for item in conteudo.get('tenants', []):
+        tenant = {**padrao, **item}
+        subdominio = tenant['subdominio']
+        if subdominio in registro:
+            raise ValueError(f"Subdomínio duplicado no registro de tenants: {subdominio}")
+        tenant['usuario'] = os.environ.get(_variavel(subdominio, 'USUARIO'), tenant.get('usuario'))
+        tenant['senha'] = os.environ.get(_variavel(subdominio, 'SENHA'), tenant.get('senha'))
+        desconhecidos = set(tenant['endpoints']) - set(ENDPOINTS)
+        if desconhecidos:
+            raise ValueError(f"Endpoints não reconhecidos para {subdominio}: {', '.join(sorted(desconhecidos))}")
+        registro[subdominio] = tenant
+    return registro
+
+
+# Função para obter o registro (carregado uma vez por processo)
+def registro():
+    global _registro
+    with _lock:
+        if _registro is None:
+            _registro = carregar_registro()
+        return _registro
+
+
+# Função para obter a configuração de um tenant
+def tenant(subdominio):
+    tenants = registro()
+    if subdominio not in tenants:
+        raise ValueError(f"Subdomínio não reconhecido: {subdominio}")
+    return tenants[subdominio]
+
+
+# Função para listar os subdomínios (opcionalmente só os que rodam um endpoint)
+def subdominios(endpoint=None):
+    return [subdominio for subdominio, config in registro().items()
+            if endpoint is None or endpoint in config['endpoints']]
+
+
+# Função para obter usuário e senha de um tenant
+def credenciais(subdominio):
+    config = tenant(subdominio)
+    if not config.get('usuario') or not config.get('senha'):
+        raise ValueError(f"Credenciais ausentes para o subdomínio: {subdominio}")
+    return config['usuario'], config['senha']
+
+
+# Função para o intervalo de anos de um tenant
+def intervalo_anos(subdominio):
+    config = tenant(subdominio)
+    return config['ano_inicial'], config['ano_final']
+
+
+# Função para intercalar as tarefas dos tenants (round-robin), evitando que um tenant grande
+# ocupe a fila inteira antes dos demais
+def intercalar(tarefas_por_tenant):
+    listas = [list(tarefas) for tarefas in tarefas_por_tenant.values()]
+    intercaladas = []
+    for posicao in range(max((len(lista) for lista in listas), default=0)):
+        for lista in listas:
+            if posicao < len(lista):
+                intercaladas.append(lista[posicao])
+    return intercaladas
+
+
+# Função para calcular a espera até a próxima requisição permitida pelo ritmo do tenant
+def _reservar_vez(subdominio):
+    por_minuto = tenant(subdominio).get('requisicoes_por_minuto')
+    if not por_minuto:
+        return 0
+    with _lock:
+        agora = time.monotonic()
+        horario = max(agora, _proxima_requisicao.get(subdominio, agora))
+        _proxima_requisicao[subdominio] = horario + 60 / por_minuto
+    return horario - agora
+
+
+# Quem espera por uma vaga do orçamento: uma thread (bloqueada em um Event) ou uma tarefa
+# assíncrona (aguardando um future do seu próprio loop de eventos)
+class _Espera:
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.entregue = False
+        self.sinal = loop.create_future() if loop else threading.Event()
+
+    # Função para entregar a vaga (chamada com o lock do orçamento); False se o loop já fechou
+    def entregar(self):
+        if self.loop is None:
+            self.sinal.set()
+        else:
+            try:
+                self.loop.call_soon_threadsafe(self._resolver)
+            except RuntimeError:
+                return False
+        self.entregue = True
+        return True
+
+    def _resolver(self):
+        if not self.sinal.done():
+            self.sinal.set_result(None)
+
+
+# Orçamento de requisições de um tenant: semáforo com fila FIFO, único por processo e
+# compartilhado pelas threads e por todos os loops de eventos. Nas tarefas assíncronas a espera
+# é um future do loop da tarefa (como um asyncio.Semaphore por loop), sem consultas repetidas;
+# a vaga liberada vai direto para o primeiro da fila, então ninguém fura a fila.
+class _Orcamento:
+    def __init__(self, limite):
+        self._lock = threading.Lock()
+        self._livres = limite
+        self._fila = deque()
+
+    # Função para pegar uma vaga livre sem esperar; senão, entrar na fila
+    def _entrar(self, loop=None):
+        with self._lock:
+            if self._livres and not self._fila:
+                self._livres -= 1
+                return None
+            espera = _Espera(loop)
+            self._fila.append(espera)
+            return espera
+
+    def adquirir(self):
+        espera = self._entrar()
+        if espera is not None:
+            espera.sinal.wait()
+
+    async def adquirir_async(self):
+        espera = self._entrar(asyncio.get_running_loop())
+        if espera is None:
+            return
+        try:
+            await espera.sinal
+        except asyncio.CancelledError:
+            with self._lock:
+                entregue = espera.entregue
+                if not entregue:
+                    self._fila.remove(espera)
+            if entregue:  # A vaga chegou junto com o cancelamento: passa para o próximo
+                self.liberar()
+            raise
+
+    def liberar(self):
+        with self._lock:
+            while self._fila:
+                if self._fila.popleft().entregar():
+                    return
+            self._livres += 1
+
+
+# Função para o orçamento do tenant (criado no primeiro uso)
+def _orcamento(subdominio):
+    limite = tenant(subdominio)['max_requisicoes']
+    with _lock:
+        if subdominio not in _orcamentos:
+            _orcamentos[subdominio] = _Orcamento(limite)
+        return _orcamentos[subdominio]
+
+
+# Orçamento de requisições do tenant para código com threads
+@contextmanager
+def orcamento(subdominio):
+    orcamento_tenant = _orcamento(subdominio)
+    orcamento_tenant.adquirir()
+    try:
+        espera = _reservar_vez(subdominio)
+        if espera > 0:
+            time.sleep(espera)
+        yield
+    finally:
+        orcamento_tenant.liberar()
+
+
+# Orçamento de requisições do tenant para código assíncrono: o mesmo orçamento das threads,
+# aguardado sem bloquear o loop
+@asynccontextmanager
+async def orcamento_async(subdominio):
+    orcamento_tenant = _orcamento(subdominio)
+    await orcamento_tenant.adquirir_async()
+    try:
+        espera = _reservar_vez(subdominio)
+        if espera > 0:
+            await asyncio.sleep(espera)
+        yield
+    finally:
+        orcamento_tenant.liberar()
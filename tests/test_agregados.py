@@ -0,0 +1,62 @@
+import pandas as pd
+import agregados
+
+
+# Função para montar linhas de recebimentos no formato do CONTAS_RECEBIDAS_FINAL.py
+def recebimentos(linhas):
+    return pd.DataFrame([{'subdominio': 'sej', 'ChaveEspecifica': chave, 'companyId': 1, 'paymentDate': data,
+                          'netAmount': valor, 'grossAmount': valor} for chave, data, valor in linhas])
+
+
+def total_por_mes(diretorio):
+    resultado = agregados.recebido_por_mes(diretorio)
+    return dict(zip(resultado['mes'], resultado['netAmount']))
+
+
+# Execução com escopo não pode apagar recebimentos da mesma parcela fora do período
+def test_escopo_preserva_recebimentos_fora_do_periodo(tmp_path):
+    diretorio = str(tmp_path)
+    agregados.atualizar(recebimentos([('K', '2024-05-10', 100.0), ('K', '2025-02-10', 50.0)]),
+                        'recebidas', diretorio)
+    agregados.atualizar(recebimentos([('K', '2025-02-10', 50.0), ('K', '2025-03-10', 25.0)]),
+                        'recebidas', diretorio, escopo=('2025-01-01', '2025-12-31'))
+
+    assert total_por_mes(diretorio) == {'2024-05': 100.0, '2025-02': 50.0, '2025-03': 25.0}
+
+
+# Parcela que some do período extraído sai do agregado só no período
+def test_escopo_remove_apenas_dentro_do_periodo(tmp_path):
+    diretorio = str(tmp_path)
+    agregados.atualizar(recebimentos([('K', '2024-05-10', 100.0), ('K', '2025-02-10', 50.0),
+                                      ('L', '2025-04-10', 10.0)]), 'recebidas', diretorio)
+    agregados.atualizar(recebimentos([('L', '2025-04-10', 10.0)]),
+                        'recebidas', diretorio, escopo=('2025-01-01', '2025-12-31'))
+
+    assert total_por_mes(diretorio) == {'2024-05': 100.0, '2025-04': 10.0}
+
+    # A execução seguinte (sem mudanças) mantém o mesmo agregado
+    agregados.atualizar(recebimentos([('L', '2025-04-10', 10.0)]),
+                        'recebidas', diretorio, escopo=('2025-01-01', '2025-12-31'))
+    assert total_por_mes(diretorio) == {'2024-05': 100.0, '2025-04': 10.0}
+
+
+# Escopo por subdomínio: cada tenant só substitui os recebimentos do seu próprio período
+def test_escopo_por_subdominio(tmp_path):
+    diretorio = str(tmp_path)
+    primeira = pd.concat([recebimentos([('K', '2019-05-10', 100.0), ('K', '2024-05-10', 20.0)]),
+                          recebimentos([('M', '2019-06-10', 30.0)]).assign(subdominio='abc')], ignore_index=True)
+    agregados.atualizar(primeira, 'recebidas', diretorio)
+    agregados.atualizar(recebimentos([('K', '2024-05-10', 25.0)]), 'recebidas', diretorio,
+                        escopo={'sej': ('2020-01-01', '2040-12-31'), 'abc': ('2010-01-01', '2040-12-31')})
+
+    # sej mantém 2019 (fora do seu período); abc perde 2019 (dentro do período, não veio)
+    assert total_por_mes(diretorio) == {'2019-05': 100.0, '2024-05': 25.0}
+
+
+# Sem escopo, a execução é a carteira completa
+def test_sem_escopo_substitui_tudo(tmp_path):
+    diretorio = str(tmp_path)
+    agregados.atualizar(recebimentos([('K', '2024-05-10', 100.0)]), 'recebidas', diretorio)
+    agregados.atualizar(recebimentos([('K', '2024-05-10', 80.0)]), 'recebidas', diretorio)
+
+    assert total_por_mes(diretorio) == {'2024-05': 80.0}
@@ -0,0 +1,54 @@
+import os
+import pandas as pd
+import pytest
+import cache_arrow
+
+pytest.importorskip('pyarrow')
+
+
+# Função para listar os arquivos do cache
+def arquivos(diretorio):
+    return sorted(os.listdir(diretorio)) if os.path.isdir(diretorio) else []
+
+
+# Sem SIENGE_CACHE_ARROW, os extratores não gravam nada
+def test_atualizar_desligado_por_padrao(tmp_path, monkeypatch):
+    diretorio = str(tmp_path / 'cache')
+    monkeypatch.setattr(cache_arrow, 'DIRETORIO', diretorio)
+    monkeypatch.setattr(cache_arrow, 'ATIVO', False)
+
+    assert cache_arrow.atualizar(pd.DataFrame({'a': [1]}), 'teste') is None
+    assert arquivos(diretorio) == []
+
+    monkeypatch.setattr(cache_arrow, 'ATIVO', True)
+    assert cache_arrow.atualizar(pd.DataFrame({'a': [1]}), 'teste') is not None
+    assert len(arquivos(diretorio)) == 1
+
+
+# Cada gravação cria uma versão nova, a leitura pega a mais recente e as antigas são removidas;
+# uma tabela aberta antes continua legível
+def test_versoes_e_limpeza(tmp_path):
+    diretorio = str(tmp_path)
+    cache_arrow.salvar(pd.DataFrame({'valor': [1.5, 2.5]}), 'teste', diretorio)
+    aberta = cache_arrow.ler_tabela('teste', diretorio=diretorio)
+    cache_arrow.salvar(pd.DataFrame({'valor': [3.0]}), 'outro', diretorio)
+    ultimo = cache_arrow.salvar(pd.DataFrame({'valor': [10.0, 20.0, 30.0]}), 'teste', diretorio)
+
+    assert cache_arrow.caminho_atual('teste', diretorio) == ultimo
+    assert cache_arrow.carregar('teste', diretorio=diretorio, tipos_arrow=False)['valor'].tolist() == [10.0, 20.0, 30.0]
+    assert [arquivo.split('.')[0] for arquivo in arquivos(diretorio)] == ['outro', 'teste']
+    assert aberta.column('valor').to_pylist() == [1.5, 2.5]
+
+
+# CSV gravado em partes vai para o cache com os tipos descobertos nos blocos
+def test_salvar_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_arrow, 'TAMANHO_LOTE', 2)
+    caminho_csv = str(tmp_path / 'vendas.csv')
+    pd.DataFrame({'id': [1, 2, 3], 'valor': [1, 2, 3.5], 'nome': ['a', None, 'c']}).to_csv(caminho_csv, index=False)
+
+    cache_arrow.salvar_csv(caminho_csv, 'vendas', str(tmp_path))
+
+    df = cache_arrow.carregar('vendas', diretorio=str(tmp_path), tipos_arrow=False)
+    assert df['id'].tolist() == [1, 2, 3]
+    assert df['valor'].tolist() == [1.0, 2.0, 3.5]
+    assert str(cache_arrow.ler_tabela('vendas', diretorio=str(tmp_path)).schema.field('valor').type) == 'double'
@@ -0,0 +1,108 @@
+import gzip
+import json
+import asyncio
+
+import aiohttp
+import pytest
+import requests
+from multidict import CIMultiDict
+
+import cassete
+
+CABECALHOS_SECRETOS = {'Set-Cookie': 'sessao=segredo', 'Authorization': 'Basic segredo'}
+
+
+@pytest.fixture(autouse=True)
+def desativar_ao_final():
+    yield
+    cassete.desativar()
+
+
+# Função para o conteúdo do cassete gravado, em texto
+def conteudo(caminho):
+    with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+        return arquivo.read()
+
+
+# requests: gravação sem cabeçalhos sensíveis e reprodução na ordem gravada, sem rede
+def test_requests_grava_e_reproduz(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'api.cassete')
+    corpos = iter([b'{"pagina": 1}', b'{"pagina": 2}'])
+
+    def send_falso(sessao, requisicao, **kwargs):
+        resposta = requests.Response()
+        resposta.status_code, resposta.reason = 200, 'OK'
+        resposta.headers = requests.structures.CaseInsensitiveDict({'Content-Type': 'application/json',
+                                                                    **CABECALHOS_SECRETOS})
+        resposta._content = next(corpos)
+        resposta.url, resposta.request = requisicao.url, requisicao
+        return resposta
+
+    monkeypatch.setattr(requests.Session, 'send', send_falso)
+    cassete.ativar('gravar', caminho)
+    for _ in range(2):
+        requests.get('https://api.exemplo/t/contas?b=2&a=1', headers={'Authorization': 'Basic segredo'})
+    cassete.desativar()
+
+    assert 'segredo' not in conteudo(caminho)
+    assert 'Content-Type' in conteudo(caminho)
+
+    def sem_rede(sessao, requisicao, **kwargs):
+        raise AssertionError("A reprodução não pode acessar a rede")
+
+    monkeypatch.setattr(requests.Session, 'send', sem_rede)
+    cassete.ativar('reproduzir', caminho)
+    respostas = [requests.get('https://api.exemplo/t/contas', params={'a': 1, 'b': 2}) for _ in range(3)]
+    assert [resposta.json()['pagina'] for resposta in respostas] == [1, 2, 2]  # A última se repete
+    assert 'Set-Cookie' not in respostas[0].headers
+    with pytest.raises(requests.ConnectionError):
+        requests.get('https://api.exemplo/t/outra')
+
+
+# Resposta aiohttp falsa (interface usada pelo cassete na gravação)
+class RespostaAiohttp:
+    status = 200
+    reason = 'OK'
+
+    def __init__(self, corpo):
+        self.headers = CIMultiDict({'Content-Type': 'application/json', **CABECALHOS_SECRETOS})
+        self.corpo = corpo
+
+    async def read(self):
+        return self.corpo
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excecao):
+        pass
+
+
+# aiohttp: gravação sem cabeçalhos sensíveis e reprodução com RespostaGravada, sem rede
+def test_aiohttp_grava_e_reproduz(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'api.cassete')
+
+    async def request_falso(sessao, metodo, url, **kwargs):
+        return RespostaAiohttp(b'{"dados": [1, 2]}')
+
+    async def buscar():
+        async with aiohttp.ClientSession() as sessao:
+            async with sessao.get('https://api.exemplo/t/extratos', params={'fim': '2024', 'inicio': '2020'},
+                                  headers={'Authorization': 'Basic segredo'}) as resposta:
+                return resposta.status, json.loads(await resposta.read()), dict(resposta.headers)
+
+    monkeypatch.setattr(aiohttp.ClientSession, '_request', request_falso)
+    cassete.ativar('gravar', caminho)
+    asyncio.run(buscar())
+    cassete.desativar()
+
+    assert 'segredo' not in conteudo(caminho)
+
+    async def sem_rede(sessao, metodo, url, **kwargs):
+        raise AssertionError("A reprodução não pode acessar a rede")
+
+    monkeypatch.setattr(aiohttp.ClientSession, '_request', sem_rede)
+    cassete.ativar('reproduzir', caminho)
+    status, dados, cabecalhos = asyncio.run(buscar())
+    assert (status, dados) == (200, {'dados': [1, 2]})
+    assert cabecalhos == {'Content-Type': 'application/json'}
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import conciliacao
+
+
+# Chave composta e decompor devolvem as mesmas partes
+def test_chave_composta_ida_e_volta():
+    partes = {'subdominio': [0, 3, 63], 'empresa': [1, 16383, 7], 'conta': [5, 2 ** 31 - 1, 123456],
+              'parcela': [1, 4095, 12]}
+    chaves = conciliacao.chave_composta(*partes.values())
+
+    assert chaves.dtype == np.int64
+    assert len(set(chaves)) == 3
+    assert {nome: list(valores) for nome, valores in conciliacao.decompor(chaves).items()} == partes
+
+
+# Valores fora dos bits (parcela negativa, conta grande) entram por código denso e voltam iguais
+def test_chave_composta_com_dicionarios():
+    preparado = pd.DataFrame({'subdominio': [0, 0, 1], 'empresa': [1, 1, 2], 'conta': [2 ** 40, 7, 2 ** 40],
+                              'parcela': [-1, 3, 5000]})
+    dicionarios = conciliacao.dicionarios_chave([preparado])
+    chaves = conciliacao.chave_composta(*(preparado[nome] for nome, _ in conciliacao.BITS), dicionarios)
+
+    assert sorted(dicionarios) == ['conta', 'parcela']
+    partes = conciliacao.decompor(chaves, dicionarios)
+    assert {nome: list(valores) for nome, valores in partes.items()} == preparado.to_dict('list')
+
+
+# Conciliação de um exemplo pequeno: só a parcela com diferença acima da tolerância diverge
+def test_conciliar_exemplo():
+    recebidas = pd.DataFrame({'subdominio': ['sej', 'sej', 'abc'], 'companyId': ['1', '1', '2'],
+                              'billId': ['10', '10', '99999999999'], 'installmentId': ['1', '2', '1'],
+                              'netAmount': ['100,00', '50,00', '1.000,00'],
+                              'paymentDate': ['2024-01-05', '2024-02-05', '2024-01-20']})
+    extratos = pd.DataFrame({'subdominio': ['sej', 'sej', 'sej', 'abc'], 'company_id': [1, 1, 1, 2],
+                             'billReceivableId': [10, 10, 10, 99999999999], 'installment_id': [1, 2, 3, 1],
+                             'receipt_netReceipt': [100.0, 45.0, None, 1000.004],
+                             'receipt_date': ['2024-01-05', '2024-02-05', None, '2024-01-20']})
+
+    divergencias, resumo = conciliacao.conciliar(recebidas, extratos)
+
+    assert divergencias[['subdominio', 'companyId', 'billId', 'installmentId', 'mes', 'diferenca', 'tipo']]\
+        .to_dict('records') == [{'subdominio': 'sej', 'companyId': 1, 'billId': 10, 'installmentId': 2,
+                                 'mes': '2024-02', 'diferenca': 5.0, 'tipo': 'recebido'}]
+    totais = resumo.set_index(['subdominio', 'mes'])['recebido_income'].to_dict()
+    assert totais == {('abc', '2024-01'): 1000.0, ('sej', '2024-01'): 100.0, ('sej', '2024-02'): 50.0}
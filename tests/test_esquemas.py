@@ -0,0 +1,49 @@
+import json
+
+import pandas as pd
+import pytest
+
+import esquemas
+
+pytest.importorskip('msgspec')
+
+
+def income(registros):
+    return json.dumps({'data': registros}).encode()
+
+
+# Os Structs viram as mesmas colunas do pd.json_normalize sobre os dicionários da API
+def test_normalizar_structs_como_json_normalize():
+    registros = [
+        {'companyId': 1, 'billId': 10, 'paymentTerm': {'id': 'PM', 'descrition': 'Mensal'},
+         'correctedBalanceAmount': 5, 'receipts': [{'netAmount': 1.5}]},
+        {'companyId': 2, 'billId': 11, 'clientName': 'Cliente', 'receipts': []},
+    ]
+    structs, _ = esquemas.decodificar('income', income(registros))
+    df = esquemas.normalizar(structs)
+    esperado = pd.json_normalize(registros)
+
+    assert sorted(df.columns) == sorted(esperado.columns)
+    assert df['paymentTerm.id'].tolist()[0] == 'PM'
+    assert df['correctedBalanceAmount'].tolist()[0] == 5.0
+    recibos = esquemas.normalizar(df['receipts'].explode())
+    assert recibos['netAmount'].tolist()[0] == 1.5
+
+
+# Campos não declarados são descartados e os Structs respondem a .get como os dicionários
+def test_structs_com_get():
+    structs, _ = esquemas.decodificar('income', income([{'companyId': 1, 'naoDeclarado': 'x'}]))
+
+    assert structs[0].get('companyId') == 1
+    assert structs[0].get('paymentTerm', {}) == {}
+    assert 'naoDeclarado' not in esquemas.normalizar(structs).columns
+
+
+# Endpoints que preservam todos os campos são validados, mas seguem como dicionários
+def test_preservados_validados():
+    corpo = json.dumps({'results': [{'privateArea': 10, 'outro': 1}]}).encode()
+    registros, _ = esquemas.decodificar('units', corpo)
+    assert registros == [{'privateArea': 10, 'outro': 1}]
+
+    with pytest.raises(esquemas.EsquemaIncompativel):
+        esquemas.decodificar('units', json.dumps({'results': [{'privateArea': 'dez'}]}).encode())
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+import exportar_excel
+
+
+# Função para ler as planilhas gravadas: {nome: (cabeçalho, linhas, formatos de número da 1ª linha de dados)}
+def ler_planilhas(caminho):
+    workbook = load_workbook(caminho)
+    planilhas = {}
+    for worksheet in workbook.worksheets:
+        linhas = [[celula.value for celula in linha] for linha in worksheet.iter_rows()]
+        formatos = [celula.number_format for celula in worksheet[2]] if worksheet.max_row > 1 else []
+        planilhas[worksheet.title] = (linhas[0], linhas[1:], formatos)
+    return planilhas
+
+
+@pytest.fixture(params=['xlsxwriter', 'openpyxl'])
+def motor(request, monkeypatch):
+    if request.param == 'openpyxl':
+        monkeypatch.setattr(exportar_excel, 'xlsxwriter', None)
+    elif exportar_excel.xlsxwriter is None:
+        pytest.skip("xlsxwriter não instalado")
+    return request.param
+
+
+# Acima do limite de linhas, o subdomínio continua em novas planilhas com o cabeçalho repetido
+def test_divide_planilhas_no_limite_de_linhas(tmp_path, monkeypatch, motor):
+    monkeypatch.setattr(exportar_excel, 'LIMITE_LINHAS_EXCEL', 3)  # Cabeçalho + 2 linhas
+    df = pd.DataFrame({'subdominio': ['sej'] * 5 + ['abc'],
+                       'billId': range(6), 'netAmount': [1.5, 2.0, 3.25, 4.0, 5.0, 6.0]})
+    caminho = str(tmp_path / 'saida.xlsx')
+
+    total = exportar_excel.exportar(exportar_excel.por_subdominio(df), caminho, tamanho_bloco=2)
+
+    planilhas = ler_planilhas(caminho)
+    assert total == 6
+    assert list(planilhas) == ['abc', 'sej', 'sej (2)', 'sej (3)']
+    assert all(cabecalho == ['subdominio', 'billId', 'netAmount'] for cabecalho, _, _ in planilhas.values())
+    assert [linha[2] for nome in ['sej', 'sej (2)', 'sej (3)'] for linha in planilhas[nome][1]] == [1.5, 2.0, 3.25, 4.0, 5.0]
+
+
+# Formatos de número: valores com 2 casas, identificadores sem formato e 'regras' por coluna
+def test_formatos_de_numero(tmp_path, motor):
+    df = pd.DataFrame({'billId': [1], 'netAmount': [1234.5], 'taxa': [0.125]})
+    caminho = str(tmp_path / 'saida.xlsx')
+
+    exportar_excel.exportar({'Dados': df}, caminho, regras={'taxa': 3})
+
+    _, linhas, formatos = ler_planilhas(caminho)['Dados']
+    assert linhas == [[1, 1234.5, 0.125]]
+    assert formatos == ['General', '#,##0.00', '#,##0.000']
@@ -0,0 +1,50 @@
+import pandas as pd
+import Extratos
+
+
+# Função para montar um recibo do extrato
+def recibo(data, valor):
+    return {'date': data, 'value': valor, 'netReceipt': valor, 'type': 'REC'}
+
+
+# Extrato com: conta com duas parcelas pagas (uma com dois recibos), conta cuja última parcela
+# não tem recibo e conta sem parcelas
+DADOS = {'data': [
+    {'billReceivableId': 1, 'company': {'id': 10}, 'units': [{'id': 100, 'name': 'A'}, {'id': 101, 'name': 'B'}],
+     'installments': [{'id': 1, 'dueDate': '2024-01-10', 'receipts': [recibo('2024-01-10', 50.0), recibo('2024-01-20', 50.0)]},
+                      {'id': 2, 'dueDate': '2024-02-10', 'receipts': [recibo('2024-02-10', 100.0)]}]},
+    {'billReceivableId': 2, 'company': {'id': 10}, 'units': [],
+     'installments': [{'id': 1, 'dueDate': '2024-01-10', 'receipts': [recibo('2024-01-11', 80.0)]},
+                      {'id': 2, 'dueDate': '2024-02-10', 'receipts': []}]},
+    {'billReceivableId': 3, 'company': {'id': 11}, 'units': [{'id': 300, 'name': 'C'}], 'installments': []},
+]}
+
+
+# Função para as linhas com e sem recibo, ordenadas, com índice novo e None nos vazios
+def separar(df):
+    df = df.sort_values(['billReceivableId', 'installment_id', 'receipt_date'], na_position='first')
+    df = df.astype(object).where(df.notna(), None)
+    com_recibo = df['receipt_date'].notna()
+    return df[com_recibo].reset_index(drop=True), df[~com_recibo].reset_index(drop=True)
+
+
+# As linhas com recibo da visão desnormalizada são iguais às do CSV largo
+def test_desnormalizar_igual_ao_largo_nos_recibos():
+    largo = Extratos.converter_para_dataframe(DADOS)
+    desnormalizado = Extratos.desnormalizar(Extratos.converter_para_tabelas(DADOS))
+
+    assert list(desnormalizado.columns) == list(largo.columns)
+    recibos_largo, _ = separar(largo)
+    recibos_desnormalizado, _ = separar(desnormalizado)
+    assert len(recibos_largo) == 4
+    pd.testing.assert_frame_equal(recibos_desnormalizado, recibos_largo, check_dtype=False)
+
+
+# Sem recibo: a visão desnormalizada traz a parcela em aberto; o CSV largo, só os campos da conta
+def test_desnormalizar_linhas_sem_recibo():
+    _, sem_recibo_largo = separar(Extratos.converter_para_dataframe(DADOS))
+    _, sem_recibo = separar(Extratos.desnormalizar(Extratos.converter_para_tabelas(DADOS)))
+
+    assert sem_recibo[['billReceivableId', 'installment_id']].values.tolist() == [[2, 2], [3, None]]
+    assert sem_recibo_largo['billReceivableId'].tolist() == [2, 3]
+    assert sem_recibo_largo['installment_id'].tolist() == [None, None]
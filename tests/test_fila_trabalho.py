@@ -0,0 +1,72 @@
+import fila_trabalho
+
+
+# Função para o status e as tentativas de cada tarefa da fila
+def estado(caminho_fila):
+    conexao = fila_trabalho.conectar(caminho_fila)
+    try:
+        return conexao.execute("SELECT id, status, tentativas FROM tarefas ORDER BY id").fetchall()
+    finally:
+        conexao.close()
+
+
+# Reenfileirar as mesmas tarefas (mesmo com outra ordem de parâmetros) não duplica nada
+def test_enfileirar_ignora_repetidas(tmp_path):
+    caminho_fila = str(tmp_path / 'fila.db')
+    assert fila_trabalho.enfileirar(caminho_fila, 'a_receber', 'sej', [{'inicio': '2020-01-01', 'fim': '2020-12-31'}]) == 1
+    assert fila_trabalho.enfileirar(caminho_fila, 'a_receber', 'sej', [{'fim': '2020-12-31', 'inicio': '2020-01-01'},
+                                                                      {'inicio': '2021-01-01', 'fim': '2021-12-31'}]) == 1
+    assert fila_trabalho.enfileirar(caminho_fila, 'a_receber', 'abc', [{'inicio': '2020-01-01', 'fim': '2020-12-31'}]) == 1
+    assert len(estado(caminho_fila)) == 3
+
+
+# Lease expirado devolve a tarefa para outro trabalhador; o dono antigo não consegue concluí-la
+def test_lease_expirado_volta_para_a_fila(tmp_path, monkeypatch):
+    caminho_fila = str(tmp_path / 'fila.db')
+    fila_trabalho.enfileirar(caminho_fila, 'a_receber', 'sej', [{'inicio': '2020-01-01', 'fim': '2020-12-31'}])
+    conexao = fila_trabalho.conectar(caminho_fila)
+    try:
+        monkeypatch.setattr(fila_trabalho, 'DURACAO_LEASE', -1)  # Lease já nasce expirado
+        primeira = fila_trabalho.arrendar(conexao, 'trabalhador-a')
+        monkeypatch.setattr(fila_trabalho, 'DURACAO_LEASE', 300)
+        segunda = fila_trabalho.arrendar(conexao, 'trabalhador-b')
+
+        assert segunda['id'] == primeira['id']
+        assert (primeira['tentativas'], segunda['tentativas']) == (0, 1)
+        assert fila_trabalho.arrendar(conexao, 'trabalhador-c') is None  # Lease de b ainda válido
+        assert not fila_trabalho.concluir(conexao, primeira['id'], 'trabalhador-a')
+        assert fila_trabalho.concluir(conexao, segunda['id'], 'trabalhador-b')
+    finally:
+        conexao.close()
+    assert estado(caminho_fila) == [(primeira['id'], 'concluida', 1)]
+
+
+# Após MAX_TENTATIVAS leases expirados, a tarefa é marcada como falha e não é mais arrendada
+def test_leases_expirados_ate_o_limite(tmp_path, monkeypatch):
+    caminho_fila = str(tmp_path / 'fila.db')
+    monkeypatch.setattr(fila_trabalho, 'DURACAO_LEASE', -1)
+    fila_trabalho.enfileirar(caminho_fila, 'a_receber', 'sej', [{'inicio': '2020-01-01', 'fim': '2020-12-31'}])
+    conexao = fila_trabalho.conectar(caminho_fila)
+    try:
+        tentativas = [fila_trabalho.arrendar(conexao, f'trabalhador-{indice}')['tentativas']
+                      for indice in range(fila_trabalho.MAX_TENTATIVAS)]
+        assert tentativas == list(range(fila_trabalho.MAX_TENTATIVAS))
+        assert fila_trabalho.arrendar(conexao, 'trabalhador-final') is None
+    finally:
+        conexao.close()
+    assert estado(caminho_fila)[0][1:] == ('falhou', fila_trabalho.MAX_TENTATIVAS)
+
+
+# Falhas registradas pelo trabalhador devolvem a tarefa à fila até MAX_TENTATIVAS
+def test_falhas_ate_o_limite(tmp_path):
+    caminho_fila = str(tmp_path / 'fila.db')
+    fila_trabalho.enfileirar(caminho_fila, 'unidades', 'sej', [{'offset': 0, 'limit': 200}])
+    conexao = fila_trabalho.conectar(caminho_fila)
+    try:
+        for _ in range(fila_trabalho.MAX_TENTATIVAS):
+            tarefa = fila_trabalho.arrendar(conexao, 'trabalhador')
+            fila_trabalho.falhar(conexao, tarefa['id'], 'trabalhador', RuntimeError("erro"))
+        assert fila_trabalho.arrendar(conexao, 'trabalhador') is None
+    finally:
+        conexao.close()
+    assert estado(caminho_fila)[0][1:] == ('falhou', fila_trabalho.MAX_TENTATIVAS)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import formatacao
+
+
+# Referência: o formatador do Python, com os separadores trocados
+def referencia(valores, casas, milhar, decimal):
+    return [f'{valor:,.{casas}f}'.translate(str.maketrans({',': milhar, '.': decimal}))
+            if np.isfinite(valor) else None for valor in valores]
+
+
+def valores_teste():
+    rng = np.random.default_rng(34)
+    valores = np.concatenate([
+        np.round(rng.lognormal(6, 4, 5000) * rng.choice([-1, 1], 5000), 4),
+        rng.uniform(-1e6, 1e6, 2000),
+        np.arange(-2000, 2000) / 200,  # Meios centavos (arredondamento do Python)
+        [0.0, -0.0, -0.001, 0.005, 1.005, 2.675, 999.995, 1e15, -1e15, 2 ** 53, 1e300, -1e-300,
+         np.nan, np.inf, -np.inf],
+    ])
+    return pd.Series(valores)
+
+
+def como_lista(serie):
+    return [None if pd.isna(valor) else valor for valor in serie.astype(object)]
+
+
+@pytest.mark.parametrize('casas', [0, 1, 2, 3, 5])
+@pytest.mark.parametrize('milhar, decimal', [('.', ','), ('', ','), (',', '.')])
+@pytest.mark.parametrize('com_pyarrow', [True, False])
+def test_formatar_numero_igual_ao_python(monkeypatch, casas, milhar, decimal, com_pyarrow):
+    if com_pyarrow and formatacao.pa is None:
+        pytest.skip("pyarrow não instalado")
+    if not com_pyarrow:
+        monkeypatch.setattr(formatacao, 'pa', None)
+    serie = valores_teste()
+
+    resultado = formatacao.formatar_numero(serie, casas, milhar, decimal)
+
+    assert como_lista(resultado) == referencia(serie.to_numpy(), casas, milhar, decimal)
+    assert resultado.index.equals(serie.index)
+
+
+# Série vazia ou só com nulos
+def test_formatar_numero_sem_valores():
+    assert len(formatacao.formatar_numero(pd.Series([], dtype='float64'))) == 0
+    assert como_lista(formatacao.formatar_numero(pd.Series([np.nan, None], dtype='float64'))) == [None, None]
+
+
+# Mesmo resultado das funções antigas (lambda com .replace) nas colunas formatadas
+def test_formatar_colunas_regras():
+    df = pd.DataFrame({'netAmount': [1234.5, -0.5, np.nan], 'billId': [1, 2, 3], 'taxa': [0.12345, 1, 2]})
+
+    formatacao.formatar_colunas(df, regras={'billId': None, 'taxa': 3})
+
+    assert como_lista(df['netAmount']) == ['1.234,50', '-0,50', None]
+    assert df['billId'].tolist() == [1, 2, 3]
+    assert como_lista(df['taxa']) == ['0,123', '1,000', '2,000']
+
+
+def test_ler_numero_volta_ao_valor():
+    serie = pd.Series([1234.56, -0.5, np.nan, 1e9])
+    lido = formatacao.ler_numero(formatacao.formatar_numero(serie))
+    np.testing.assert_array_equal(lido.to_numpy(), serie.to_numpy())
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+import limites_tempo
+import tenants
+
+
+# Sessão aiohttp falsa: a primeira requisição trava, as seguintes respondem logo
+class SessaoFalsa:
+    def __init__(self, atraso_primeira):
+        self.atraso_primeira = atraso_primeira
+        self.chamadas = 0
+        self.em_andamento = 0
+        self.pico = 0
+
+    def get(self, url, **kwargs):
+        self.chamadas += 1
+        return RespostaFalsa(self, self.atraso_primeira if self.chamadas == 1 else 0.01)
+
+
+class RespostaFalsa:
+    status = 200
+
+    def __init__(self, sessao, atraso):
+        self.sessao = sessao
+        self.atraso = atraso
+
+    async def __aenter__(self):
+        self.sessao.em_andamento += 1
+        self.sessao.pico = max(self.sessao.pico, self.sessao.em_andamento)
+        return self
+
+    async def __aexit__(self, *erro):
+        self.sessao.em_andamento -= 1
+
+    async def read(self):
+        await asyncio.sleep(self.atraso)
+        return b'{}'
+
+
+@pytest.fixture
+def tenant(monkeypatch):
+    def configurar(limite):
+        monkeypatch.setattr(tenants, '_registro', {'t': {**tenants.PADRAO, 'subdominio': 't', 'max_requisicoes': limite}})
+        monkeypatch.setattr(tenants, '_orcamentos', {})
+        monkeypatch.setattr(tenants, '_proxima_requisicao', {})
+    monkeypatch.setattr(limites_tempo, 'limite_hedge', lambda endpoint: 0.05)
+    monkeypatch.setattr(limites_tempo, 'registrar', lambda endpoint, duracao: None)
+    return configurar
+
+
+# A cópia do hedge ocupa seu próprio lugar no orçamento: com a primeira tentativa travada, o
+# tenant nunca passa de max_requisicoes requisições em andamento
+@pytest.mark.parametrize('limite, chamadas_esperadas', [(1, 1), (2, 2)])
+def test_hedge_async_respeita_orcamento(tenant, limite, chamadas_esperadas):
+    tenant(limite)
+    sessao = SessaoFalsa(atraso_primeira=0.5)
+
+    async def varias():
+        return await asyncio.gather(*(limites_tempo.obter_async(sessao, 'vendas', 'url', subdominio='t', timeout=None)
+                                      for _ in range(3)))
+
+    respostas = asyncio.run(varias())
+
+    assert [resposta.status for resposta in respostas] == [200] * 3
+    assert sessao.pico <= limite
+    if limite == 2:  # Com lugar livre, a cópia sai enquanto a primeira está travada
+        assert sessao.chamadas >= 4
+
+
+# Sem lugar no orçamento, a cópia espera e não sai se a primeira responder antes
+def test_copia_dispensada_quando_primeira_responde(tenant):
+    tenant(1)
+    sessao = SessaoFalsa(atraso_primeira=0.2)
+
+    resposta = asyncio.run(limites_tempo.obter_async(sessao, 'vendas', 'url', subdominio='t', timeout=None))
+
+    assert resposta.status == 200
+    assert sessao.chamadas == 1
+    assert sessao.pico == 1
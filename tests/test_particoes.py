@@ -0,0 +1,18 @@
+import pandas as pd
+import particoes
+
+
+# Função para montar linhas de recebimentos de um subdomínio
+def recebimentos(subdominio, datas):
+    return pd.DataFrame([{'subdominio': subdominio, 'paymentDate': data, 'netAmount': 10.0} for data in datas])
+
+
+# Gravação parcial (só uma janela) deve registrar nos metadados o total do dataset
+def test_metadados_com_total_do_dataset(tmp_path):
+    raiz = str(tmp_path)
+    particoes.gravar_particionado(recebimentos('sej', ['2023-01-10', '2023-02-10', '2024-01-10']),
+                                  raiz, 'recebidas', 'paymentDate')
+    particoes.gravar_particionado(recebimentos('sej', ['2024-03-10']), raiz, 'recebidas', 'paymentDate')
+
+    assert particoes.ler_metadados(raiz, 'recebidas')['linhas'] == 3
+    assert len(particoes.ler(raiz, 'recebidas')) == 3
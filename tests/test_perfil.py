@@ -0,0 +1,90 @@
+import time
+import asyncio
+
+import pytest
+
+import limites_tempo
+import perfil
+import tenants
+
+
+@pytest.fixture(autouse=True)
+def perfil_ativo(monkeypatch):
+    monkeypatch.setattr(perfil, '_ativo', True)
+    monkeypatch.setattr(perfil, '_medicoes', [])
+    monkeypatch.setattr(perfil, '_estagios_abertos', 0)
+
+
+# Função para a medição de um estágio pelo nome
+def medicao(nome):
+    registros = [registro for registro in perfil.medicoes() if registro['estagio'] == nome]
+    assert len(registros) == 1
+    return registros[0]
+
+
+# Estágio assíncrono registra só o tempo de parede (sem o CPU das outras tarefas do loop)
+def test_estagio_assincrono_sem_cpu():
+    async def ocupada():
+        fim = time.perf_counter() + 0.1
+        while time.perf_counter() < fim:
+            await asyncio.sleep(0)
+
+    async def cenario():
+        tarefa = asyncio.create_task(ocupada())
+        with perfil.estagio('fetch', 'sej', 'p1'):
+            await asyncio.sleep(0.1)
+        await tarefa
+
+    asyncio.run(cenario())
+    with perfil.estagio('write'):
+        pass
+
+    assert medicao('fetch')['cpu'] is None
+    assert medicao('fetch')['parede'] >= 0.09
+    assert medicao('write')['cpu'] is not None
+    linha_fetch = next(linha for linha in perfil.tabela_resumo(perfil.medicoes()).splitlines() if linha.startswith('fetch'))
+    assert linha_fetch.split()[3] == '-'
+
+
+# A espera pelo orçamento do tenant vira o estágio 'espera', descontado do 'fetch'
+def test_espera_do_orcamento_fora_do_fetch(monkeypatch):
+    monkeypatch.setattr(tenants, '_registro', {'t': {**tenants.PADRAO, 'subdominio': 't', 'max_requisicoes': 1}})
+    monkeypatch.setattr(tenants, '_orcamentos', {})
+    monkeypatch.setattr(tenants, '_proxima_requisicao', {})
+    monkeypatch.setattr(limites_tempo, 'limite_hedge', lambda endpoint: None)
+    monkeypatch.setattr(limites_tempo, 'registrar', lambda endpoint, duracao: None)
+    limites_tempo.timeout_aiohttp('vendas')  # Importa o aiohttp antes de medir
+
+    class Resposta:
+        status = 200
+
+        async def __aenter__(self):
+            await asyncio.sleep(0.05)
+            return self
+
+        async def __aexit__(self, *erro):
+            pass
+
+        async def read(self):
+            return b'{}'
+
+    class Sessao:
+        def get(self, url, **kwargs):
+            return Resposta()
+
+    async def cenario():
+        async def ocupar():
+            async with tenants.orcamento_async('t'):
+                await asyncio.sleep(0.2)
+
+        ocupante = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        with perfil.estagio('fetch', 't', 'janela'):
+            await limites_tempo.obter_async(Sessao(), 'vendas', 'https://api.exemplo', subdominio='t')
+        await ocupante
+
+    asyncio.run(cenario())
+    espera, fetch = medicao('espera'), medicao('fetch')
+    assert (espera['subdominio'], espera['janela']) == ('t', 'janela')
+    assert espera['parede'] >= 0.15
+    assert 0.04 <= fetch['parede'] < 0.15
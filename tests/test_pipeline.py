@@ -0,0 +1,74 @@
+import os
+import asyncio
+import pandas as pd
+import pipeline
+
+
+# Função para listar os arquivos temporários do gravador
+def temporarios(caminho):
+    pasta, nome = os.path.split(caminho)
+    return sorted(arquivo for arquivo in os.listdir(pasta) if arquivo.startswith(f"{nome}.tmp"))
+
+
+# Lotes com colunas novas abrem novos trechos; em fechar() as colunas dos trechos antigos são
+# completadas e o resultado é igual ao pd.concat de todos os lotes
+def test_gravador_junta_trechos_com_colunas_novas(tmp_path):
+    caminho = str(tmp_path / 'saida.csv')
+    lotes = [pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}),
+             pd.DataFrame({'b': ['z'], 'a': [3]}),
+             pd.DataFrame({'a': [4], 'c': ['novo']}),
+             pd.DataFrame({'c': ['w'], 'b': ['v'], 'a': [5]})]
+    gravador = pipeline.GravadorCSV(caminho)
+    for lote in lotes:
+        gravador.gravar(lote)
+
+    assert len(gravador.trechos) == 2
+    assert not os.path.exists(caminho)  # Nada publicado antes de fechar()
+    assert gravador.fechar() == 5
+
+    esperado = pd.concat(lotes, ignore_index=True).to_csv(index=False)
+    with open(caminho, encoding='utf-8') as arquivo:
+        assert arquivo.read() == esperado
+    assert temporarios(caminho) == []
+
+
+# Execução com erro: descartar() remove os temporários e mantém o CSV publicado antes
+def test_gravador_descartar_mantem_arquivo_anterior(tmp_path):
+    caminho = str(tmp_path / 'saida.csv')
+    pd.DataFrame({'a': [1]}).to_csv(caminho, index=False)
+    gravador = pipeline.GravadorCSV(caminho)
+    gravador.gravar(pd.DataFrame({'a': [2, 3]}))
+    gravador.gravar(pd.DataFrame({'a': [4], 'b': [5]}))
+
+    gravador.descartar()
+
+    assert temporarios(caminho) == []
+    assert pd.read_csv(caminho)['a'].tolist() == [1]
+
+
+# Sem lotes (ou só páginas vazias), fechar() publica um CSV vazio com as colunas conhecidas
+def test_gravador_sem_linhas(tmp_path):
+    caminho = str(tmp_path / 'saida.csv')
+    gravador = pipeline.GravadorCSV(caminho)
+    gravador.gravar(pd.DataFrame())
+    gravador.gravar(pd.DataFrame(columns=['a', 'b']))
+
+    assert gravador.fechar() == 0
+    assert list(pd.read_csv(caminho).columns) == ['a', 'b']
+
+
+# O pipeline grava os lotes normalizados na ordem em que foram buscados
+def test_executar_preserva_ordem(tmp_path):
+    async def produtor(inicio):
+        for numero in range(inicio, inicio + 3):
+            await asyncio.sleep(0)
+            yield pd.DataFrame({'n': [numero]})
+
+    caminho = str(tmp_path / 'saida.csv')
+    gravador = pipeline.GravadorCSV(caminho)
+    lotes = asyncio.run(pipeline.executar([produtor(0)], lambda df: df.assign(dobro=df['n'] * 2),
+                                          gravador.gravar, tamanho_fila=1))
+    gravador.fechar()
+
+    assert lotes == 3
+    assert pd.read_csv(caminho).to_dict('list') == {'n': [0, 1, 2], 'dobro': [0, 2, 4]}
@@ -0,0 +1,67 @@
+import json
+import asyncio
+import servico_atualizacao
+
+
+# Ciclo mais lento que o intervalo: os ciclos seguintes são pulados, sem execuções sobrepostas
+def test_ciclo_lento_e_pulado(tmp_path, monkeypatch):
+    execucoes = {'atuais': 0, 'pico': 0}
+
+    async def lenta():
+        execucoes['atuais'] += 1
+        execucoes['pico'] = max(execucoes['pico'], execucoes['atuais'])
+        try:
+            await asyncio.sleep(0.3)
+        finally:
+            execucoes['atuais'] -= 1
+        return []
+
+    monkeypatch.setitem(servico_atualizacao.ATUALIZACOES, 'lenta', lenta)
+    servico = servico_atualizacao.Servico({'lenta': 0.05 / 60}, str(tmp_path / 'estado.json'))  # 50 ms
+
+    async def rodar():
+        try:
+            await asyncio.wait_for(servico.executar(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(rodar())
+    estado = servico.estado['lenta']
+    assert estado['ciclos'] <= 1
+    assert estado['ciclos_pulados'] >= 3
+    assert execucoes['pico'] == 1
+
+
+# Ciclo com erro não publica nada: o arquivo anterior continua, e o temporário que sobrou não
+# é publicado pelo ciclo seguinte
+def test_ciclo_com_erro_mantem_arquivo_publicado(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    destino = 'base.csv'
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('a\n1\n')
+
+    def com_erro():
+        with open(servico_atualizacao.novo_temporario(destino), 'w', encoding='utf-8') as arquivo:
+            arquivo.write('a\n')  # Gravação interrompida no meio
+        raise RuntimeError("API fora do ar")
+
+    def sem_dados():
+        servico_atualizacao.novo_temporario(destino)
+        return [destino] if servico_atualizacao.publicar(destino) else []
+
+    monkeypatch.setitem(servico_atualizacao.ATUALIZACOES, 'base', com_erro)
+    servico = servico_atualizacao.Servico({'base': 60}, 'estado.json')
+    asyncio.run(servico.ciclo('base'))
+
+    with open(destino, encoding='utf-8') as arquivo:
+        assert arquivo.read() == 'a\n1\n'
+    with open('estado.json', encoding='utf-8') as arquivo:
+        estado = json.load(arquivo)['base']
+    assert 'API fora do ar' in estado['ultimo_erro']
+    assert 'ultima_publicacao' not in estado
+
+    monkeypatch.setitem(servico_atualizacao.ATUALIZACOES, 'base', sem_dados)
+    asyncio.run(servico.ciclo('base'))
+    with open(destino, encoding='utf-8') as arquivo:
+        assert arquivo.read() == 'a\n1\n'
+    assert servico.estado['base']['arquivos'] == []
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+import snapshots
+
+
+def carteira(linhas):
+    return pd.DataFrame([{'subdominio': 'sej', 'ChaveEspecifica': chave, 'clientId': cliente,
+                          'dueDate': '2025-03-10', 'correctedBalanceAmount': saldo}
+                         for chave, cliente, saldo in linhas])
+
+
+def ordenado(df):
+    return df.sort_values('ChaveEspecifica').reset_index(drop=True)
+
+
+# Foto completa, diferença do dia seguinte e reconstrução das duas datas com valores numéricos
+def test_registrar_delta_e_reconstruir(tmp_path):
+    diretorio = str(tmp_path)
+    dia1 = carteira([('1-10-1', 101.0, 1500.25), ('1-10-2', 101.0, 1500.25), ('1-11-1', np.nan, 80.0)])
+    dia2 = carteira([('1-10-1', 101.0, 1500.25), ('1-10-2', 101.0, 900.0), ('1-12-1', 7.0, 10.5)])
+
+    assert snapshots.registrar(dia1, diretorio, '2025-03-01') == ('completo', 3)
+    assert snapshots.registrar(dia2, diretorio, '2025-03-02') == ('delta', 3)  # 1 alterada, 1 nova, 1 removida
+
+    foto1 = ordenado(snapshots.reconstruir(diretorio, '2025-03-01'))
+    foto2 = ordenado(snapshots.reconstruir(diretorio, '2025-03-02'))
+
+    assert foto2['correctedBalanceAmount'].tolist() == [1500.25, 900.0, 10.5]
+    assert foto2['clientId'].tolist() == [101, 101, 7]
+    assert foto1['ChaveEspecifica'].tolist() == ['1-10-1', '1-10-2', '1-11-1']
+    assert foto1['correctedBalanceAmount'].sum() == 3080.5
+    assert pd.isna(foto1['clientId'][2])
+
+
+# Sem mudanças, a diferença do dia fica vazia; após o intervalo, nova foto completa
+def test_delta_vazio_e_novo_checkpoint(tmp_path):
+    diretorio = str(tmp_path)
+    dia = carteira([('1-10-1', 101.0, 1500.25)])
+
+    snapshots.registrar(dia, diretorio, '2025-03-01', intervalo_checkpoint=2)
+    assert snapshots.registrar(dia, diretorio, '2025-03-02', intervalo_checkpoint=2) == ('delta', 0)
+    assert snapshots.registrar(dia, diretorio, '2025-03-03', intervalo_checkpoint=2) == ('completo', 1)
+    assert snapshots.reconstruir(diretorio, '2025-03-02')['correctedBalanceAmount'].tolist() == [1500.25]
@@ -0,0 +1,111 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+import tenants
+
+
+@pytest.fixture
+def tenant(monkeypatch):
+    def configurar(limite):
+        monkeypatch.setattr(tenants, '_registro', {'t': {**tenants.PADRAO, 'subdominio': 't', 'max_requisicoes': limite}})
+        monkeypatch.setattr(tenants, '_orcamentos', {})
+        monkeypatch.setattr(tenants, '_proxima_requisicao', {})
+    return configurar
+
+
+# As tarefas assíncronas recebem as vagas na ordem em que pediram (FIFO)
+def test_orcamento_async_fifo(tenant):
+    tenant(1)
+    ordem = []
+
+    async def requisicao(numero):
+        async with tenants.orcamento_async('t'):
+            ordem.append(numero)
+            await asyncio.sleep(0.001)
+
+    async def varias():
+        tarefas = []
+        for numero in range(10):
+            tarefas.append(asyncio.create_task(requisicao(numero)))
+            await asyncio.sleep(0)  # Garante a ordem de chegada na fila
+        await asyncio.gather(*tarefas)
+
+    asyncio.run(varias())
+    assert ordem == list(range(10))
+
+
+# Tarefa cancelada enquanto espera sai da fila e não leva a vaga
+def test_orcamento_async_cancelamento(tenant):
+    tenant(1)
+
+    async def cenario():
+        orcamento = tenants._orcamento('t')
+        liberar = asyncio.Event()
+
+        async def dona():
+            async with tenants.orcamento_async('t'):
+                await liberar.wait()
+
+        async def espera():
+            async with tenants.orcamento_async('t'):
+                return 'ok'
+
+        tarefa_dona = asyncio.create_task(dona())
+        await asyncio.sleep(0)
+        cancelada = asyncio.create_task(espera())
+        seguinte = asyncio.create_task(espera())
+        await asyncio.sleep(0)
+        cancelada.cancel()
+        await asyncio.sleep(0)
+        liberar.set()
+        await tarefa_dona
+        assert await seguinte == 'ok'
+        assert cancelada.cancelled()
+        return orcamento._livres, len(orcamento._fila)
+
+    assert asyncio.run(cenario()) == (1, 0)
+
+
+# Threads e vários loops de eventos dividem o mesmo orçamento do tenant
+def test_orcamento_compartilhado_entre_threads_e_loops(tenant):
+    tenant(2)
+    contagem = {'atual': 0, 'pico': 0}
+    lock = threading.Lock()
+
+    def entrar():
+        with lock:
+            contagem['atual'] += 1
+            contagem['pico'] = max(contagem['pico'], contagem['atual'])
+
+    def sair():
+        with lock:
+            contagem['atual'] -= 1
+
+    def em_thread():
+        for _ in range(5):
+            with tenants.orcamento('t'):
+                entrar()
+                time.sleep(0.002)
+                sair()
+
+    async def em_loop():
+        async def requisicao():
+            async with tenants.orcamento_async('t'):
+                entrar()
+                await asyncio.sleep(0.002)
+                sair()
+        await asyncio.gather(*(requisicao() for _ in range(10)))
+
+    threads = [threading.Thread(target=em_thread) for _ in range(3)]
+    threads += [threading.Thread(target=asyncio.run, args=(em_loop(),)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert contagem['pico'] == 2
+    assert tenants._orcamento('t')._livres == 2
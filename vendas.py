@@ -3,24 +3,40 @@ import asyncio
 import pandas as pd
 import nest_asyncio
 import numpy as np
-import os
 from Credenciais import obter_credenciais
+import perfil
+import esquemas
+import tenants
+import pipeline
+import cassete
+import limites_tempo
+import cache_arrow
 
 # Permitir a execução de loops de eventos aninhados
 nest_asyncio.apply()
 
+# Cassete de gravação/reprodução da API (variável SIENGE_CASSETE; sem ela, não faz nada)
+cassete.ativar_por_ambiente()
+
 
 # Função para fazer a requisição à API com tentativas e repetições
-async def fazer_requisicao(session, url, subdominio, tentativas=3, intervalo=5):
+async def fazer_requisicao(session, url, subdominio, tentativas=3, intervalo=5, janela=None):
     token = obter_credenciais(subdominio)
     headers = {
         'Authorization': token
     }
     for tentativa in range(tentativas):
         try:
-            async with session.get(url, headers=headers) as response:
+            with perfil.estagio('fetch', subdominio, janela):  # Orçamento do tenant em limites_tempo.obter_async
+                response = await limites_tempo.obter_async(session, 'vendas', url, subdominio=subdominio, headers=headers)
                 response.raise_for_status()  # Lança uma exceção para erros HTTP
-                return await response.json()
+                corpo = await response.read()
+            with perfil.estagio('decode', subdominio, janela):
+                results, metadados = esquemas.decodificar('sales-contracts', corpo)
+            data = {'results': results}
+            if metadados:
+                data['resultSetMetadata'] = metadados
+            return data
         except aiohttp.ClientResponseError as http_err:
             print(f"Erro na requisição HTTP: {http_err}")
             print(f"URL: {url}")
@@ -36,19 +52,25 @@ async def fazer_requisicao(session, url, subdominio, tentativas=3, intervalo=5):
                     raise
             else:
                 raise
+        except asyncio.TimeoutError:
+            print(f"Tempo esgotado na requisição: {url}")
+            if tentativa < tentativas - 1:
+                print(f"Tentando novamente em {intervalo} segundos...")
+                await asyncio.sleep(intervalo)
+            else:
+                raise
 
-# Função para processar os dados da API
-async def processar_dados(session, subdominio):
+# Função para buscar as páginas da API de um subdomínio (gerador: entrega uma página por vez)
+async def paginas(session, subdominio):
     base_url = f'https://api.sienge.com.br/{subdominio}/public/api/v1/sales-contracts?'
     limit = 200
-    all_data = []
 
     offset = 0
     while True:
         url = f"{base_url}limit={limit}&offset={offset}"
         print(f"Fazendo requisição para URL: {url}")  # Adiciona logging da URL
         try:
-            data = await fazer_requisicao(session, url, subdominio)
+            data = await fazer_requisicao(session, url, subdominio, janela=f"offset={offset}")
         except aiohttp.ClientResponseError as e:
             print(f"Erro ao processar dados para subdomínio {subdominio}: {e}")
             break
@@ -64,99 +86,103 @@ async def processar_dados(session, subdominio):
         if not results:
             break
 
-        # Adiciona os dados ao acumulador
         for result in results:
             result['subdominio'] = subdominio
-            all_data.append(result)
+        yield results
         
         offset += limit
         if offset >= qtd_result:
             break
 
-    return pd.DataFrame(all_data)
-
-# Função para excluir arquivos se existirem
-def excluir_arquivos(caminho_csv, caminho_txt):
-    for caminho in [caminho_csv, caminho_txt]:
-        if os.path.exists(caminho):
-            os.remove(caminho)
-            print(f"Arquivo excluído: {caminho}")
-        else:
-            print(f"Arquivo não encontrado: {caminho}")
-
-async def main():
-    subdominios = ['macapainvest', 'sej']
-    async with aiohttp.ClientSession() as session:
-        tasks = [processar_dados(session, subdominio) for subdominio in subdominios]
-        resultados = await asyncio.gather(*tasks)
-
-    dados_combinados = pd.concat(resultados, ignore_index=True)
-    # Converter a coluna 'receivableBillId' para string
-    dados_combinados['receivableBillId'] = dados_combinados['receivableBillId'].astype(str)
-    # Remover a parte '.0' das strings
-    dados_combinados['receivableBillId'] = dados_combinados['receivableBillId'].str.replace('.0', '', regex=False)
-    # Tratar valores nulos: substituir 'nan' por np.nan
-    dados_combinados['receivableBillId'] = dados_combinados['receivableBillId'].replace('nan', np.nan)
-    # Converter a coluna de volta para inteiro, tratando valores nulos
-    dados_combinados['receivableBillId'] = pd.to_numeric(dados_combinados['receivableBillId'], errors='coerce').astype('Int64')
-    # Filtrar linhas onde 'receivableBillId' não é nulo, não é vazio e não é zero
-    dados_combinados = dados_combinados[dados_combinados['receivableBillId'].notna() & 
-                                        (dados_combinados['receivableBillId'] != 0) & 
-                                        (dados_combinados['receivableBillId'].astype(str).str.strip() != '')]
-    # Certificar-se de que as colunas estão no formato de string
-    dados_combinados['companyId'] = dados_combinados['companyId'].astype(str)
-    dados_combinados['enterpriseId'] = dados_combinados['enterpriseId'].astype(str)
-    # Garantir que 'receivableBillId' está no formato de string
-    dados_combinados['receivableBillId'] = dados_combinados['receivableBillId'].astype(str)
-    # Adicionar a coluna 'ChaveEspecifica'
-    dados_combinados['ChaveEspecifica'] = (dados_combinados['companyId'] + '-' + 
-                                           dados_combinados['receivableBillId'])
+# Função para tratar uma página de contratos: (contratos, clientes, unidades)
+def normalizar_pagina(results):
+    with perfil.estagio('merge'):
+        dados = pd.DataFrame(results)
+    with perfil.estagio('format'):
+        # Converter a coluna 'receivableBillId' para string
+        dados['receivableBillId'] = dados['receivableBillId'].astype(str)
+        # Remover a parte '.0' das strings
+        dados['receivableBillId'] = dados['receivableBillId'].str.replace('.0', '', regex=False)
+        # Tratar valores nulos: substituir 'nan' por np.nan
+        dados['receivableBillId'] = dados['receivableBillId'].replace('nan', np.nan)
+        # Converter a coluna de volta para inteiro, tratando valores nulos
+        dados['receivableBillId'] = pd.to_numeric(dados['receivableBillId'], errors='coerce').astype('Int64')
+        # Filtrar linhas onde 'receivableBillId' não é nulo, não é vazio e não é zero
+        dados = dados[dados['receivableBillId'].notna() & 
+                      (dados['receivableBillId'] != 0) & 
+                      (dados['receivableBillId'].astype(str).str.strip() != '')].copy()
+        # Certificar-se de que as colunas estão no formato de string
+        dados['companyId'] = dados['companyId'].astype(str)
+        dados['enterpriseId'] = dados['enterpriseId'].astype(str)
+        # Garantir que 'receivableBillId' está no formato de string
+        dados['receivableBillId'] = dados['receivableBillId'].astype(str)
+        # Adicionar a coluna 'ChaveEspecifica'
+        dados['ChaveEspecifica'] = dados['companyId'] + '-' + dados['receivableBillId']
     
-    # Substituir ponto por vírgula nas colunas 'value' e 'totalSellingValue'
-    dados_combinados['value'] = dados_combinados['value'].astype(str).str.replace('.', ',', regex=False)
-    dados_combinados['totalSellingValue'] = dados_combinados['totalSellingValue'].astype(str).str.replace('.', ',', regex=False)
+        # Substituir ponto por vírgula nas colunas 'value' e 'totalSellingValue'
+        # (float em todas as páginas, para o texto não depender dos valores de cada página)
+        for coluna in ['value', 'totalSellingValue']:
+            dados[coluna] = pd.to_numeric(dados[coluna]).astype('float64').astype(str).str.replace('.', ',', regex=False)
     
-    # Adicionar a coluna 'subdominio'
-    #dados_combinados['subdominio'] = subdominio
     # Filtrar e normalizar dados
-    colunas = ['salesContractCustomers','salesContractUnits']
-    for coluna in colunas:
-        for index, row in dados_combinados.iterrows():
-            for d in row[coluna]:
-                if isinstance(d, dict):
-                        d['ChaveEspecifica'] = row['ChaveEspecifica']
-                        d['enterpriseId'] = row['enterpriseId']
-                        d['receivableBillId'] = row['receivableBillId']
+    with perfil.estagio('normalize'):
+        colunas = ['salesContractCustomers','salesContractUnits']
+        for coluna in colunas:
+            for index, row in dados.iterrows():
+                for d in row[coluna]:
+                    if isinstance(d, dict):
+                            d['ChaveEspecifica'] = row['ChaveEspecifica']
+                            d['enterpriseId'] = row['enterpriseId']
+                            d['receivableBillId'] = row['receivableBillId']
                             
-    salesContractCustomers = pd.json_normalize(dados_combinados['salesContractCustomers'].explode())
-    salesContractUnits = pd.json_normalize(dados_combinados['salesContractUnits'].explode())
+        salesContractCustomers = pd.json_normalize(dados['salesContractCustomers'].explode())
+        salesContractUnits = pd.json_normalize(dados['salesContractUnits'].explode())
     
     # Dropar as colunas especificadas do DataFrame
-    dados_combinados = dados_combinados.drop(columns=['links', 'salesContractCustomers', 'salesContractUnits', 'paymentConditions', 'brokers'])
+    dados = dados.drop(columns=['links', 'salesContractCustomers', 'salesContractUnits', 'paymentConditions', 'brokers'])
+    return dados, salesContractCustomers, salesContractUnits
 
-    print("Dados combinados de 'Macapa' e 'sej' armazenados em um único DataFrame.")
-    
-    # Caminhos dos arquivos
-    caminho_vendas = 'Vendas.csv'
-    caminho_salesContractCustomers = 'Vendas_salesContractCustomers.csv'
-    caminho_salesContractUnits = 'Vendas_salesContractUnits.csv'
-    
-    # Excluir arquivos existentes
-    excluir_arquivos(caminho_vendas, caminho_salesContractCustomers)
-    excluir_arquivos(caminho_salesContractUnits, caminho_salesContractCustomers)
+# Função principal: busca, trata e grava as páginas em pipeline (a página N é tratada enquanto a
+# N+1 é baixada e as anteriores são gravadas)
+async def main():
+    subdominios = tenants.subdominios('vendas')  # Registro de tenants (tenants.json)
 
-    # Salvar novos arquivos
-    salesContractCustomers.to_csv(caminho_salesContractCustomers, index=False)
-    salesContractUnits.to_csv(caminho_salesContractUnits, index=False)
-    dados_combinados.to_csv(caminho_vendas, index=False)
-    
-    return dados_combinados
+    # Caminhos dos arquivos (gravados em .tmp e publicados ao final)
+    gravadores = [
+        pipeline.GravadorCSV('Vendas.csv'),
+        pipeline.GravadorCSV('Vendas_salesContractCustomers.csv'),
+        pipeline.GravadorCSV('Vendas_salesContractUnits.csv'),
+    ]
+
+    def gravar(tabelas):
+        with perfil.estagio('write'):
+            for gravador, tabela in zip(gravadores, tabelas):
+                gravador.gravar(tabela)
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            await pipeline.executar([paginas(session, subdominio) for subdominio in subdominios],
+                                    normalizar_pagina, gravar)
+    except BaseException:
+        for gravador in gravadores:
+            gravador.descartar()
+        raise
+
+    linhas = {gravador.caminho: gravador.fechar() for gravador in gravadores}
+    with perfil.estagio('write'):
+        for caminho, nome in zip(linhas, ['vendas', 'vendas_clientes', 'vendas_unidades']):
+            cache_arrow.atualizar_csv(caminho, nome)
+    print(f"Dados combinados de {', '.join(subdominios)} gravados: "
+          + ', '.join(f"{caminho} ({quantidade} linhas)" for caminho, quantidade in linhas.items()))
+    return linhas
 
 # Executa a função main e armazena o resultado em uma variável global
 if __name__ == '__main__':
+    perfil.configurar_por_argv()  # Use --profile para medir tempo e memória por estágio
     try:
-        dados_combinados = asyncio.run(main())
+        linhas = asyncio.run(main())
     except ValueError as e:
         print(e)
     except Exception as err:
         print(f"Erro inesperado: {err}")
+    perfil.finalizar('vendas')